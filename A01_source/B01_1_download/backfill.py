@@ -0,0 +1,187 @@
+import os
+import sys
+import json
+import argparse
+import datetime
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from A01_source.B01_1_download import download, granules
+from A01_source.B01_1_download.cache import GranuleCache
+from A02_utils.sites import SITES
+
+
+# === CONSTANTS ===
+
+CHECKPOINT_FILE = download.RAW_DIR / "_backfill_checkpoint.json"
+"""
+Path: JSON file with the days already completed for each site.
+"""
+
+MAX_DAYS = 4
+"""
+int: Number of days listed and processed at the same time.
+"""
+
+MAX_DOWNLOADS = 8
+"""
+int: Global cap on simultaneous granule downloads, shared by all the days in progress.
+"""
+
+
+# === FUNCTIONS ===
+
+def _a_fecha(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def dias_entre(inicio, fin):
+    """
+    Lists the days of a date range as (year, doy) pairs.
+
+    Args:
+        inicio (str | datetime.date): First day ('YYYY-MM-DD' or date), included.
+        fin (str | datetime.date): Last day, included.
+
+    Returns:
+        list[tuple[str, str]]: Pairs such as ('2025', '001'), in chronological order.
+    """
+    inicio, fin = _a_fecha(inicio), _a_fecha(fin)
+    if fin < inicio:
+        raise ValueError(f"End date {fin} is before start date {inicio}")
+
+    dias = []
+    dia = inicio
+    while dia <= fin:
+        dias.append((dia.strftime("%Y"), dia.strftime("%j")))
+        dia += datetime.timedelta(days=1)
+    return dias
+
+
+def cargar_checkpoint(path=CHECKPOINT_FILE):
+    """
+    Reads the backfill checkpoint.
+
+    Args:
+        path (str | Path): Checkpoint file.
+
+    Returns:
+        dict: Site name -> set of completed days ('YYYY_DDD'). Empty if the file does not exist.
+    """
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+    return {site: set(dias) for site, dias in data.items()}
+
+
+def guardar_checkpoint(completados, path=CHECKPOINT_FILE):
+    """
+    Writes the backfill checkpoint atomically (temporary file + rename).
+
+    Args:
+        completados (dict): Site name -> set of completed days ('YYYY_DDD').
+        path (str | Path): Checkpoint file.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump({site: sorted(dias) for site, dias in completados.items()}, f, indent=2)
+    os.replace(tmp, path)
+
+
+# === MAIN FUNCTION ===
+
+def backfill(inicio, fin, sites=None, max_dias=MAX_DAYS, max_descargas=MAX_DOWNLOADS,
+             checkpoint=CHECKPOINT_FILE, session=None, cache=None):
+    """
+    Downloads every day of a date range for several sites.
+
+    Each day is one job (listing + downloads via `download.descargar_sitios`) run on a pool of
+    `max_dias` threads. All the jobs share one HTTP session, one granule cache and one semaphore,
+    so no more than `max_descargas` granules are downloaded at any time whatever the number of days
+    in progress. A day is written to the checkpoint as soon as it finishes without errors; days
+    already in the checkpoint are skipped, so an interrupted backfill resumes where it left off.
+
+    Args:
+        inicio (str | datetime.date): First day ('YYYY-MM-DD' or date), included.
+        fin (str | datetime.date): Last day, included.
+        sites (list[str], optional): Site names from `A02_utils.sites.SITES`. All sites by default.
+        max_dias (int): Number of days processed at the same time.
+        max_descargas (int): Global cap on simultaneous granule downloads.
+        checkpoint (str | Path): Checkpoint file.
+        session (requests.Session, optional): Shared session. Created with the downloader TOKEN if not given.
+        cache (GranuleCache, optional): Granule cache. The default one if not given.
+
+    Returns:
+        dict: Day ('YYYY_DDD') -> 'done', 'skipped' (already in the checkpoint) or 'error'.
+    """
+    sites = list(sites or SITES)
+    if session is None:
+        session = granules.crear_sesion(download.TOKEN, pool_size=max_descargas)
+    if cache is None:
+        cache = GranuleCache()
+
+    completados = cargar_checkpoint(checkpoint)
+    limite = threading.BoundedSemaphore(max_descargas)
+    lock = threading.Lock()
+    resumen = {}
+
+    trabajos = []
+    for year, doy in dias_entre(inicio, fin):
+        dia = f"{year}_{doy}"
+        pendientes = [site for site in sites if dia not in completados.get(site, set())]
+        if pendientes:
+            trabajos.append((year, doy, pendientes))
+        else:
+            resumen[dia] = "skipped"
+
+    print(f"🗓️ Backfill {inicio} → {fin}: {len(trabajos)} days to do, {len(resumen)} already done.")
+
+    with ThreadPoolExecutor(max_workers=max_dias) as executor:
+        futures = {
+            executor.submit(download.descargar_sitios, pendientes, year, doy, session=session,
+                            max_workers=max_descargas, cache=cache, limite=limite, estricto=True):
+                (f"{year}_{doy}", pendientes)
+            for year, doy, pendientes in trabajos
+        }
+
+        for future in as_completed(futures):
+            dia, pendientes = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                print(f"⚠️ Day {dia} failed, it will be retried on the next run: {e}")
+                resumen[dia] = "error"
+                continue
+
+            with lock:
+                for site in pendientes:
+                    completados.setdefault(site, set()).add(dia)
+                guardar_checkpoint(completados, checkpoint)
+            resumen[dia] = "done"
+
+    errores = sorted(dia for dia, estado in resumen.items() if estado == "error")
+    print(f"✅ Backfill finished: {len(resumen) - len(errores)} days complete, {len(errores)} with errors.")
+    return dict(sorted(resumen.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download a date range of VIIRS granules for several sites.")
+    parser.add_argument("inicio", help="First day, YYYY-MM-DD")
+    parser.add_argument("fin", help="Last day, YYYY-MM-DD")
+    parser.add_argument("--sites", nargs="+", choices=list(SITES), default=list(SITES))
+    parser.add_argument("--days", type=int, default=MAX_DAYS, help="Days processed at the same time")
+    parser.add_argument("--downloads", type=int, default=MAX_DOWNLOADS, help="Global cap on simultaneous downloads")
+    args = parser.parse_args()
+
+    backfill(args.inicio, args.fin, args.sites, max_dias=args.days, max_descargas=args.downloads)
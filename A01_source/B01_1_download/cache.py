@@ -0,0 +1,212 @@
+import os
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+
+
+# === CONSTANTS ===
+
+CACHE_DIR = Path(__file__).resolve().parents[2] / "A00_data" / "B_raw" / "_cache"
+"""
+Path: Root of the granule cache (index.sqlite + objects/).
+"""
+
+MAX_CACHE_BYTES = 20 * 1024**3
+"""
+int: Default size limit of the cache. Least recently used granules are evicted above it.
+"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS granules (
+    product     TEXT NOT NULL,
+    collection  TEXT NOT NULL,
+    granule_id  TEXT NOT NULL,
+    sha256      TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    added       REAL NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (product, collection, granule_id)
+);
+CREATE INDEX IF NOT EXISTS granules_last_access ON granules (last_access);
+"""
+
+
+# === FUNCTIONS ===
+
+def sha256_archivo(path, chunk_size=1024 * 1024):
+    """
+    Computes the SHA-256 checksum of a file.
+
+    Args:
+        path (str | Path): File to hash.
+        chunk_size (int): Bytes read at a time.
+
+    Returns:
+        str: Hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class GranuleCache:
+    """
+    Content-addressed store of raw granules with a small SQLite index.
+
+    Granules are identified by (product, collection, granule_id) and stored once under
+    `objects/<sha[:2]>/<sha256>`, so two identical files share the same object.
+    Every lookup refreshes `last_access`; when the total size exceeds `max_bytes`
+    the least recently used entries are evicted.
+
+    Args:
+        cache_dir (str | Path): Root folder of the cache.
+        max_bytes (int): Size limit in bytes.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.objects_dir = self.cache_dir / "objects"
+        self.index_path = self.cache_dir / "index.sqlite"
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            con.executescript(_SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.index_path, timeout=30)
+
+    def _object_path(self, sha):
+        return self.objects_dir / sha[:2] / sha
+
+    def get(self, product, collection, granule_id):
+        """
+        Looks up a granule.
+
+        Args:
+            product (str): Product name (e.g., 'VJ102IMG').
+            collection (str): Collection number (e.g., '5201').
+            granule_id (str): Granule file name.
+
+        Returns:
+            Path | None: Path of the cached object, or None if it is not in the cache.
+        """
+        with self._lock, self._connect() as con:
+            row = con.execute(
+                "SELECT sha256 FROM granules WHERE product=? AND collection=? AND granule_id=?",
+                (product, collection, granule_id),
+            ).fetchone()
+            if row is None:
+                return None
+
+            path = self._object_path(row[0])
+            if not path.exists():
+                # Object deleted by hand: forget the entry
+                con.execute(
+                    "DELETE FROM granules WHERE product=? AND collection=? AND granule_id=?",
+                    (product, collection, granule_id),
+                )
+                return None
+
+            con.execute(
+                "UPDATE granules SET last_access=? WHERE product=? AND collection=? AND granule_id=?",
+                (time.time(), product, collection, granule_id),
+            )
+        return path
+
+    def put(self, product, collection, granule_id, src, move=True):
+        """
+        Adds a granule to the cache.
+
+        Args:
+            product (str): Product name.
+            collection (str): Collection number.
+            granule_id (str): Granule file name.
+            src (str | Path): File to store.
+            move (bool): Move `src` into the cache (default) instead of copying it.
+
+        Returns:
+            Path: Path of the cached object.
+        """
+        src = Path(src)
+        sha = sha256_archivo(src)
+        size = src.stat().st_size
+        dst = self._object_path(sha)
+
+        with self._lock:
+            if dst.exists():
+                if move:
+                    src.unlink()
+            else:
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                tmp = dst.with_name(dst.name + ".tmp")
+                if move:
+                    shutil.move(src, tmp)
+                else:
+                    shutil.copy2(src, tmp)
+                os.replace(tmp, dst)
+
+            now = time.time()
+            with self._connect() as con:
+                con.execute(
+                    "INSERT OR REPLACE INTO granules VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (product, collection, granule_id, sha, size, now, now),
+                )
+            self._evict(keep=(product, collection, granule_id))
+
+        return dst
+
+    def verify(self, product, collection, granule_id):
+        """
+        Checks that a cached granule still matches its stored checksum.
+
+        Returns:
+            bool: True if the object exists and its SHA-256 is unchanged.
+        """
+        with self._connect() as con:
+            row = con.execute(
+                "SELECT sha256 FROM granules WHERE product=? AND collection=? AND granule_id=?",
+                (product, collection, granule_id),
+            ).fetchone()
+        if row is None:
+            return False
+        path = self._object_path(row[0])
+        return path.exists() and sha256_archivo(path) == row[0]
+
+    def total_bytes(self):
+        """Size in bytes of the distinct objects in the cache."""
+        with self._connect() as con:
+            row = con.execute("SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT sha256, size FROM granules)").fetchone()
+        return row[0]
+
+    def _evict(self, keep=None):
+        """Removes least recently used granules until the cache fits in `max_bytes`, never `keep`."""
+        with self._connect() as con:
+            total = con.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT sha256, size FROM granules)"
+            ).fetchone()[0]
+            if total <= self.max_bytes:
+                return
+
+            rows = con.execute(
+                "SELECT product, collection, granule_id, sha256, size FROM granules ORDER BY last_access"
+            ).fetchall()
+            for product, collection, granule_id, sha, size in rows:
+                if total <= self.max_bytes:
+                    break
+                if (product, collection, granule_id) == keep:
+                    continue
+                con.execute(
+                    "DELETE FROM granules WHERE product=? AND collection=? AND granule_id=?",
+                    (product, collection, granule_id),
+                )
+                still_used = con.execute("SELECT 1 FROM granules WHERE sha256=? LIMIT 1", (sha,)).fetchone()
+                if not still_used:
+                    self._object_path(sha).unlink(missing_ok=True)
+                    total -= size
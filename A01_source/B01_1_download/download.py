@@ -1,31 +1,44 @@
 import os
+import sys
+import shutil
+import hashlib
 import requests
 import netCDF4
 import datetime
 from pathlib import Path
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from A01_source.B01_1_download import granules, prefilter
+from A01_source.B01_1_download.cache import GranuleCache
+from A02_utils.catalog import FileCatalog
+from A02_utils.sites import SITES, covers_site
+
 
 # === CONSTANTS ===
 
-# Geographic bounding box for La Palma (Canary Islands)
-LAT_LA_PALMA_MIN = 28.601109109131052
+# Raw data folder: A00_data/B_raw/<site>/<year>_<doy>
+RAW_DIR = Path(__file__).resolve().parents[2] / "A00_data" / "B_raw"
 """
-float: Southern latitude boundary of La Palma.
+Path: Base directory where the granules of every site are stored.
 """
 
-LAT_LA_PALMA_MAX = 28.62514776637218
+# Shared folder where each granule is downloaded once before being linked to the sites
+SHARED_DIR = RAW_DIR / "_shared"
 """
-float: Northern latitude boundary of La Palma.
+Path: Staging directory for granules shared by several sites.
 """
 
-LON_LA_PALMA_MIN = -17.929768956228138
+# Root of the file catalogue where the kept granules are registered (A00_data)
+CATALOG_DIR = RAW_DIR.parent
 """
-float: Western longitude boundary of La Palma.
+Path: Root folder of the `A02_utils.catalog.FileCatalog` updated by the download.
 """
 
-LON_LA_PALMA_MAX = -17.872144640744164
+# LAADS DAAC API endpoint with the file listings of every product and day
+API_URL = "https://ladsweb.modaps.eosdis.nasa.gov/api/v2/content/details/allData"
 """
-float: Eastern longitude boundary of La Palma.
+str: Base URL of the LAADS `content/details` API.
 """
 
 # Satellite product codes used for data download
@@ -34,6 +47,12 @@ PRODUCTS1 = ["VJ102IMG"]
 List[str]: List of satellite product identifiers used to query and download data.
 """
 
+# Geolocation product paired with every VJ102IMG granule (real latitude/longitude of each pixel)
+GEO_PRODUCT = "VJ103IMG"
+"""
+str: Product with the I-band geolocation of the VJ102IMG granules.
+"""
+
 # MODIS collection identifier used in the API request
 COLLECTION1 = "5201"
 """
@@ -46,6 +65,12 @@ TOKEN = "eyJ0eXAiOiJKV1QiLCJvcmlnaW4iOiJFYXJ0aGRhdGEgTG9naW4iLCJzaWciOiJlZGxqd3R
 str: Bearer token used to authenticate requests to the NASA Earthdata API.
 """
 
+# Number of granules downloaded at the same time
+MAX_WORKERS = granules.MAX_WORKERS
+"""
+int: Size of the download worker pool (and of the HTTP connection pool).
+"""
+
 
 # === FUNCTIONS ===
 def obtener_fecha_ayer():
@@ -74,25 +99,35 @@ def generar_url_api(product, year, doy, collection):
     Returns:
         str: A formatted URL string to query the product metadata via the LAADS DAAC API.
     """
-    return f"https://ladsweb.modaps.eosdis.nasa.gov/api/v2/content/details/allData/{collection}/{product}/{year}/{doy}"
+    return f"{API_URL}/{collection}/{product}/{year}/{doy}"
 
 
-def esta_en_la_palma(sur, norte, este, oeste):
+def huella_listado(year, doy, session=None):
     """
-    Checks whether a satellite image covers the geographic area of La Palma island.
+    Cheap fingerprint of what LAADS publishes for a day: a digest of the granule names in the
+    listings of every product in PRODUCTS1 and of GEO_PRODUCT. Only the listings are requested
+    (one small request per product); nothing is downloaded.
 
     Args:
-        sur (float): Southern boundary latitude of the image.
-        norte (float): Northern boundary latitude of the image.
-        este (float): Eastern boundary longitude of the image.
-        oeste (float): Western boundary longitude of the image.
+        year (str): The year in YYYY format.
+        doy (str): The day of the year (DOY), zero-padded (e.g., '099').
+        session (requests.Session, optional): Shared session. Created with TOKEN if not given.
 
     Returns:
-        bool: True if the image intersects with the defined bounding box of La Palma, False otherwise.
-    """
-    return (sur <= LAT_LA_PALMA_MAX and norte >= LAT_LA_PALMA_MIN and
-            oeste <= LON_LA_PALMA_MAX and este >= LON_LA_PALMA_MIN)
+        str: SHA-256 hex digest of the product and granule names, in a stable order.
 
+    Raises:
+        requests.exceptions.RequestException: If a listing cannot be retrieved.
+    """
+    if session is None:
+        session = granules.crear_sesion(TOKEN)
+    huella = hashlib.sha256()
+    for product in PRODUCTS1 + [GEO_PRODUCT]:
+        response = session.get(generar_url_api(product, year, doy, COLLECTION1), timeout=granules.TIMEOUT)
+        response.raise_for_status()
+        for name in sorted(entry['name'] for entry in response.json()['content']):
+            huella.update(f"{product}/{name};".encode())
+    return huella.hexdigest()
 
 
 def es_de_noche(day_night_flag):
@@ -109,112 +144,270 @@ def es_de_noche(day_night_flag):
 
 
 
+def enlazar_granulo(src, dst):
+    """
+    Places a granule in a site folder without duplicating it on disk.
+
+    A hard link is used when possible; if the filesystem does not support it
+    (e.g. different devices), the file is copied.
+
+    Args:
+        src (Path): Downloaded granule.
+        dst (Path): Destination path inside the site folder.
+    """
+    if dst.exists():
+        return
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def obtener_granulos(product, links, shared_dir, session, cache, max_workers=MAX_WORKERS, limite=None):
+    """
+    Gets granules from the cache or, if they are not there, downloads them and adds them to it.
+
+    Args:
+        product (str): Product name (cache key).
+        links (list[str]): Download URLs.
+        shared_dir (Path): Staging folder for the downloads.
+        session (requests.Session): Authenticated session.
+        cache (GranuleCache): Granule cache.
+        max_workers (int): Number of simultaneous downloads.
+        limite (threading.Semaphore, optional): Global cap on simultaneous downloads.
+
+    Returns:
+        tuple:
+            - fuentes (dict): Link -> path of the granule inside the cache.
+            - fallidos (list[str]): File names that could not be downloaded.
+    """
+    # Primero la caché local; sólo se descarga lo que falta
+    fuentes = {}
+    por_descargar = []
+    for link in links:
+        cached = cache.get(product, COLLECTION1, link.split("/")[-1])
+        if cached is not None:
+            fuentes[link] = cached
+        else:
+            por_descargar.append(link)
+    print(f"💾 {len(fuentes)} files from cache, {len(por_descargar)} to download.")
+
+    fallidos = []
+    if por_descargar:
+        results = granules.descargar_granulos(por_descargar, shared_dir, session=session,
+                                              max_workers=max_workers, limite=limite)
+        for link, result in zip(por_descargar, results):
+            if result['status'] != 'error':
+                fuentes[link] = cache.put(product, COLLECTION1, result['filename'], result['path'])
+            else:
+                fallidos.append(result['filename'])
+    return fuentes, fallidos
+
+
+def descargar_geolocalizacion(kept, year, doy, session, cache, max_workers=MAX_WORKERS, limite=None, catalogo=None):
+    """
+    Places next to every kept VJ102IMG granule its VJ103IMG geolocation granule.
+
+    Both products share the acquisition key (e.g. 'A2025123.0254'), so only the
+    geolocation granules of the kept images are downloaded.
+
+    Args:
+        kept (dict): Site name -> list of VJ102IMG paths, as returned by `descargar_sitios`.
+        year (str): 4-digit year.
+        doy (str): Zero-padded day of the year.
+        session (requests.Session): Authenticated session.
+        cache (GranuleCache): Granule cache.
+        max_workers (int): Number of simultaneous downloads.
+        limite (threading.Semaphore, optional): Global cap on simultaneous downloads.
+        catalogo (FileCatalog, optional): Catalogue where the linked granules are registered.
+
+    Returns:
+        list[str]: Geolocation files that could not be downloaded.
+
+    Raises:
+        requests.exceptions.RequestException: If the geolocation listing cannot be retrieved.
+    """
+    claves = {prefilter.clave_granulo(path.name) for files in kept.values() for path in files} - {None}
+    if not claves:
+        return []
+
+    print(f"🔍 Searching for the {GEO_PRODUCT} geolocation of {len(claves)} granules...")
+    response = session.get(generar_url_api(GEO_PRODUCT, year, doy, COLLECTION1), timeout=granules.TIMEOUT)
+    response.raise_for_status()
+
+    links = {}
+    for entry in response.json().get('content', []):
+        link = entry['downloadsLink']
+        nombre = entry.get('name') or link.split("/")[-1]
+        clave = prefilter.clave_granulo(nombre)
+        if nombre.startswith(GEO_PRODUCT) and clave in claves:
+            links[clave] = link
+    if not links:
+        print(f"⚠️ No {GEO_PRODUCT} granules found for the kept images.")
+        return []
+
+    fuentes, fallidos = obtener_granulos(GEO_PRODUCT, list(links.values()), SHARED_DIR / f"{year}_{doy}",
+                                         session, cache, max_workers, limite)
+    for files in kept.values():
+        for path in files:
+            link = links.get(prefilter.clave_granulo(path.name))
+            if link in fuentes:
+                destino = path.parent / link.split("/")[-1]
+                enlazar_granulo(fuentes[link], destino)
+                if catalogo is not None:
+                    # Cached objects are named by their SHA-256: the granule is not hashed again
+                    catalogo.register(destino, sha256=Path(fuentes[link]).name)
+    return fallidos
+
+
 # === MAIN FUNCTION ===
 
-def descargar_datos1():
+def descargar_sitios(sites=None, year=None, doy=None, session=None, max_workers=MAX_WORKERS, cache=None,
+                     limite=None, estricto=False, catalogo=None):
     """
-    Downloads satellite data for the previous day, filters it for nighttime images 
-    over La Palma island, and saves the valid files locally.
+    Downloads one day of satellite data for several sites in a single pass.
 
     Steps:
-        1. Get yesterday's date as year and day-of-year (DOY).
-        2. Create a directory to store downloaded files based on the date.
-        3. Loop through each product defined in PRODUCTS1:
-            - Request the list of available files from the API.
-            - If files are found, download them using wget and a Bearer token.
-            - Open each file using netCDF4 and check:
-                a. If the image was taken at night ('DayNightFlag').
-                b. If the image geographically covers La Palma.
-            - Keep the file only if both conditions are met.
-            - Delete the file otherwise.
-
-    Requirements:
-        - Environment variables or global definitions:
-            - PRODUCTS1: List of product identifiers.
-            - COLLECTION1: Satellite data collection number.
-            - TOKEN: Valid NASA Earthdata API token.
-        - Utility functions:
-            - obtener_fecha_ayer(): returns (year, doy).
-            - generar_url_api(): builds the API request URL.
-            - esta_en_la_palma(): checks if coordinates cover La Palma.
-            - es_de_noche(): checks if image is nighttime.
-
-    Notes:
-        - If the downloaded file is not a valid NetCDF file, it will be deleted.
-        - Uses wget with an Authorization header for downloading.
-    """
-    # Obtener el año y el día juliano de ayer
-    year, doy = obtener_fecha_ayer()
-
-    # === CONFIGURACIÓN DE DIRECTORIO DE SALIDA ===
-    # Obtener la ruta del proyecto basándonos en la ubicación de este script
-    script_path = Path(__file__).resolve().parent  # Esto obtiene el directorio donde se ejecuta el script
-
-    # Definir la ruta base donde quieres guardar los archivos (relativo al proyecto)
-    base_output_dir = script_path.parents[1] / "A00_data" / "B_raw" / "La_Palma"  # Subimos al directorio raíz del proyecto
-
-    # Obtener la fecha actual (o la fecha del día juliano, según tu caso)
-    year, doy = obtener_fecha_ayer()  # Asumiendo que esta función devuelve el año y el día juliano de ayer
-
-    # Definir el directorio específico para los archivos del día (a partir del directorio base)
-    output_dir = base_output_dir / f"{year}_{doy}"
-
-    # Crear el directorio si no existe
-    os.makedirs(output_dir, exist_ok=True)
-
-    print(f"Ruta de salida: {output_dir}")
-    print(f"\n📅 Downloading data for {year}-{doy}...")
+        1. Get the date (yesterday by default) as year and day-of-year (DOY).
+        2. For each product in PRODUCTS1, request the list of files from the API once.
+        3. Pre-filter the listing against every site (`prefilter.filtrar_candidatos`) and keep
+           the union of candidates, remembering which sites each granule may cover.
+        4. Take the candidates already in the granule cache from disk; download the rest once
+           into A00_data/B_raw/_shared/<year>_<doy> and move them into the cache.
+        5. Open each granule once and, for every site it may cover that has no valid file yet,
+           check the night flag and the bounding box.
+        6. Hard-link the valid granule into A00_data/B_raw/<site>/<year>_<doy>.
+        7. Add the VJ103IMG geolocation granule of every kept image to the same folder.
+        8. Register every linked granule in the file catalogue, so the stages find them with a query.
+
+    Args:
+        sites (list[str], optional): Site names from `A02_utils.sites.SITES`. All sites by default.
+        year (str, optional): 4-digit year. Yesterday if not given.
+        doy (str, optional): Zero-padded day of the year. Yesterday if not given.
+        session (requests.Session, optional): Shared session. Created with TOKEN if not given.
+        max_workers (int): Number of simultaneous downloads.
+        cache (GranuleCache, optional): Granule cache. The default one in A00_data/B_raw/_cache if not given.
+        limite (threading.Semaphore, optional): Global cap on simultaneous downloads shared with other calls.
+        estricto (bool): Raise instead of printing a warning when the listing or a download fails,
+            so that callers (e.g. the backfill) do not mark an incomplete day as done.
+        catalogo (FileCatalog, optional): File catalogue. The one in CATALOG_DIR if not given.
+
+    Returns:
+        dict: Site name -> list of granule paths kept for that site.
+
+    Raises:
+        requests.exceptions.RequestException: If `estricto` and the listing cannot be retrieved.
+        IOError: If `estricto` and some candidate granules could not be downloaded.
+    """
+    if year is None or doy is None:
+        year, doy = obtener_fecha_ayer()
+
+    sites = list(sites or SITES)
+    if session is None:
+        session = granules.crear_sesion(TOKEN, pool_size=max_workers)
+    if cache is None:
+        cache = GranuleCache()
+    if catalogo is None:
+        catalogo = FileCatalog(CATALOG_DIR)
+
+    shared_dir = SHARED_DIR / f"{year}_{doy}"
+    kept = {site: [] for site in sites}
+    fallidos = []
+
+    print(f"\n📅 Downloading data for {year}-{doy} ({', '.join(sites)})...")
 
     for product1 in PRODUCTS1:
         print(f"🔍 Searching for files of {product1}...")
 
         api_url = generar_url_api(product1, year, doy, COLLECTION1)
-        headers = {"Authorization": f"Bearer {TOKEN}"}
 
         try:
-            response = requests.get(api_url, headers=headers)
+            response = session.get(api_url, timeout=granules.TIMEOUT)
             response.raise_for_status()
             file_list = response.json()
-
-            if not file_list['content']:
-                print(f"⚠️ No files found for {product1}")
+        except requests.exceptions.RequestException as e:
+            print(f"⚠️ Error accessing {product1}: {e}")
+            if estricto:
+                raise
+            continue
+
+        if not file_list['content']:
+            print(f"⚠️ No files found for {product1}")
+            continue
+
+        # Sitios que puede cubrir cada gránulo, según sus metadatos
+        geometa = prefilter.cargar_geometa(session, year, doy, COLLECTION1)
+        sitios_por_link = {}
+        for site in sites:
+            candidatos, _ = prefilter.filtrar_candidatos(
+                file_list['content'], lambda *bbox, site=site: covers_site(site, *bbox), geometa)
+            for entry in candidatos:
+                sitios_por_link.setdefault(entry['downloadsLink'], []).append(site)
+
+        # Respetar el orden del listado
+        download_links = [f['downloadsLink'] for f in file_list['content']
+                          if f['downloadsLink'] in sitios_por_link]
+        print(f"🔎 {len(download_links)} candidate files out of {len(file_list['content'])}.")
+
+        if not download_links:
+            continue
+
+        fuentes, errores = obtener_granulos(product1, download_links, shared_dir, session, cache,
+                                            max_workers, limite)
+        fallidos.extend(errores)
+
+        for link in download_links:
+            if link not in fuentes:
                 continue
 
-            download_links = [f['downloadsLink'] for f in file_list['content']]
-
-            for link in download_links:
-                filename = link.split("/")[-1]
-                filepath = os.path.join(output_dir, filename)
-
-                print(f"📥 Downloading {filename}...")
-                os.system(f'wget --header="Authorization: Bearer {TOKEN}" -O {filepath} {link}')
+            filename = link.split("/")[-1]
+            filepath = fuentes[link]
+            pendientes = [site for site in sitios_por_link[link] if not kept[site]]
 
+            if pendientes:
                 try:
-                    dataset = netCDF4.Dataset(filepath, 'r')
-                    flag = dataset.getncattr('DayNightFlag')
-
-                    sur = dataset.getncattr('SouthBoundingCoordinate')
-                    norte = dataset.getncattr('NorthBoundingCoordinate')
-                    este = dataset.getncattr('EastBoundingCoordinate')
-                    oeste = dataset.getncattr('WestBoundingCoordinate')
-
-                    if esta_en_la_palma(sur, norte, este, oeste) and es_de_noche(flag):
-                        print("✔️ Valid file: nighttime over La Palma.")
-                        break
-                    else:
-                        print("❌ Does not meet conditions. Deleting...")
-                        os.remove(filepath)
-
+                    with netCDF4.Dataset(filepath, 'r') as dataset:
+                        flag = dataset.getncattr('DayNightFlag')
+                        sur = dataset.getncattr('SouthBoundingCoordinate')
+                        norte = dataset.getncattr('NorthBoundingCoordinate')
+                        este = dataset.getncattr('EastBoundingCoordinate')
+                        oeste = dataset.getncattr('WestBoundingCoordinate')
                 except Exception as e:
                     print(f"⚠️ Error processing {filename}: {e}")
-                    os.remove(filepath)
-
-        except requests.exceptions.RequestException as e:
-            print(f"⚠️ Error accessing {product1}: {e}")
+                    pendientes = []
+
+            for site in pendientes:
+                if covers_site(site, sur, norte, este, oeste) and es_de_noche(flag):
+                    destino = RAW_DIR / site / f"{year}_{doy}" / filename
+                    enlazar_granulo(filepath, destino)
+                    catalogo.register(destino, day_night=flag, bbox=(sur, norte, oeste, este),
+                                      sha256=Path(filepath).name)
+                    kept[site].append(destino)
+                    print(f"✔️ Valid file for {site}: {filename}")
+
+    # Geolocalización real de los gránulos conservados
+    try:
+        fallidos.extend(descargar_geolocalizacion(kept, year, doy, session, cache, max_workers, limite, catalogo))
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️ Error accessing {GEO_PRODUCT}: {e}")
+        if estricto:
+            raise
+
+    if shared_dir.exists() and not any(shared_dir.iterdir()):
+        shared_dir.rmdir()
+
+    for site, files in kept.items():
+        if not files:
+            print(f"❌ No valid nighttime file for {site}.")
+
+    if fallidos and estricto:
+        raise IOError(f"{len(fallidos)} granules could not be downloaded for {year}-{doy}: {', '.join(fallidos)}")
 
     print("✅ Download complete.")
+    return kept
 
 
 
 if __name__ == "__main__":
-    descargar_datos1()
+    descargar_sitios()
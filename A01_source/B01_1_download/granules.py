@@ -0,0 +1,192 @@
+import os
+import time
+import requests
+from pathlib import Path
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# === CONSTANTS ===
+
+MAX_WORKERS = 4
+"""
+int: Default number of granules downloaded at the same time.
+"""
+
+CHUNK_SIZE = 1024 * 1024
+"""
+int: Size in bytes of each block written to disk while streaming a granule.
+"""
+
+TIMEOUT = (30, 300)
+"""
+tuple: (connect, read) timeouts in seconds for every HTTP request.
+"""
+
+PART_SUFFIX = ".part"
+"""
+str: Suffix of the partial files kept on disk until a download is complete.
+"""
+
+
+# === FUNCTIONS ===
+
+def crear_sesion(token=None, pool_size=MAX_WORKERS, retries=3):
+    """
+    Creates a pooled HTTP session shared by all the download workers.
+
+    Args:
+        token (str, optional): NASA Earthdata bearer token. If given, it is sent with every request.
+        pool_size (int): Maximum number of connections kept open against the same host.
+        retries (int): Number of retries for connection errors and 429/5xx responses.
+
+    Returns:
+        requests.Session: Session with keep-alive connections and retry policy.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=1,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "HEAD"],
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    if token:
+        session.headers["Authorization"] = f"Bearer {token}"
+
+    return session
+
+
+def descargar_granulo(session, link, output_dir):
+    """
+    Downloads a single granule into `output_dir`, resuming a previous partial download if present.
+
+    The data is streamed into `<filename>.part` and only renamed to its final name once
+    the transfer is complete, so a half-written file is never mistaken for a valid granule.
+    If a `.part` file already exists, an HTTP Range request continues from its current size.
+
+    Args:
+        session (requests.Session): Session created with `crear_sesion()`.
+        link (str): Download URL of the granule.
+        output_dir (str | Path): Directory where the granule is saved.
+
+    Returns:
+        dict:
+            - filename (str): Name of the granule.
+            - path (Path): Final path of the granule on disk.
+            - bytes (int): Bytes transferred in this call (resumed bytes are not counted).
+            - seconds (float): Elapsed transfer time.
+            - mb_s (float): Throughput in MB/s.
+            - resumed (bool): True if the download continued from a `.part` file.
+            - status (str): 'downloaded' or 'exists'.
+
+    Raises:
+        requests.exceptions.RequestException: If the request fails.
+        IOError: If fewer bytes than announced by the server were received.
+    """
+    filename = link.split("/")[-1]
+    final_path = Path(output_dir) / filename
+    part_path = final_path.with_name(filename + PART_SUFFIX)
+
+    if final_path.exists():
+        return {"filename": filename, "path": final_path, "bytes": 0, "seconds": 0.0,
+                "mb_s": 0.0, "resumed": False, "status": "exists"}
+
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+    received = 0
+    start = time.perf_counter()
+
+    with session.get(link, headers=headers, stream=True, timeout=TIMEOUT) as response:
+        # 416: the partial file already holds the whole granule
+        if offset and response.status_code == 416:
+            os.replace(part_path, final_path)
+            return {"filename": filename, "path": final_path, "bytes": 0, "seconds": 0.0,
+                    "mb_s": 0.0, "resumed": True, "status": "downloaded"}
+
+        response.raise_for_status()
+
+        # The server ignored the Range header: start again from scratch
+        if offset and response.status_code != 206:
+            offset = 0
+
+        expected = int(response.headers.get("Content-Length", -1))
+
+        with open(part_path, "ab" if offset else "wb") as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+                received += len(chunk)
+
+    if expected >= 0 and received != expected:
+        raise IOError(f"Incomplete download of {filename}: {received} of {expected} bytes")
+
+    # Atomic rename: the final name only appears once the file is complete
+    os.replace(part_path, final_path)
+
+    seconds = time.perf_counter() - start
+    mb_s = (received / 1e6) / seconds if seconds > 0 else 0.0
+
+    return {"filename": filename, "path": final_path, "bytes": received, "seconds": seconds,
+            "mb_s": mb_s, "resumed": offset > 0, "status": "downloaded"}
+
+
+def _descargar_con_limite(limite, session, link, output_dir):
+    """Runs `descargar_granulo` holding a slot of the shared semaphore `limite` (if any)."""
+    with limite if limite is not None else nullcontext():
+        return descargar_granulo(session, link, output_dir)
+
+
+def descargar_granulos(links, output_dir, session=None, token=None, max_workers=MAX_WORKERS, limite=None):
+    """
+    Downloads several granules concurrently with a bounded pool of worker threads.
+
+    Args:
+        links (list[str]): Download URLs of the granules.
+        output_dir (str | Path): Directory where the granules are saved.
+        session (requests.Session, optional): Shared session. If None, one is created with `token`.
+        token (str, optional): Bearer token used when a new session is created.
+        max_workers (int): Maximum number of simultaneous downloads.
+        limite (threading.Semaphore, optional): Semaphore shared by several calls running at the
+            same time (e.g. one per day in a backfill), to cap the total number of downloads.
+
+    Returns:
+        list[dict]: One result per link, in the same order as `links`. Failed downloads
+        have status 'error' and an 'error' message; their `.part` file is kept for resuming.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    if session is None:
+        session = crear_sesion(token, pool_size=max_workers)
+
+    results = [None] * len(links)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_descargar_con_limite, limite, session, link, output_dir): i
+                   for i, link in enumerate(links)}
+
+        for future in as_completed(futures):
+            i = futures[future]
+            filename = links[i].split("/")[-1]
+            try:
+                result = future.result()
+            except (requests.exceptions.RequestException, IOError) as e:
+                print(f"⚠️ Error downloading {filename}: {e}")
+                result = {"filename": filename, "path": Path(output_dir) / filename, "bytes": 0,
+                          "seconds": 0.0, "mb_s": 0.0, "resumed": False, "status": "error",
+                          "error": str(e)}
+            else:
+                if result["status"] == "exists":
+                    print(f"📁 {filename} already on disk.")
+                else:
+                    resumed = " (resumed)" if result["resumed"] else ""
+                    print(f"📥 {filename}: {result['bytes'] / 1e6:.1f} MB in "
+                          f"{result['seconds']:.1f} s ({result['mb_s']:.2f} MB/s){resumed}")
+            results[i] = result
+
+    return results
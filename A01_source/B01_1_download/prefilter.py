@@ -0,0 +1,227 @@
+import re
+import csv
+import io
+import datetime
+import requests
+
+
+# === CONSTANTS ===
+
+GEOMETA_URL = "https://ladsweb.modaps.eosdis.nasa.gov/archive/geoMeta/{collection}/{satellite}/{year}/{product}_{date}.txt"
+"""
+str: Template of the LAADS daily geolocation metadata table (one line per granule with
+DayNightFlag and bounding coordinates). It is a few KB, against hundreds of MB per granule.
+"""
+
+GEOMETA_SATELLITE = "JPSS1"
+"""
+str: Satellite folder of NOAA-20 (VJ1 products) inside the geoMeta archive.
+"""
+
+GEOMETA_PRODUCT = "VJ103IMG"
+"""
+str: Geolocation product whose metadata describes the footprint of each VJ102IMG granule.
+"""
+
+_GRANULE_KEY = re.compile(r"\.(A\d{7}\.\d{4})\.")
+
+_FLAGS = {"n": "Night", "night": "Night", "d": "Day", "day": "Day", "b": "Both", "both": "Both"}
+
+_BBOX_KEYS = {
+    "sur": ("SouthBoundingCoordinate", "SouthBoundingCoord", "south"),
+    "norte": ("NorthBoundingCoordinate", "NorthBoundingCoord", "north"),
+    "este": ("EastBoundingCoordinate", "EastBoundingCoord", "east"),
+    "oeste": ("WestBoundingCoordinate", "WestBoundingCoord", "west"),
+}
+
+
+# === FUNCTIONS ===
+
+def clave_granulo(filename):
+    """
+    Extracts the acquisition key shared by all products of the same granule.
+
+    Args:
+        filename (str): Granule file name (e.g., 'VJ102IMG.A2025123.0254.021.2025123093512.nc').
+
+    Returns:
+        str | None: Key such as 'A2025123.0254', or None if the name does not follow the pattern.
+    """
+    match = _GRANULE_KEY.search(filename)
+    return match.group(1) if match else None
+
+
+def _normalizar_flag(value):
+    if value is None:
+        return None
+    return _FLAGS.get(str(value).strip().lower())
+
+
+def _leer_metadatos(record):
+    """Builds a metadata dict (flag + bounding box) from a listing entry or a geoMeta row."""
+    flag = None
+    for key in ("DayNightFlag", "dayNightFlag", "illumination", "illuminations"):
+        if record.get(key) not in (None, ""):
+            flag = _normalizar_flag(record[key])
+            break
+
+    meta = {"flag": flag}
+    for name, keys in _BBOX_KEYS.items():
+        meta[name] = None
+        for key in keys:
+            if record.get(key) not in (None, ""):
+                meta[name] = float(record[key])
+                break
+    return meta
+
+
+def metadatos_de_listado(entry):
+    """
+    Reads the day/night flag and the bounding box of a granule from its LAADS `content/details` entry.
+
+    Args:
+        entry (dict): One element of the 'content' list returned by the API.
+
+    Returns:
+        dict: Keys 'flag' ('Night', 'Day', 'Both' or None) and 'sur', 'norte', 'este', 'oeste'
+        (float or None). Missing values are None.
+    """
+    return _leer_metadatos(entry)
+
+
+def generar_url_geometa(year, doy, collection, satellite=GEOMETA_SATELLITE, product=GEOMETA_PRODUCT):
+    """
+    Constructs the URL of the geoMeta table for a given day.
+
+    Args:
+        year (str): The year in YYYY format.
+        doy (str): The day of the year (DOY), zero-padded (e.g., '099').
+        collection (str): The collection number (e.g., '5201').
+        satellite (str): Satellite folder in the geoMeta archive.
+        product (str): Geolocation product name.
+
+    Returns:
+        str: URL of the daily geoMeta text file.
+    """
+    date = datetime.datetime.strptime(f"{year}{doy}", "%Y%j").strftime("%Y-%m-%d")
+    return GEOMETA_URL.format(collection=collection, satellite=satellite, year=year,
+                              product=product, date=date)
+
+
+def leer_geometa(text):
+    """
+    Parses a geoMeta table.
+
+    The file starts with '#' comment lines; the last one that mentions 'GranuleID' is the header.
+
+    Args:
+        text (str): Content of the geoMeta file.
+
+    Returns:
+        dict: Granule key (see `clave_granulo`) -> metadata dict as in `metadatos_de_listado`.
+    """
+    lines = text.splitlines()
+    header = None
+    rows = []
+    for line in lines:
+        if line.startswith("#"):
+            if "GranuleID" in line:
+                header = [h.strip() for h in line.lstrip("#").split(",")]
+        elif line.strip():
+            rows.append(line)
+
+    if header is None:
+        return {}
+
+    table = {}
+    for record in csv.DictReader(io.StringIO("\n".join(rows)), fieldnames=header):
+        key = clave_granulo(record.get("GranuleID") or "")
+        if key:
+            table[key] = _leer_metadatos(record)
+    return table
+
+
+def cargar_geometa(session, year, doy, collection):
+    """
+    Downloads and parses the geoMeta table of a day.
+
+    Args:
+        session (requests.Session): Authenticated session.
+        year (str): The year in YYYY format.
+        doy (str): The day of the year (DOY), zero-padded.
+        collection (str): The collection number.
+
+    Returns:
+        dict: Output of `leer_geometa()`, or an empty dict if the table is not available.
+    """
+    url = generar_url_geometa(year, doy, collection)
+    try:
+        response = session.get(url, timeout=(30, 60))
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️ geoMeta table not available ({e}). Falling back to listing metadata.")
+        return {}
+    return leer_geometa(response.text)
+
+
+def es_candidato(meta, cubre):
+    """
+    Decides from metadata alone whether a granule can be a nighttime image over the site.
+
+    Args:
+        meta (dict): Metadata as returned by `metadatos_de_listado()` or `leer_geometa()`.
+        cubre (callable): Site check with signature (sur, norte, este, oeste) -> bool,
+            e.g. `esta_en_la_palma`.
+
+    Returns:
+        bool | None: False if the granule certainly does not match, True if it does,
+        None if the metadata is not enough to decide (the granule must be downloaded and checked).
+    """
+    if meta["flag"] is not None and meta["flag"] != "Night":
+        return False
+
+    bbox = [meta[k] for k in ("sur", "norte", "este", "oeste")]
+    if None not in bbox and not cubre(*bbox):
+        return False
+
+    if meta["flag"] is None or None in bbox:
+        return None
+    return True
+
+
+def filtrar_candidatos(entries, cubre, geometa=None):
+    """
+    Splits a LAADS listing into granules worth downloading and granules that can be skipped.
+
+    Listing metadata is used first; the geoMeta table fills in whatever the listing lacks.
+    Granules whose metadata is incomplete are kept as candidates, so the post-download
+    check still has the final word and nothing valid is lost.
+
+    Args:
+        entries (list[dict]): 'content' list of the LAADS `content/details` response.
+        cubre (callable): Site check with signature (sur, norte, este, oeste) -> bool.
+        geometa (dict, optional): Output of `cargar_geometa()`.
+
+    Returns:
+        tuple:
+            - candidatos (list[dict]): Entries that match or could match.
+            - descartados (list[dict]): Entries that certainly do not match.
+    """
+    geometa = geometa or {}
+    candidatos, descartados = [], []
+
+    for entry in entries:
+        meta = metadatos_de_listado(entry)
+        name = entry.get("name") or entry.get("downloadsLink", "").split("/")[-1]
+        extra = geometa.get(clave_granulo(name))
+        if extra:
+            for k, v in extra.items():
+                if meta[k] is None:
+                    meta[k] = v
+
+        if es_candidato(meta, cubre) is False:
+            descartados.append(entry)
+        else:
+            candidatos.append(entry)
+
+    return candidatos, descartados
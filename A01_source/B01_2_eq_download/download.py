@@ -5,8 +5,12 @@ import pandas as pd
 import os
 try:
     from . import utils as utils
+    from . import event_store
+    from . import sync
 except ImportError:
     import utils as utils
+    import event_store
+    import sync
     
 from tqdm import tqdm
 
@@ -44,7 +48,13 @@ def search_by_minimum_magnitude(date_i, date_f, min_mag, center_coords, reg_rad)
 
 #-------------------------------------------------------------------------
 
-def download_all_by_region(date_i, date_f, center_coords, reg_rad):
+def download_all_by_region(date_i, date_f, center_coords, reg_rad, incremental=True):
+
+    # incremental=False: full refresh, the whole window is downloaded again and wrk_df rewritten
+    if incremental:
+        # Only the events new or updated since the last download of the region, upserted into wrk_df
+        merged_df, _, _ = sync.sync_region(date_i, date_f, center_coords, [(reg_rad, 1)], store="wrk_df")
+        return merged_df, center_coords
 
     lat_cent, lon_cent = center_coords
     lat_min, lat_max, lon_min, lon_max = utils.limit_region_coords(lat_cent, lon_cent, reg_rad)
@@ -96,12 +106,19 @@ def working_df(df1, df2, file_name = "wrk_df.csv"):
             merged_df[col] = merged_df[f"{col}_y"]
             merged_df.drop(columns=[f"{col}_x", f"{col}_y"], inplace=True)
 
-    utils.saving_data(merged_df, f"{file_name}", folder = "B_eq_processed")
+    # Typed Parquet store (A00_data/B_eq_processed/wrk_df/year=YYYY/) instead of a CSV
+    event_store.save_events(merged_df, file_name)
 
     return merged_df
 
-def download_optimized(date_i, date_f, center_coords, reg_rad):
+def download_optimized(date_i, date_f, center_coords, reg_rad, incremental=True):
     min_mag, distance_list = utils.simulate_min_mag_by_radius(reg_rad, max_trigger_index= 100.0, L_method= "Singh")
+
+    # incremental=False: full refresh, the whole window is downloaded again and wrk_df rewritten
+    if incremental:
+        # One high-water mark per radius (each one has its own minimum magnitude)
+        merged_df, _, _ = sync.sync_region(date_i, date_f, center_coords, list(zip(distance_list, min_mag)), store="wrk_df")
+        return merged_df, center_coords
     
     lat_cent, lon_cent = center_coords
     lat_min, lat_max, lon_min, lon_max = utils.limit_region_coords(lat_cent, lon_cent, reg_rad)
@@ -0,0 +1,139 @@
+import os
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from A01_source.B01_2_eq_download import event_store
+from A01_source.B01_2_eq_download.utils import R_earth, limit_region_coords
+
+# Spatial indexes of the event stores already built, by store folder: {path: (signature, EventIndex)}
+_indexes = {}
+
+
+def unit_vectors(lat, lon):
+    """Points given in degrees as (n, 3) vectors on the unit sphere"""
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def chord(distance):
+    """Straight-line distance on the unit sphere for a great-circle distance in km"""
+    return 2 * np.sin(np.minimum(np.asarray(distance, dtype=float) / (2 * R_earth), np.pi / 2))
+
+
+def arc(chord_length):
+    """Great-circle distance in km for a straight-line distance on the unit sphere (inverse of chord)"""
+    return 2 * R_earth * np.arcsin(np.minimum(np.asarray(chord_length, dtype=float) / 2, 1.0))
+
+
+def inside_polygon(lat, lon, poly_lat, poly_lon):
+    """
+    Points inside a polygon given by its vertices (ray casting on the lat/lon plane, so the
+    edges are straight lines on the map). The polygon may be closed or not.
+    """
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    y1, x1 = np.asarray(poly_lat, dtype=float), np.asarray(poly_lon, dtype=float)
+    y2, x2 = np.roll(y1, -1), np.roll(x1, -1)
+    inside = np.zeros(lat.shape, dtype=bool)
+    for a, b, c, d in zip(y1, x1, y2, x2):
+        crosses = (a > lat) != (c > lat)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_cross = b + (lat - a) * (d - b) / (c - a)
+        inside ^= crosses & (lon < x_cross)
+    return inside
+
+
+class EventIndex:
+    """
+    Spatial index over earthquake events. The epicentres are kept in a KD-tree as vectors on the
+    unit sphere, where the straight-line distance grows with the great-circle one, so radius and
+    nearest queries are exact haversine queries that only visit the branches of the tree near the
+    point instead of every event.
+    """
+
+    def __init__(self, events):
+        events = pd.DataFrame(events)
+        latitude = pd.to_numeric(events["latitude"], errors="coerce").to_numpy(dtype=float)
+        longitude = pd.to_numeric(events["longitude"], errors="coerce").to_numpy(dtype=float)
+        # Events without coordinates cannot be located: they are left out of the index
+        located = np.isfinite(latitude) & np.isfinite(longitude)
+        self.events = events[located].reset_index(drop=True)
+        self.tree = cKDTree(unit_vectors(latitude[located], longitude[located]))
+
+    @classmethod
+    def from_store(cls, name="wrk_df", folder="B_eq_processed"):
+        """
+        Index of an event store. It is built the first time and kept while the store files
+        do not change (save_events replaces them, so a saved store is indexed again).
+        """
+        path = event_store.store_path(name, folder)
+        signature = []
+        for root, _, files in os.walk(path):
+            for file in files:
+                stat = os.stat(os.path.join(root, file))
+                signature.append((os.path.join(root, file), stat.st_mtime_ns, stat.st_size))
+        signature = tuple(sorted(signature))
+
+        cached = _indexes.get(path)
+        if cached is None or cached[0] != signature or not signature:
+            cached = (signature, cls(event_store.load_events(name, folder=folder)))
+            _indexes[path] = cached
+        return cached[1]
+
+    def __len__(self):
+        return len(self.events)
+
+    def within_radius(self, lat, lon, radius, return_distance=False):
+        """
+        Events less than `radius` km (great circle) away from a point, in the order of the store.
+        With return_distance=True, their distances in km are returned too.
+        """
+        center = unit_vectors([lat], [lon])[0]
+        rows = np.sort(np.asarray(self.tree.query_ball_point(center, chord(radius)), dtype=np.int64))
+        events = self.events.iloc[rows].reset_index(drop=True)
+        if return_distance:
+            return events, arc(np.linalg.norm(self.tree.data[rows] - center, axis=1))
+        return events
+
+    def nearest(self, lat, lon, k=1, return_distance=False):
+        """The k events nearest to a point, nearest first (fewer if the index has fewer events)"""
+        k = min(int(k), len(self))
+        if k == 0:
+            rows, distance = np.array([], dtype=np.int64), np.array([])
+        else:
+            distance, rows = self.tree.query(unit_vectors([lat], [lon])[0], k=k)
+            rows, distance = np.atleast_1d(rows), arc(np.atleast_1d(distance))
+        events = self.events.iloc[rows].reset_index(drop=True)
+        return (events, distance) if return_distance else events
+
+    def within_polygon(self, poly_lat, poly_lon):
+        """
+        Events inside a polygon given by the latitudes and longitudes of its vertices, in the order
+        of the store. Only the events of the smallest cap around the polygon are tested one by one.
+        """
+        poly_lat, poly_lon = np.asarray(poly_lat, dtype=float), np.asarray(poly_lon, dtype=float)
+        # The edges are straight on the map: sample them to bound the polygon with a cap
+        t = np.linspace(0, 1, 17)[:, None]
+        edge_lat = poly_lat + t * (np.roll(poly_lat, -1) - poly_lat)
+        edge_lon = poly_lon + t * (np.roll(poly_lon, -1) - poly_lon)
+        border = unit_vectors(edge_lat.ravel(), edge_lon.ravel())
+        center = border.mean(axis=0)
+        center /= np.linalg.norm(center)
+        radius = np.linalg.norm(border - center, axis=1).max() * 1.01
+
+        rows = np.sort(np.asarray(self.tree.query_ball_point(center, radius), dtype=np.int64))
+        candidates = self.events.iloc[rows]
+        inside = inside_polygon(candidates["latitude"].to_numpy(dtype=float),
+                                candidates["longitude"].to_numpy(dtype=float), poly_lat, poly_lon)
+        return candidates[inside].reset_index(drop=True)
+
+
+def region_events(name, center_coords, region_rad, folder="B_eq_processed"):
+    """
+    Events of a store inside the box of a download region (the one limit_region_coords gives
+    for its centre and radius), the same selection for every map of the store.
+    """
+    lat_cent, lon_cent = center_coords
+    lat_min, lat_max, lon_min, lon_max = limit_region_coords(lat_cent, lon_cent, region_rad)
+    return EventIndex.from_store(name, folder).within_polygon([lat_min, lat_min, lat_max, lat_max],
+                                                              [lon_min, lon_max, lon_max, lon_min])
@@ -0,0 +1,137 @@
+import os
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# Data folder of the project (A00_data)
+data_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "A00_data"))
+
+# Typed columns of the earthquake catalogue (distance and trigger_index are filled by the preprocessing)
+EVENT_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("time", pa.timestamp("ms")),
+    ("magnitude", pa.float64()),
+    ("magtype", pa.string()),
+    ("latitude", pa.float64()),
+    ("longitude", pa.float64()),
+    ("depth", pa.float64()),
+    ("distance", pa.float64()),
+    ("trigger_index", pa.float64()),
+])
+
+# Partition column: one folder per year (year=YYYY/), so a time range only opens its years
+PARTITIONING = ds.partitioning(pa.schema([("year", pa.int16())]), flavor="hive")
+STORE_SCHEMA = EVENT_SCHEMA.append(pa.field("year", pa.int16()))
+
+
+def store_path(name, folder="B_eq_processed"):
+    """
+    Folder of an event store in A00_data/<folder>. The name is the one of the former CSV file,
+    with or without the extension (e.g. "wrk_df" or "wrk_df.csv").
+    """
+    return os.path.join(data_dir, folder, os.path.splitext(name)[0])
+
+
+def to_table(df):
+    """Events DataFrame as an Arrow table with EVENT_SCHEMA (missing columns are left empty) and the year"""
+    df = pd.DataFrame(df).reset_index(drop=True)
+    columns = {}
+    for field in EVENT_SCHEMA:
+        if field.name not in df.columns:
+            columns[field.name] = pa.nulls(len(df), field.type)
+        elif field.name == "time":
+            # ComCat times are UTC with millisecond precision; naive times are taken as UTC as well
+            times = pd.to_datetime(df["time"], errors="coerce", utc=True).dt.tz_convert(None).dt.floor("ms")
+            columns["time"] = pa.array(times, field.type)
+        elif pa.types.is_string(field.type):
+            columns[field.name] = pa.array(df[field.name].astype("string"), field.type)
+        else:
+            columns[field.name] = pa.array(pd.to_numeric(df[field.name], errors="coerce"), field.type, from_pandas=True)
+    table = pa.table(columns, schema=EVENT_SCHEMA)
+    years = pd.DatetimeIndex(table["time"].to_pandas()).year
+    return table.append_column("year", pa.array(years.fillna(0).astype("int16"), pa.int16()))
+
+
+def save_events(df, name="wrk_df", folder="B_eq_processed"):
+    """
+    Writes an events DataFrame as a Parquet store partitioned by year, replacing the previous one.
+    The new store is written next to the old one and swapped in at the end.
+    """
+    path = store_path(name, folder)
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    ds.write_dataset(to_table(df), tmp, format="parquet", partitioning=PARTITIONING,
+                     existing_data_behavior="overwrite_or_ignore")
+    os.makedirs(tmp, exist_ok=True)  # An empty selection is still a (empty) store
+
+    old = path + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+    print(f"Data saved to {path}")
+
+
+def migrate_csv(name, folder="B_eq_processed"):
+    """Imports the former CSV file of a store (A00_data/<folder>/<name>.csv), if there is one. Done once."""
+    csv_path = store_path(name, folder) + ".csv"
+    if not os.path.exists(csv_path):
+        return False
+    save_events(pd.read_csv(csv_path), name, folder)
+    return True
+
+
+def events_filter(start=None, end=None, min_magnitude=None, max_magnitude=None, max_trigger_index=None):
+    """
+    Arrow filter expression for the given limits (all optional, both ends included). The time
+    limits also select the year partitions, so the other years are not even opened.
+    """
+    conditions = []
+    if start is not None:
+        start = pd.Timestamp(start)
+        conditions += [ds.field("year") >= start.year, ds.field("time") >= pa.scalar(start, pa.timestamp("ms"))]
+    if end is not None:
+        end = pd.Timestamp(end)
+        conditions += [ds.field("year") <= end.year, ds.field("time") <= pa.scalar(end, pa.timestamp("ms"))]
+    if min_magnitude is not None:
+        conditions.append(ds.field("magnitude") >= min_magnitude)
+    if max_magnitude is not None:
+        conditions.append(ds.field("magnitude") <= max_magnitude)
+    if max_trigger_index is not None:
+        conditions.append(ds.field("trigger_index") <= max_trigger_index)
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def load_events(name="wrk_df", columns=None, start=None, end=None, min_magnitude=None, max_magnitude=None,
+                max_trigger_index=None, folder="B_eq_processed"):
+    """
+    Reads the events of a store. Only the requested columns are read and the limits are pushed
+    down to Parquet (year partitions and row group statistics), so rows out of range are skipped
+    without being loaded.
+
+    Parameters:
+        name (str): Store name (e.g. "wrk_df" or "trigger_index_filtered").
+        columns (list): Columns to return. All the EVENT_SCHEMA columns by default.
+        start, end: Time limits (anything pd.Timestamp accepts).
+        min_magnitude, max_magnitude, max_trigger_index: Value limits.
+        folder (str): Folder of A00_data with the store.
+
+    Returns:
+        pd.DataFrame: Events year by year, in the order they were saved, with `time` as datetime64.
+        Empty (with the columns) if the store does not exist.
+    """
+    path = store_path(name, folder)
+    columns = list(columns) if columns is not None else EVENT_SCHEMA.names
+    if not os.path.exists(path) and not migrate_csv(name, folder):
+        return pd.DataFrame({c: pd.Series(dtype=EVENT_SCHEMA.field(c).type.to_pandas_dtype()) for c in columns})
+
+    dataset = ds.dataset(path, schema=STORE_SCHEMA, format="parquet", partitioning=PARTITIONING)
+    expression = events_filter(start, end, min_magnitude, max_magnitude, max_trigger_index)
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
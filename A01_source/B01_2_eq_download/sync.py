@@ -0,0 +1,200 @@
+import json
+import os
+import pandas as pd
+import requests
+
+try:
+    from . import utils as utils
+    from . import event_store
+except ImportError:
+    import utils as utils
+    import event_store
+
+# ComCat FDSN event web service (the same one libcomcat's search uses)
+FDSN_URL = "https://earthquake.usgs.gov/fdsnws/event/1/query"
+TIMEOUT = 60
+PAGE_SIZE = 20000  # Maximum number of events the service returns per query
+
+# High-water marks of the synchronised regions, in A00_data/B_eq_processed
+STATE_FILE = "sync_state.json"
+
+SUMMARY_COLUMNS = ["id", "time", "updated", "magnitude", "magtype", "latitude", "longitude", "depth"]
+
+
+def state_path(folder="B_eq_processed"):
+    return os.path.join(event_store.data_dir, folder, STATE_FILE)
+
+
+def load_state(folder="B_eq_processed"):
+    """High-water marks by region: {region key: {"start", "end", "time", "updated"}} (ISO times)"""
+    path = state_path(folder)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state, folder="B_eq_processed"):
+    path = state_path(folder)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def region_key(store, center_coords, reg_rad, min_magnitude):
+    """Key of a region in the state file: store, centre, radius and minimum magnitude"""
+    lat_cent, lon_cent = center_coords
+    return f"{store}|{lat_cent:.5f},{lon_cent:.5f}|r={float(reg_rad):g}|m={float(min_magnitude):g}"
+
+
+def mark_overlaps(mark, start, end):
+    """Whether a high-water mark is usable for the window [start, end] (it overlaps the window synchronised)"""
+    return (mark is not None and mark.get("updated") is not None
+            and start < pd.Timestamp(mark["end"]) and end > pd.Timestamp(mark["start"]))
+
+
+def sync_windows(start, end, mark):
+    """
+    Queries needed to bring a region up to date, as (starttime, endtime, updatedafter).
+    The part of [start, end] already synchronised only asks for the events updated after the
+    mark (new events are updated events too); the rest of the window is downloaded whole.
+    """
+    if not mark_overlaps(mark, start, end):
+        return [(start, end, None)]
+
+    m_start, m_end = pd.Timestamp(mark["start"]), pd.Timestamp(mark["end"])
+    windows = [(max(start, m_start), min(end, m_end), pd.Timestamp(mark["updated"]))]
+    if start < m_start:
+        windows.append((start, m_start, None))
+    if end > m_end:
+        windows.append((m_end, end, None))
+    return windows
+
+
+def parse_features(features):
+    """GeoJSON features of the FDSN service as a DataFrame with SUMMARY_COLUMNS (times in UTC, naive)"""
+    rows = []
+    for feature in features:
+        properties = feature.get("properties") or {}
+        lon, lat, depth = (feature.get("geometry") or {}).get("coordinates", [None, None, None])[:3]
+        rows.append([feature["id"], properties.get("time"), properties.get("updated"), properties.get("mag"),
+                     properties.get("magType"), lat, lon, depth])
+
+    df = pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+    for col in ("time", "updated"):
+        df[col] = pd.to_datetime(pd.to_numeric(df[col]), unit="ms")
+    return df
+
+
+def fetch_events(session, url, params):
+    """All the events of a query (in pages of PAGE_SIZE), as a DataFrame with SUMMARY_COLUMNS"""
+    pages = []
+    offset = 1
+    while True:
+        response = session.get(url, params={**params, "format": "geojson", "orderby": "time-asc",
+                                            "limit": PAGE_SIZE, "offset": offset}, timeout=TIMEOUT)
+        response.raise_for_status()
+        features = response.json().get("features", []) if response.status_code != 204 else []
+        pages.append(parse_features(features))
+        if len(features) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+    return pd.concat(pages, ignore_index=True)
+
+
+def fetch_detail(session, url, event_id):
+    """Preferred origin and magnitude of one event (the detail libcomcat reads for every event)"""
+    response = session.get(url, params={"eventid": event_id, "format": "geojson"}, timeout=TIMEOUT)
+    response.raise_for_status()
+    return parse_features([response.json()]).iloc[0]
+
+
+def upsert_events(df, name="wrk_df", folder="B_eq_processed"):
+    """
+    Inserts the events of df into a store, replacing the stored ones with the same id.
+    The replaced events lose their distance and trigger index (they are computed again).
+    """
+    stored = event_store.load_events(name, folder=folder)
+    stored = stored[~stored["id"].isin(df["id"])]
+    merged = pd.concat([stored, df.reindex(columns=stored.columns)], ignore_index=True)
+    merged = merged.sort_values("time", kind="stable").reset_index(drop=True)
+    event_store.save_events(merged, name, folder)
+    return merged
+
+
+def sync_region(date_i, date_f, center_coords, regions, store="wrk_df", url=FDSN_URL, session=None,
+                folder="B_eq_processed"):
+    """
+    Incremental download of the earthquakes of one or more circular regions into an event store.
+
+    Each region (radius in km, minimum magnitude) keeps a high-water mark in the state file: the
+    latest event time and the latest update time seen. Only the events updated after the mark are
+    asked for, they are upserted into the store by id and the detail is only fetched for the ids
+    the store did not have.
+
+    Parameters:
+        date_i, date_f (str): Time window ("YYYY-MM-DD HH:MM", as in download.ref).
+        center_coords (tuple): (latitude, longitude) of the centre.
+        regions (list): [(radius, min_magnitude), ...].
+        store (str): Event store updated.
+        url (str): FDSN event query endpoint.
+        session (requests.Session, optional): Shared session.
+
+    Returns:
+        tuple: (store DataFrame, number of new events, number of updated events).
+    """
+    session = session or requests.Session()
+    start = pd.Timestamp(date_i)
+    end = pd.Timestamp(date_f)
+    lat_cent, lon_cent = center_coords
+    state = load_state(folder)
+
+    received = []
+    marks = {}
+    for reg_rad, min_magnitude in regions:
+        key = region_key(store, center_coords, reg_rad, min_magnitude)
+        mark = state.get(key)
+        lat_min, lat_max, lon_min, lon_max = utils.limit_region_coords(lat_cent, lon_cent, reg_rad)
+        params = {"minlatitude": lat_min, "maxlatitude": lat_max, "minlongitude": lon_min, "maxlongitude": lon_max,
+                  "minmagnitude": min_magnitude, "eventtype": "earthquake"}
+
+        events = []
+        for w_start, w_end, updated_after in sync_windows(start, end, mark):
+            query = {**params, "starttime": w_start.isoformat(), "endtime": w_end.isoformat()}
+            if updated_after is not None:
+                query["updatedafter"] = updated_after.isoformat()
+            events.append(fetch_events(session, url, query))
+        events = pd.concat(events, ignore_index=True)
+        received.append(events)
+
+        if not mark_overlaps(mark, start, end):
+            mark = {"start": start.isoformat(), "end": end.isoformat(), "time": None, "updated": None}
+        else:
+            mark = {**mark, "start": min(start, pd.Timestamp(mark["start"])).isoformat(),
+                    "end": max(end, pd.Timestamp(mark["end"])).isoformat()}
+        for col in ("time", "updated"):
+            latest = [t for t in (events[col].max(), mark[col]) if t is not None and not pd.isna(t)]
+            mark[col] = max(pd.Timestamp(t) for t in latest).isoformat() if latest else None
+        marks[key] = mark
+
+    events = pd.concat(received, ignore_index=True).drop_duplicates(subset="id", keep="last")
+    stored_ids = set(event_store.load_events(store, columns=["id"], folder=folder)["id"])
+    new = events[~events["id"].isin(stored_ids)]
+
+    # Detail only for the new events; the updated ones keep their summary values
+    if not new.empty:
+        details = pd.DataFrame([fetch_detail(session, url, event_id) for event_id in new["id"]])
+        events = events.set_index("id")
+        events.update(details.set_index("id").drop(columns="updated"))
+        events = events.reset_index()
+
+    merged = upsert_events(events.drop(columns="updated"), store, folder) if not events.empty else \
+        event_store.load_events(store, folder=folder)
+
+    # The marks are only moved once the events are safely in the store
+    state.update(marks)
+    save_state(state, folder)
+
+    print(f"{len(new)} new and {len(events) - len(new)} updated events in '{store}'")
+    return merged, len(new), len(events) - len(new)
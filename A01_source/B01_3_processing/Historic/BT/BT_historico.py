@@ -2,78 +2,64 @@ import numpy as np
 from netCDF4 import Dataset
 from pathlib import Path
 import re
-import glob
-import os
-from datetime import datetime, timedelta
+import sys
+from datetime import datetime
+
+# Project root on the path to reuse the downloader (and its granule cache), the file catalogue
+# and the gridding of the daily stages
+project_dir = Path(__file__).resolve().parents[4]
+sys.path.append(str(project_dir))
+from A01_source.B01_1_download import backfill, download
+from A01_source.B01_3_processing import stages
+from A02_utils.catalog import FileCatalog
+from A02_utils.sites import get_site
 
 # === CONFIGURE YOUR DATE RANGE HERE ===
 start_date = datetime(2025, 1, 1)
 end_date = datetime(2025, 4, 29)
 
 # === FUNCTIONS ===
-def radiance_to_bt(radiance, wavelength_um):
+def process_nc_file(nc_file, output_base_path, site="Lanzarote"):
     """
-    Converts radiance values to brightness temperature (BT) using Planck's law.
-
-    Parameters:
-        radiance (ndarray): Radiance values.
-        wavelength_um (float): Wavelength in micrometers.
-
-    Returns:
-        ndarray: Brightness temperature in Kelvin.
-    """
-    c1 = 1.191042e8   # W·µm⁴/m²/sr
-    c2 = 1.4387752e4  # µm·K
-    with np.errstate(divide='ignore', invalid='ignore'):
-        bt = c2 / (wavelength_um * np.log((c1 / (radiance * wavelength_um**5)) + 1))
-        bt = np.where((radiance > 0) & np.isfinite(bt), bt, np.nan)
-    return bt
-
-def process_nc_file(nc_file, output_base_path):
-    """
-    Processes a NetCDF file: extracts radiance data, converts it to
-    brightness temperature, and saves the result as a new NetCDF.
+    Processes a VJ102IMG granule: converts its I05 radiance to brightness temperature on the
+    fixed grid of the site (stages.process_to_grid, with the pixel positions of its VJ103IMG
+    geolocation granule) and saves the day as a new NetCDF with 2-D latitude/longitude.
 
     Parameters:
         nc_file (Path): Input NetCDF file path.
         output_base_path (Path): Output directory base path.
-    """
-    with Dataset(nc_file) as nc:
-        obs = nc.groups['observation_data']
-
-        i05 = obs["I05"][:]
-        bt_i05 = radiance_to_bt(i05.filled(np.nan), 11.45)
-
-        bt_min = np.nanmin(bt_i05)
-        bt_max = np.nanmax(bt_i05)
-        bt_mean = np.nanmean(bt_i05)
-        print(f"\nFile: {nc_file.name}")
-        print(f"BT min: {bt_min:.2f} K")
-        print(f"BT max: {bt_max:.2f} K")
-        print(f"BT mean: {bt_mean:.2f} K")
-
-        south = nc.getncattr('SouthBoundingCoordinate')
-        north = nc.getncattr('NorthBoundingCoordinate')
-        west = nc.getncattr('WestBoundingCoordinate')
-        east = nc.getncattr('EastBoundingCoordinate')
-
-        n_lines, n_pixels = i05.shape
-        latitudes = np.linspace(north, south, n_lines)
-        longitudes = np.linspace(west, east, n_pixels)
-        lon_grid, lat_grid = np.meshgrid(longitudes, latitudes)
+        site (str): Site name in A02_utils.sites.
 
+    Returns:
+        Path: The saved file, or None if the granule does not cover the site.
+    """
     # Extract date from filename
     match = re.search(r"A(\d{4})(\d{3})", nc_file.name)
     if not match:
         print(f"Could not extract date from {nc_file.name}")
-        return
+        return None
     yyyy, ddd = match.groups()
     file_date = datetime.strptime(f"{yyyy}{ddd}", "%Y%j")
 
+    geo_file = stages.geolocation_file(nc_file)
+    if geo_file is None:
+        print(f"→ No VJ103IMG geolocation for {nc_file.name}; using the bounding box grid.")
+    scene = stages.process_to_grid(nc_file, file_date, site, geo_file)
+    if scene is None:
+        print(f"{nc_file.name} does not cover {site}")
+        return None
+
+    bt_i05 = scene.values[0]
+    print(f"\nFile: {nc_file.name}")
+    print(f"BT min: {np.nanmin(bt_i05):.2f} K")
+    print(f"BT max: {np.nanmax(bt_i05):.2f} K")
+    print(f"BT mean: {np.nanmean(bt_i05):.2f} K")
+    lon_grid, lat_grid = np.meshgrid(scene["longitude"].values, scene["latitude"].values)
+
     # Create output folder and file
     output_folder = output_base_path / f"{yyyy}_{ddd}"
     output_folder.mkdir(parents=True, exist_ok=True)
-    output_nc = output_folder / f"BT_LaPalma_VJ102IMG_{yyyy}_{ddd}.nc"
+    output_nc = output_folder / f"BT_{get_site(site)['tag']}_VJ102IMG_{yyyy}_{ddd}.nc"
 
     # Write the NetCDF file
     with Dataset(output_nc, "w", format="NETCDF4") as dst:
@@ -94,20 +80,27 @@ def process_nc_file(nc_file, output_base_path):
 
         dst.title = f"Daily Brightness Temperature - {yyyy}_{ddd}"
         dst.source_file = nc_file.name
+        if geo_file is not None:
+            dst.geolocation_file = geo_file.name
 
     print(f"Saved: {output_nc}")
+    return output_nc
 
 # === PATH CONFIGURATION ===
-#script_path = Path(__file__).resolve().parent
-input_base_path = Path("./PRACTICAS_EXTERNAS_CSIC/A00_data/B_raw/Lanzarote")
-output_path = Path("./PRACTICAS_EXTERNAS_CSIC/A00_data/B_processed/Lanzarote/BT_daily_pixels")
-
-# === LOOP THROUGH FILES AND FILTER BY DATE ===
-for folder in sorted(input_base_path.glob("20*_???")):
-    for file in folder.glob("VJ102IMG.A*.nc"):
-        match = re.search(r"A(\d{4})(\d{3})", file.name)
-        if match:
-            yyyy, ddd = match.groups()
-            file_date = datetime.strptime(f"{yyyy}{ddd}", "%Y%j")
-            if start_date <= file_date <= end_date:
-                process_nc_file(file, output_path)
\ No newline at end of file
+# Input and output under the project's A00_data, wherever the script is run from
+input_base_path = download.RAW_DIR / "Lanzarote"
+output_path = project_dir / "A00_data" / "B_processed" / "Lanzarote" / "BT_daily_pixels"
+
+if __name__ == "__main__":
+    # === FETCH MISSING DAYS (one backfill for the whole range) ===
+    # Days already in the backfill checkpoint are skipped, including those without any valid
+    # granule, so they are not listed again; the granule cache avoids repeating downloads
+    backfill.backfill(start_date, end_date, ["Lanzarote"])
+
+    # === FILE CATALOGUE (only files added or changed since the last run are read) ===
+    catalog = FileCatalog(download.CATALOG_DIR)
+    catalog.update(input_base_path)
+
+    # === FILES OF THE DATE RANGE, FROM THE CATALOGUE ===
+    for file in catalog.find("VJ102IMG", "Lanzarote", start_date, end_date):
+        process_nc_file(file, output_path)
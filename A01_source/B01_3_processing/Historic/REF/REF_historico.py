@@ -1,140 +1,217 @@
 import os
-import glob
+import sys
+import json
+import argparse
 import numpy as np
-import xarray as xr
-import rioxarray
-from tqdm import tqdm
-from rasterio.enums import Resampling
-from datetime import datetime, timedelta
-import calendar
+from datetime import datetime
 from pathlib import Path
 from dateutil.relativedelta import relativedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # === CONFIGURACIÓN ===
-script_path = Path(__file__).resolve()
-proyecto_dir = next(p for p in script_path.parents if p.name == "PRACTICAS_EXTERNAS_CSIC")
-base_path = proyecto_dir / "A00_data" / "B_processed" / "Lanzarote" / "BT_daily_pixels"
-output_dir = proyecto_dir / "A00_data" / "B_processed" / "Lanzarote" / "REF"
-output_dir.mkdir(parents=True, exist_ok=True)
+# Raíz del proyecto en el path para reutilizar el remuestreo y el acumulador del REF diario
+proyecto_dir = Path(__file__).resolve().parents[4]
+sys.path.append(str(proyecto_dir))
 
-# === FECHAS A PROCESAR ===
+from A01_source.B01_3_processing import archive, resample
+from A01_source.B01_3_processing.ref_accumulator import RefAccumulator, scene_quality
+from A02_utils.sites import get_site, ref_region, site_grid
+
+processed_dir = proyecto_dir / "A00_data" / "B_processed"
+
+# Sitio y fechas por defecto
+SITE = "Lanzarote"
 fecha_inicio = datetime(2025, 1, 1)
 fecha_fin = datetime(2025, 4, 29)
-fecha_actual = fecha_inicio
-
-while fecha_actual <= fecha_fin:
-    año_ref = fecha_actual.year
-    mes_ref = fecha_actual.month
 
+# Meses procesados a la vez (uno por proceso)
+MAX_WORKERS = os.cpu_count() or 1
+
+# Extensión del REF: "roi" (caja ref_roi del sitio y su región FRP) o "malla" (toda la malla fija del sitio)
+EXTENSIONES = ("roi", "malla")
+
+
+# === FUNCIONES ===
+def meses_entre(inicio, fin):
+    """Lista de (año, mes) desde el mes de `inicio` hasta el de `fin`, ambos incluidos"""
+    meses = []
+    actual = datetime(inicio.year, inicio.month, 1)
+    while actual <= fin:
+        meses.append((actual.year, actual.month))
+        actual += relativedelta(months=1)
+    return meses
+
+
+def archivos_por_mes(base_path, meses, site=SITE):
+    """
+    Archivos BT diarios (<base_path>/<YYYY>_<DDD>/BT_*_VJ102IMG_*.nc) agrupados por mes.
+    Se consultan en el índice en caché del archivo BT en lugar de hacer un glob por día juliano.
+    """
+    por_mes = {mes: [] for mes in meses}
+    indice = archive.select(site, base_path=base_path, layout="daily")
+    for dia, ruta in indice["path"].items():
+        archivo = Path(ruta)
+        if (dia.year, dia.month) in por_mes and archivo.name.startswith("BT_") and "_VJ102IMG_" in archivo.name:
+            por_mes[(dia.year, dia.month)].append(archivo)
+    return por_mes
+
+
+def caja_ref(site, extension="roi"):
+    """Caja del REF: la ROI del sitio con su región FRP (sites.ref_region) o, con extension="malla", toda su malla fija"""
+    if extension not in EXTENSIONES:
+        raise ValueError(f"Extensión desconocida: {extension!r} (opciones: {', '.join(EXTENSIONES)})")
+    if extension == "roi":
+        return ref_region(site)
+    grid_lat, grid_lon = site_grid(site)
+    return {"lat_min": float(grid_lat.min()), "lat_max": float(grid_lat.max()),
+            "lon_min": float(grid_lon.min()), "lon_max": float(grid_lon.max())}
+
+
+def guardar_atomico(ref_ds, output_path):
+    """Escribe el NetCDF en un temporal y lo renombra: nunca queda un REF a medio escribir"""
+    tmp = output_path.with_name(f"{output_path.stem}.{os.getpid()}.tmp.nc")
+    ref_ds.to_netcdf(tmp, mode="w")
     try:
-        print(f"\n=== Generando REF para {año_ref}-{mes_ref:02d} ===")
-
-        primer_dia = datetime(año_ref, mes_ref, 1)
-        ultimo_dia = datetime(año_ref, mes_ref, calendar.monthrange(año_ref, mes_ref)[1])
-        julian_inicio = primer_dia.timetuple().tm_yday
-        julian_final = ultimo_dia.timetuple().tm_yday
-
-        archivos = []
-        for dia_juliano in range(julian_inicio, julian_final + 1):
-            carpeta = os.path.join(base_path, f"{año_ref}_{dia_juliano:03d}")
-            archivos += glob.glob(os.path.join(carpeta, f"BT_LaPalma_VJ102IMG_{año_ref}_*.nc"))
-
-        print(f"Archivos encontrados: {len(archivos)}")
-
-        if len(archivos) == 0:
-            print("No hay archivos. Se salta este mes.")
-            fecha_actual += relativedelta(months=1)
-            continue
-
-        # === PASO 2: Plantilla con la primera escena ===
-        ds_ref = xr.open_dataset(archivos[0])
-        bt = ds_ref["BT_I05"]
-        lat = ds_ref["latitude"]
-        lon = ds_ref["longitude"]
-
-        lat1d = lat[:, 0].values
-        lon1d = lon[0, :].values
-
-        bt_template = xr.DataArray(
-            data=bt.data,
-            dims=("latitude", "longitude"),
-            coords={"latitude": lat1d, "longitude": lon1d},
-            name="brightness_temperature"
-        )
-        bt_template.rio.set_spatial_dims(x_dim="longitude", y_dim="latitude", inplace=True)
-        bt_template.rio.write_crs("EPSG:4326", inplace=True)
-
-        # === PASO 3: Reproyectar y filtrar ===
-        stack_reproyectado = []
-        archivos_buenos = []
-
-        for archivo in tqdm(archivos):
-            ds = xr.open_dataset(archivo)
-            bt = ds["BT_I05"]
-            lat = ds["latitude"]
-            lon = ds["longitude"]
-
-            lat1d = lat[:, 0].values
-            lon1d = lon[0, :].values
-
-            bt_scene = xr.DataArray(
-                data=bt.data,
-                dims=("latitude", "longitude"),
-                coords={"latitude": lat1d, "longitude": lon1d},
-                name="brightness_temperature"
-            )
-            bt_scene.rio.set_spatial_dims(x_dim="longitude", y_dim="latitude", inplace=True)
-            bt_scene.rio.write_crs("EPSG:4326", inplace=True)
-
-            bt_aligned = bt_scene.rio.reproject_match(bt_template)
-
-            minval = np.nanmin(bt_aligned.values)
-            stdval = np.nanstd(bt_aligned.values)
-            if stdval > 3 and minval > 210:
-                stack_reproyectado.append(bt_aligned)
-                archivos_buenos.append(os.path.basename(archivo))
-                print(f"{os.path.basename(archivo)} OK (min={minval:.2f}, std={stdval:.2f})")
-            else:
-                print(f"{os.path.basename(archivo)} DESCARTADA (min={minval:.2f}, std={stdval:.2f})")
-
-        print(f"Escenas aceptadas: {len(stack_reproyectado)} / {len(archivos)}")
-
-        if len(stack_reproyectado) == 0:
-            print("No hay escenas útiles. Se salta este mes.")
-            fecha_actual += relativedelta(months=1)
-            continue
-
-        # === PASO 4: Apilar y calcular REF
-        stack = xr.concat(stack_reproyectado, dim="time")
-        stack["time"] = np.arange(len(stack_reproyectado))
-        ref = stack.mean(dim="time", skipna=True)
-
-        # === PASO 6: Guardar NetCDF
-        ref_ds = ref.to_dataset(name="brightness_temperature_REF")
-        ref_ds["brightness_temperature_REF"].attrs["units"] = "K"
-        ref_ds.attrs["descripcion"] = "REF mensual con escenas filtradas (std > 3 y min > 210)"
-        ref_ds.attrs["archivos_usados"] = ", ".join(archivos_buenos)
-        ref_ds = ref_ds.assign_coords({
-            "latitude": (("latitude",), lat1d),
-            "longitude": (("longitude",), lon1d)
-        })
-
-        output_filename = f"Ref_{año_ref}_{mes_ref:02d}.nc"
-        output_path = output_dir / output_filename
-
-        try:
-            if output_path.exists():
-                output_path.unlink()
-            ref_ds.to_netcdf(output_path, mode="w")
-            print(f"¡REF guardada en: {output_path}")
-        except PermissionError:
-            print("No se pudo sobrescribir el archivo. ¿Está abierto en otro programa?")
-            alt_output_path = output_dir / f"Ref_{año_ref}_{mes_ref:02d}_v2.nc"
-            ref_ds.to_netcdf(alt_output_path, mode="w")
-            print(f"REF guardada como versión alternativa: {alt_output_path}")
-
-    except Exception as e:
-        print(f"Error al procesar {año_ref}-{mes_ref:02d}: {e}")
-
-    # Avanzar al mes siguiente
-    fecha_actual += relativedelta(months=1)
\ No newline at end of file
+        os.replace(tmp, output_path)
+    except PermissionError:
+        print("No se pudo sobrescribir el archivo. ¿Está abierto en otro programa?")
+        output_path = output_path.with_name(f"{output_path.stem}_v2.nc")
+        os.replace(tmp, output_path)
+    return output_path
+
+
+def ref_mes(site, año, mes, base_path, output_dir, extension="roi"):
+    """
+    REF de un mes a partir de sus BT diarios, leídos con archive.open_bt.
+
+    Cada escena se lee ya recortada a la caja del REF y se lleva a la malla fija del sitio con los
+    planes de remuestreo compartidos (output_dir/_plans, uno por malla de origen, construido una
+    sola vez para todos los meses y procesos); después se filtran en bloque y se acumulan. Un día
+    con varios archivos usa el primero, como el resto de lectores del archivo BT.
+
+    Por defecto la caja es la ROI del sitio (ref_roi) ampliada con su región FRP, para que el FRP
+    por píxel tenga fondo. Con extension="malla" el REF cubre toda la malla fija del sitio (la
+    ventana de recorte de sites.crop_window), no la pasada completa del primer archivo diario que
+    usaban los REF anteriores.
+
+    Returns:
+        dict: Entrada del manifiesto (mes, estado, escenas encontradas y usadas, archivo).
+    """
+    inicio = datetime(año, mes, 1)
+    fin = inicio + relativedelta(months=1, days=-1)
+    indice = archive.select(site, inicio, fin, base_path, layout="daily")
+    nombres = [Path(ruta).name for ruta in indice.loc[~indice.index.duplicated(keep="first"), "path"]]
+
+    entrada = {"month": f"{año}-{mes:02d}", "status": "skipped", "scenes": len(nombres), "used": []}
+    print(f"\n=== Generando REF para {site} {año}-{mes:02d} ({len(nombres)} escenas) ===")
+    roi = caja_ref(site, extension)
+    escenas = archive.open_bt(site, inicio, fin, roi, base_path, layout="daily")
+    if escenas is None:
+        print("No hay archivos. Se salta este mes.")
+        return entrada
+
+    grid_lat, grid_lon = site_grid(site)
+    cajas, plan = [], None
+    for i in range(escenas.sizes["time"]):
+        escena = escenas.isel(time=i)
+        # Sin las filas y columnas de relleno de las escenas más pequeñas que la mayor
+        filas = np.isfinite(escena["latitude"].values)
+        columnas = np.isfinite(escena["longitude"].values)
+        bt = escena["BT_I05"].values[np.ix_(filas, columnas)]
+        plan = resample.load_plan(output_dir / "_plans", escena["latitude"].values[filas],
+                                  escena["longitude"].values[columnas], grid_lat, grid_lon, roi)
+        cajas.append(resample.apply_plan(bt, plan))
+
+    # Filtro de calidad de todas las escenas a la vez (std > 3 y min > 210), solo sobre la
+    # ref_roi (la región FRP puede tener el foco caliente), y REF en una pasada
+    ref_roi = get_site(site)["ref_roi"]
+    en_roi = np.outer((plan["latitude"] >= ref_roi["lat_min"]) & (plan["latitude"] <= ref_roi["lat_max"]),
+                      (plan["longitude"] >= ref_roi["lon_min"]) & (plan["longitude"] <= ref_roi["lon_max"]))
+    tabla = scene_quality(np.where(en_roi, np.stack(cajas), np.nan), nombres)
+    print(tabla.to_string(float_format="{:.2f}".format))
+    acumulador = RefAccumulator(plan["latitude"], plan["longitude"])
+    acumulador.add_batch(np.stack(cajas), nombres, tabla["accepted"].values)
+
+    entrada["used"] = acumulador.used_scenes
+    print(f"Escenas aceptadas: {len(entrada['used'])} / {len(nombres)}")
+    if not entrada["used"]:
+        print("No hay escenas útiles. Se salta este mes.")
+        return entrada
+
+    ref_ds = acumulador.materialize().swap_dims({"y": "latitude", "x": "longitude"})
+    ref_ds.attrs["descripcion"] = "REF mensual con escenas filtradas (std > 3 y min > 210)"
+    ref_ds.attrs["archivos_usados"] = ", ".join(entrada["used"])
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_path = guardar_atomico(ref_ds, output_dir / f"Ref_{año}_{mes:02d}.nc")
+    print(f"¡REF guardada en: {output_path}")
+    entrada.update(status="ok", file=str(output_path))
+    return entrada
+
+
+def backfill(inicio=fecha_inicio, fin=fecha_fin, site=SITE, max_workers=MAX_WORKERS, base_path=None, output_dir=None,
+             extension="roi"):
+    """
+    Regenera los REF de todos los meses entre `inicio` y `fin`, repartidos entre procesos.
+
+    Cada mes es independiente: se procesa en su propio proceso y escribe su Ref_YYYY_MM.nc de
+    forma atómica. Al terminar se guarda el manifiesto (output_dir/_backfill_manifest.json) con
+    las escenas usadas en cada mes.
+
+    Parameters:
+        inicio, fin (datetime): Primer y último día del rango.
+        site (str): Nombre del sitio en A02_utils.sites.
+        max_workers (int): Número de procesos.
+        base_path (Path): Carpeta de los BT diarios. Por defecto B_processed/<site>/BT_daily_pixels.
+        output_dir (Path): Carpeta de los REF. Por defecto B_processed/<site>/REF.
+        extension (str): "roi" (caja ref_roi del sitio) o "malla" (toda la malla fija del sitio).
+
+    Returns:
+        dict: Manifiesto {"YYYY-MM": entrada de ref_mes}.
+    """
+    base_path = Path(base_path or processed_dir / site / "BT_daily_pixels")
+    output_dir = Path(output_dir or processed_dir / site / "REF")
+    caja_ref(site, extension)
+    meses = meses_entre(inicio, fin)
+    por_mes = archivos_por_mes(base_path, meses, site)
+    print(f"🗓️ REF {site}: {len(meses)} meses con {max_workers} procesos.")
+
+    manifiesto = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futuros = {executor.submit(ref_mes, site, año, mes, base_path, output_dir, extension): (año, mes)
+                   for año, mes in meses}
+        for futuro in as_completed(futuros):
+            año, mes = futuros[futuro]
+            try:
+                entrada = futuro.result()
+            except Exception as e:
+                print(f"Error al procesar {año}-{mes:02d}: {e}")
+                entrada = {"month": f"{año}-{mes:02d}", "status": "error", "error": str(e),
+                           "scenes": len(por_mes[(año, mes)]), "used": []}
+            manifiesto[entrada["month"]] = entrada
+
+    manifiesto = dict(sorted(manifiesto.items()))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    ruta = output_dir / "_backfill_manifest.json"
+    tmp = ruta.with_name(ruta.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifiesto, f, indent=1)
+    os.replace(tmp, ruta)
+
+    hechos = sum(entrada["status"] == "ok" for entrada in manifiesto.values())
+    print(f"✅ REF generados: {hechos} / {len(meses)} meses. Manifiesto: {ruta}")
+    return manifiesto
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regenerate the monthly REF files of a date range in parallel.")
+    parser.add_argument("inicio", nargs="?", default=fecha_inicio.strftime("%Y-%m-%d"), help="First day, YYYY-MM-DD")
+    parser.add_argument("fin", nargs="?", default=fecha_fin.strftime("%Y-%m-%d"), help="Last day, YYYY-MM-DD")
+    parser.add_argument("--site", default=SITE)
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Months processed at the same time")
+    parser.add_argument("--extension", choices=EXTENSIONES, default="roi",
+                        help="REF area: the site ROI and FRP region (default) or the whole fixed site grid")
+    args = parser.parse_args()
+
+    backfill(datetime.strptime(args.inicio, "%Y-%m-%d"), datetime.strptime(args.fin, "%Y-%m-%d"),
+             args.site, args.workers, extension=args.extension)
@@ -0,0 +1,178 @@
+import os
+import re
+import threading
+import numpy as np
+import pandas as pd
+import xarray as xr
+from pathlib import Path
+
+from A01_source.B01_3_processing import bt_cube
+
+# === CONSTANTS ===
+# Project root: this module is in A01_source/B01_3_processing
+processed_dir = Path(__file__).resolve().parents[2] / "A00_data" / "B_processed"
+
+# The two layouts of BT_daily_pixels: monthly cubes (BT_<tag>_VJ102IMG_YYYY_MM.nc, written by
+# stages.bt_daily) and one folder per day (YYYY_DDD/*.nc, written by Historic/BT/BT_historico.py)
+cube_pattern = re.compile(r"BT_.+_VJ102IMG_\d{4}_\d{2}\.nc$")
+day_folder_pattern = re.compile(r"(\d{4})_(\d{3})$")
+
+index_columns = ["path", "position", "layout"]
+
+# Cached scene entries of every file and day folder: path -> (mtime_ns, size, entries).
+# Only files that changed since the last call are read again.
+_entries = {}
+_entries_lock = threading.Lock()
+
+
+# === HELPERS ===
+def _cached(entry, read):
+    """Scene entries of a file or folder (os.DirEntry), read again only if it changed"""
+    stat = entry.stat()
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _entries_lock:
+        cached = _entries.get(entry.path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    entries = read(entry.path)
+    with _entries_lock:
+        _entries[entry.path] = (key, entries)
+    return entries
+
+
+def _cube_entries(path):
+    """(date, path, position, "cube") of every scene of a monthly cube (only its time variable is read)"""
+    return [(date, path, position, "cube") for date, position in bt_cube.scene_index(path).items()]
+
+
+def _day_entries(folder):
+    """(date, path, 0, "daily") of every file of a YYYY_DDD folder, dated by the folder name"""
+    year, doy = day_folder_pattern.search(folder).groups()
+    date = np.datetime64(f"{year}-01-01", "D") + np.timedelta64(int(doy) - 1, "D")
+    return [(date, os.path.join(folder, name), 0, "daily")
+            for name in sorted(os.listdir(folder)) if name.endswith(".nc")]
+
+
+def _rows(coordinate, low, high):
+    """Slice of the rows/cols of a 1-D or (time, n) coordinate that fall inside [low, high] in any scene"""
+    with np.errstate(invalid="ignore"):
+        inside = np.atleast_2d((coordinate >= low) & (coordinate <= high)).any(axis=0)
+    found = np.flatnonzero(inside)
+    return slice(found[0], found[-1] + 1) if found.size else slice(0, 0)
+
+
+def _read_cube(path, positions, roi, chunks):
+    """Scenes of a monthly cube at `positions`, cut to the ROI box (only those chunks are read)"""
+    source = xr.open_dataset(path, chunks=chunks)
+    ds = source[["BT_I05"]].isel(time=positions)
+    if roi is not None:
+        ds = ds.isel(y=_rows(ds["latitude"].values, roi["lat_min"], roi["lat_max"]),
+                     x=_rows(ds["longitude"].values, roi["lon_min"], roi["lon_max"]))
+    if chunks is None:
+        # Eager read: only the selected box is loaded and the file is released at once
+        ds = ds.load()
+        source.close()
+    return ds
+
+
+def _read_daily(path, date, roi, chunks):
+    """A daily BT file (rows, cols with 2-D latitude/longitude) as a one-scene (time, y, x) dataset"""
+    with xr.open_dataset(path) as ds:
+        name = "brightness_temperature" if "brightness_temperature" in ds else "BT_I05"
+        lat = ds["latitude"].values[:, 0]
+        lon = ds["longitude"].values[0, :]
+    rows = _rows(lat, roi["lat_min"], roi["lat_max"]) if roi is not None else slice(None)
+    cols = _rows(lon, roi["lon_min"], roi["lon_max"]) if roi is not None else slice(None)
+    source = xr.open_dataset(path, chunks=chunks)
+    bt = source[name][rows, cols]
+    if chunks is None:
+        bt = bt.load()
+        source.close()
+    return xr.Dataset(
+        {"BT_I05": (("time", "y", "x"), bt.data[np.newaxis])},
+        coords={"time": [np.datetime64(date, "ns")],
+                "latitude": (("time", "y"), lat[np.newaxis, rows]),
+                "longitude": (("time", "x"), lon[np.newaxis, cols])},
+    )
+
+
+# === PUBLIC API ===
+def bt_dir(site, base_path=None):
+    """Folder of the BT archive of a site (A00_data/B_processed/<site>/BT_daily_pixels by default)"""
+    return Path(base_path) if base_path is not None else processed_dir / site / "BT_daily_pixels"
+
+
+def bt_index(site, base_path=None):
+    """
+    Index of every BT scene of a site's archive, in both layouts, sorted by date.
+
+    Only the folder listing is read on every call: the dates of a monthly cube (its small
+    time variable) and the files of a day folder are cached and read again only when they change.
+
+    Returns:
+        pd.DataFrame: Indexed by time (one row per scene; a day can have several files) with
+        the columns path, position (along time in a cube, 0 for daily files) and layout
+        ("cube" or "daily").
+    """
+    folder = bt_dir(site, base_path)
+    rows = []
+    if folder.is_dir():
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_file() and cube_pattern.match(entry.name):
+                    rows += _cached(entry, _cube_entries)
+                elif entry.is_dir() and day_folder_pattern.match(entry.name):
+                    rows += _cached(entry, _day_entries)
+    index = pd.DataFrame(rows, columns=["time"] + index_columns)
+    index["time"] = pd.to_datetime(index["time"])
+    return index.sort_values(["time", "path"]).set_index("time")
+
+
+def select(site, start=None, end=None, base_path=None, layout=None):
+    """
+    Rows of bt_index between `start` and `end` (dates or datetimes, both included, None for
+    no limit), optionally of one layout only.
+    """
+    index = bt_index(site, base_path)
+    if layout is not None:
+        index = index[index["layout"] == layout]
+    start = pd.Timestamp(start).normalize() if start is not None else None
+    end = pd.Timestamp(end).normalize() if end is not None else None
+    return index.loc[start:end]
+
+
+def open_bt(site, start=None, end=None, roi=None, base_path=None, chunks=None, layout=None):
+    """
+    A site's BT archive between `start` and `end` as one (time, y, x) dataset.
+
+    Scenes are found through the cached index and read file by file, keeping only the
+    selected scenes and the ROI box: a small ROI over years of cubes reads only the chunks
+    around it. With `chunks` (needs dask), nothing is read until the values are used; without
+    it, the boxes are loaded and the files closed before returning.
+    A day with several files keeps the first one; scenes of different sizes are padded with NaN.
+
+    Parameters:
+        site (str): Site name in A02_utils.sites.
+        start, end: First and last day (None for the whole archive).
+        roi (dict): lat_min, lat_max, lon_min, lon_max of the box to read. None for the whole scenes.
+        base_path (Path): BT folder, see bt_dir.
+        chunks (dict): Passed to xr.open_dataset for lazy, chunked arrays.
+        layout (str): "cube" or "daily" to read only one layout of the archive. None for both.
+
+    Returns:
+        xr.Dataset: BT_I05 with per-scene latitude/longitude coordinates, or None if there are no scenes.
+    """
+    index = select(site, start, end, base_path, layout)
+    index = index[~index.index.duplicated(keep="first")]
+    if index.empty:
+        return None
+
+    parts = []
+    for path, group in index.groupby("path", sort=False):
+        if group["layout"].iloc[0] == "cube":
+            parts.append(_read_cube(path, group["position"].tolist(), roi, chunks))
+        else:
+            parts.append(_read_daily(path, group.index[0], roi, chunks))
+
+    parts = [ds.assign_coords(y=np.arange(ds.sizes["y"]), x=np.arange(ds.sizes["x"])) for ds in parts]
+    return xr.concat(parts, dim="time", join="outer").sortby("time")
@@ -0,0 +1,188 @@
+import os
+import time
+import numpy as np
+import xarray as xr
+from netCDF4 import Dataset, num2date
+from pathlib import Path
+
+# === CONSTANTS ===
+# Time is stored as whole days, so the date index is exact
+time_units = "days since 1970-01-01"
+epoch = np.datetime64("1970-01-01", "D")
+
+# Spatial chunk of BT_I05: a scene is written in O(scene) and a small ROI reads few chunks
+chunk_size = 512
+
+# Compression of the cube variables
+zlib, complevel = True, 4
+
+
+# === HELPERS ===
+def _day_number(day):
+    return int((np.datetime64(day, "D") - epoch).astype(int))
+
+
+def is_cube(path):
+    """True if the monthly file has the append-friendly layout (unlimited time dimension)"""
+    with Dataset(path) as nc:
+        return "time" in nc.dimensions and nc.dimensions["time"].isunlimited()
+
+
+def _create(path, ny, nx):
+    """Creates an empty cube: unlimited time, y and x dimensions, chunked by scene tiles"""
+    with Dataset(path, "w", format="NETCDF4") as nc:
+        nc.createDimension("time", None)
+        nc.createDimension("y", None)
+        nc.createDimension("x", None)
+        cy, cx = min(chunk_size, ny), min(chunk_size, nx)
+
+        time = nc.createVariable("time", "i4", ("time",), fill_value=np.iinfo(np.int32).min)
+        time.units = time_units
+        time.calendar = "standard"
+
+        bt = nc.createVariable("BT_I05", "f4", ("time", "y", "x"), fill_value=np.nan,
+                               zlib=zlib, complevel=complevel, chunksizes=(1, cy, cx))
+        bt.units = "K"
+        bt.long_name = "Brightness Temperature - Channel I05 (11.45 µm)"
+        # Per-scene geolocation, exposed by xarray as coordinates of BT_I05
+        bt.coordinates = "latitude longitude"
+
+        lat = nc.createVariable("latitude", "f4", ("time", "y"), fill_value=np.nan,
+                                zlib=zlib, chunksizes=(1, cy))
+        lat.units = "degrees_north"
+        lon = nc.createVariable("longitude", "f4", ("time", "x"), fill_value=np.nan,
+                                zlib=zlib, chunksizes=(1, cx))
+        lon.units = "degrees_east"
+        _create_ingested(nc)
+
+
+def _create_ingested(nc):
+    """Write time of every scene: tells a replaced scene from the one that was there before"""
+    ingested = nc.createVariable("ingested", "f8", ("time",), fill_value=np.nan)
+    ingested.units = "seconds since 1970-01-01"
+    ingested.long_name = "Time the scene was written"
+
+
+def _write_scene(nc, i, day, bt, lat, lon):
+    """Writes scene `i`; the time value goes last, so the date index only shows complete scenes"""
+    ny, nx = bt.shape
+    var = nc["BT_I05"]
+    if i < nc.dimensions["time"].size and (var.shape[1] > ny or var.shape[2] > nx):
+        # Replacing a scene with a smaller one: clear the old values first
+        var[i, :, :] = np.full(var.shape[1:], np.nan, dtype="f4")
+        nc["latitude"][i, :] = np.full(var.shape[1], np.nan, dtype="f4")
+        nc["longitude"][i, :] = np.full(var.shape[2], np.nan, dtype="f4")
+
+    var[i, :ny, :nx] = bt
+    nc["latitude"][i, :ny] = lat
+    nc["longitude"][i, :nx] = lon
+    if "ingested" not in nc.variables:
+        _create_ingested(nc)  # Cube created before the variable existed
+    nc["ingested"][i] = time.time()
+    nc.sync()
+    nc["time"][i] = _day_number(day)
+    nc.sync()
+
+
+def _scene_arrays(da):
+    """BT, latitude and longitude of a single-scene DataArray as numpy arrays"""
+    scene = da.isel(time=0) if "time" in da.dims else da
+    lat = np.broadcast_to(scene["latitude"].values, (scene.sizes["y"],))
+    lon = np.broadcast_to(scene["longitude"].values, (scene.sizes["x"],))
+    return scene.values.astype("f4"), lat, lon
+
+
+def scene_index(path):
+    """
+    Date index of a monthly cube: {datetime64[D]: position along time}.
+    Only the (small) time variable is read.
+    """
+    with Dataset(path) as nc:
+        times = nc["time"][:]
+        units = getattr(nc["time"], "units", time_units)
+
+    if units != time_units:
+        # Monthly file not migrated yet: decode whatever units xarray used
+        dates = num2date(times, units, only_use_cftime_datetimes=False, only_use_python_datetimes=True)
+        return {np.datetime64(d.date(), "D"): i for i, d in enumerate(dates)}
+
+    index = {}
+    for i, value in enumerate(np.ma.filled(times, np.iinfo(np.int32).min)):
+        if value != np.iinfo(np.int32).min:
+            index[epoch + np.timedelta64(int(value), "D")] = i
+    return index
+
+
+def scene_fingerprints(path):
+    """
+    Fingerprint of every scene of a monthly cube: {datetime64[D]: write time}. A day that is
+    ingested again gets a new fingerprint. Scenes written before the cubes kept it have None.
+    """
+    index = scene_index(path)
+    with Dataset(path) as nc:
+        if "ingested" not in nc.variables:
+            return {day: None for day in index}
+        ingested = np.ma.filled(nc["ingested"][:].astype("f8"), np.nan)
+    return {day: (None if i >= ingested.size or np.isnan(ingested[i]) else repr(float(ingested[i])))
+            for day, i in index.items()}
+
+
+def migrate(path):
+    """
+    Rewrites a monthly file created by the old read-concat-rewrite code (fixed time dimension)
+    as a cube. Done once per file, atomically.
+    """
+    with xr.open_dataset(path) as ds:
+        ds = ds.load()
+    tmp = path.with_name(path.name + ".tmp")
+    _create(tmp, ds.sizes["y"], ds.sizes["x"])
+    with Dataset(tmp, "a") as nc:
+        for i in range(ds.sizes["time"]):
+            bt, lat, lon = _scene_arrays(ds["BT_I05"].isel(time=[i]))
+            _write_scene(nc, i, ds.time.values[i], bt, lat, lon)
+    os.replace(tmp, path)
+
+
+# === PUBLIC API ===
+def append_scene(path, da):
+    """
+    Adds one BT scene to a monthly cube.
+
+    A new file is created atomically (temporary file + rename). An existing cube is
+    extended in place, so the cost is O(scene) instead of rewriting the whole month; if the
+    date is already in the cube, its scene is replaced.
+
+    Parameters:
+        path (Path): Monthly BT file.
+        da (xr.DataArray): Scene as returned by stages.process_to_grid (time, y, x).
+
+    Returns:
+        int: Position of the scene along the time dimension.
+    """
+    path = Path(path)
+    day = da.time.values[0]
+    bt, lat, lon = _scene_arrays(da)
+
+    if not path.exists():
+        tmp = path.with_name(path.name + ".tmp")
+        _create(tmp, *bt.shape)
+        with Dataset(tmp, "a") as nc:
+            _write_scene(nc, 0, day, bt, lat, lon)
+        os.replace(tmp, path)
+        return 0
+
+    if not is_cube(path):
+        migrate(path)
+
+    i = scene_index(path).get(np.datetime64(day, "D"))
+    with Dataset(path, "a") as nc:
+        if i is None:
+            i = nc.dimensions["time"].size
+        _write_scene(nc, i, day, bt, lat, lon)
+    return i
+
+
+def open_cube(path):
+    """Opens a monthly cube with xarray, leaving out scenes without a date (interrupted writes)"""
+    ds = xr.open_dataset(path)
+    return ds.isel(time=np.flatnonzero(~np.isnat(ds.time.values)))
@@ -0,0 +1,277 @@
+import warnings
+import numpy as np
+import xarray as xr
+
+from A02_utils.sites import get_site, GRID_RESOLUTION
+
+# === CONSTANTS ===
+sigma = 5.67e-8  # Stefan-Boltzmann constant (W/m²·K⁴)
+c1 = 1.191042e8     # First radiation constant (W·µm⁴/m²/sr)
+c2 = 1.4387752e4    # Second radiation constant (µm·K)
+earth_radius = 6_371_000.0  # m
+
+# Hot-pixel test against the REF background: BT - REF above hot_sigma standard deviations
+# of the REF and at least hot_min_excess K
+hot_sigma = 3.0
+hot_min_excess = 4.0  # K
+
+# MIR radiance method (Wooster et al., 2003): FRP = area * sigma / a * (L_MIR - L_MIR,background),
+# with L the spectral radiance at the MIR channel (VIIRS I04) and `a` its power-law coefficient
+mir_wavelength = 3.74    # µm
+mir_coefficient = 3.0e-9  # W/m²/sr/µm/K⁴
+
+# Per-pixel FRP methods
+PIXEL_METHODS = ("stefan_boltzmann", "mir")
+
+# FRP models by kind: function(dates, **parameters declared by the site) -> (t_floor, area, scale)
+MODELS = {}
+
+
+# === FUNCTIONS ===
+def roi_mean(bt, roi):
+    """
+    Mean BT over a region for every scene of a (time, y, x) DataArray.
+
+    The latitude/longitude coordinates may be 1-D per scene (time, y) / (time, x) as in the
+    monthly cubes, 1-D on a fixed grid (y) / (x) or 2-D: xarray broadcasts them to the mask.
+    Works the same on lazily opened data (only the reduction is computed).
+    """
+    inside = ((bt["latitude"] >= roi["lat_min"]) & (bt["latitude"] <= roi["lat_max"]) &
+              (bt["longitude"] >= roi["lon_min"]) & (bt["longitude"] <= roi["lon_max"]))
+    spatial = [dim for dim in bt.dims if dim != "time"]
+    return bt.where(inside).mean(dim=spatial, skipna=True)
+
+
+def stefan_boltzmann_frp(t_mean, t_floor, area, scale):
+    """
+    FRP in MW from the mean BT: sigma * (T⁴ - T_floor⁴) * area, scaled. Whole-array operation;
+    0 where the BT is missing or not above the floor, NaN where the parameters are NaN.
+    """
+    t_mean, t_floor = np.asarray(t_mean, dtype="f8"), np.asarray(t_floor, dtype="f8")
+    with np.errstate(invalid="ignore"):
+        hot = np.isfinite(t_mean) & (t_mean > t_floor)
+        frp = np.where(hot, sigma * (t_mean**4 - t_floor**4) * area / 1e6 * scale, 0.0)
+    return np.where(np.isnan(t_floor * area * scale), np.nan, frp)
+
+
+def model_parameters(site, dates):
+    """
+    t_floor, area and scale arrays of the FRP model of a site (its "frp_model" entry in
+    A02_utils.sites) for an array of observation dates. Deterministic: the same date always
+    gets the same parameters, so whole histories can be recomputed reproducibly.
+    """
+    spec = dict(get_site(site)["frp_model"])
+    kind = spec.pop("kind")
+    if kind not in MODELS:
+        raise ValueError(f"Unknown FRP model '{kind}'. Choose one of: {', '.join(MODELS)}")
+    return MODELS[kind](np.asarray(dates, dtype="datetime64[D]"), **spec)
+
+
+def register_model(kind):
+    """Decorator that adds an FRP model to MODELS under `kind`"""
+    def decorator(func):
+        MODELS[kind] = func
+        return func
+    return decorator
+
+
+@register_model("linear")
+def linear_model(dates, start, end, t_floor, area, scale):
+    """
+    Parameters moving linearly from their (first, last) values between `start` and `end`
+    (f = (date - start) / (end - start)), constant after `end` and NaN before `start`.
+    """
+    start, end = np.datetime64(start, "D"), np.datetime64(end, "D")
+    f = np.clip((dates - start).astype("f8") / (end - start).astype("f8"), 0.0, 1.0)
+    f = np.where(dates >= start, f, np.nan)
+    return tuple(first + (last - first) * f for first, last in (t_floor, area, scale))
+
+
+@register_model("constant")
+def constant_model(dates, start, t_floor, area, scale):
+    """Fixed parameters from `start` on (NaN before)"""
+    after = dates >= np.datetime64(start, "D")
+    return tuple(np.where(after, float(value), np.nan) for value in (t_floor, area, scale))
+
+
+def frp_series(bt, roi, t_floor, area, scale, frp_max=None):
+    """
+    FRP time series of a (time, y, x) BT DataArray in one call.
+
+    Parameters:
+        bt (xr.DataArray): BT scenes with time, latitude and longitude coordinates.
+        roi (dict): lat_min, lat_max, lon_min, lon_max of the region.
+        t_floor, area, scale: Model parameters, scalars or arrays over time.
+        frp_max (float): Values above are discarded (NaN). None to keep every value.
+
+    Returns:
+        xr.Dataset: FRP (MW), BT_mean (K) and the parameters, along time.
+    """
+    t_mean = roi_mean(bt, roi).values
+    n = t_mean.shape[0]
+    t_floor, area, scale = (np.broadcast_to(np.asarray(p, dtype="f8"), (n,)) for p in (t_floor, area, scale))
+    frp = stefan_boltzmann_frp(t_mean, t_floor, area, scale)
+    if frp_max is not None:
+        frp = np.where(frp > frp_max, np.nan, frp)
+
+    series = xr.Dataset(
+        {"FRP": ("time", frp), "BT_mean": ("time", t_mean),
+         "t_floor": ("time", t_floor), "area": ("time", area), "scale": ("time", scale)},
+        coords={"time": bt["time"].values},
+    )
+    series["FRP"].attrs["units"] = "MW"
+    series["BT_mean"].attrs["units"] = "K"
+    series["t_floor"].attrs["units"] = "K"
+    series["area"].attrs["units"] = "m2"
+    return series
+
+
+def site_series(site, bt, frp_max=None):
+    """FRP series of a site: its FRP region and its registered model (see frp_series)"""
+    params = model_parameters(site, bt["time"].values)
+    return frp_series(bt, get_site(site)["frp_roi"], *params, frp_max=frp_max)
+
+
+# === PER-PIXEL FRP ===
+def _nearest(coord, target):
+    """Index of the nearest `target` value of every coordinate, and whether it is within half a grid step"""
+    target = np.asarray(target, dtype="f8")
+    step = np.abs(np.diff(target)).min() if target.size > 1 else np.inf
+    with np.errstate(invalid="ignore"):
+        distance = np.abs(np.asarray(coord, dtype="f8")[..., None] - target)
+    distance = np.where(np.isnan(distance), np.inf, distance)
+    index = distance.argmin(axis=-1)
+    return index, np.take_along_axis(distance, index[..., None], axis=-1)[..., 0] <= step / 2
+
+
+def reference_on_scenes(bt, ref, name="brightness_temperature_REF"):
+    """
+    A variable of a REF file (y, x with 1-D latitude/longitude, e.g. the REF mean or std) on
+    the pixels of a (time, y, x) BT DataArray, matching every pixel with the REF cell at the
+    same grid position. NaN where the scene is outside the REF box. Returns a numpy array.
+    """
+    n, ny, nx = bt.shape
+    rows, rows_ok = _nearest(np.broadcast_to(bt["latitude"].values, (n, ny)), ref["latitude"].values)
+    cols, cols_ok = _nearest(np.broadcast_to(bt["longitude"].values, (n, nx)), ref["longitude"].values)
+    values = np.asarray(ref[name].values, dtype="f8")[rows[:, :, None], cols[:, None, :]]
+    return np.where(rows_ok[:, :, None] & cols_ok[:, None, :], values, np.nan)
+
+
+def hot_pixels(bt, background, background_std, k=hot_sigma, min_excess=hot_min_excess):
+    """
+    Hot-pixel mask: BT above the background by more than `k` background standard deviations
+    and at least `min_excess` K. False where the BT or the background is missing.
+    """
+    with np.errstate(invalid="ignore"):
+        excess = np.asarray(bt, dtype="f8") - background
+        return excess > np.fmax(k * np.asarray(background_std, dtype="f8"), min_excess)
+
+
+def grid_spacing(coordinate, default=GRID_RESOLUTION):
+    """Step in degrees of a grid coordinate (median step along its last axis), `default` for a single value"""
+    values = np.asarray(coordinate, dtype="f8")
+    if values.ndim == 0 or values.shape[-1] < 2:
+        return default
+    with np.errstate(invalid="ignore"):
+        step = np.nanmedian(np.abs(np.diff(values, axis=-1)))
+    return float(step) if np.isfinite(step) and step > 0 else default
+
+
+def pixel_area(latitude, resolution=GRID_RESOLUTION, lon_resolution=None):
+    """
+    Area in m² of the grid cells centred at `latitude`, `resolution` degrees of latitude by
+    `lon_resolution` degrees of longitude (the same as `resolution` if not given)
+    """
+    lat_side = np.deg2rad(resolution) * earth_radius
+    lon_side = np.deg2rad(resolution if lon_resolution is None else lon_resolution) * earth_radius
+    return lat_side * lon_side * np.cos(np.deg2rad(latitude))
+
+
+def planck_radiance(bt, wavelength):
+    """Spectral radiance (W/m²/sr/µm) of a brightness temperature at `wavelength` µm (Planck function)"""
+    with np.errstate(over="ignore", divide="ignore", invalid="ignore"):
+        return c1 / (wavelength**5 * (np.exp(c2 / (wavelength * np.asarray(bt, dtype="f8"))) - 1))
+
+
+def pixel_frp(bt, background, area, method="stefan_boltzmann"):
+    """
+    FRP in MW of every pixel from its BT and its background BT. Whole-array operation.
+
+    Parameters:
+        bt, background: Pixel and background BT (K), arrays of the same shape.
+        area: Pixel area (m²), broadcast to the BT.
+        method (str): "stefan_boltzmann", sigma * (T⁴ - T_bg⁴) * area, or "mir", the MIR radiance
+            method, area * sigma / a * (L(T) - L(T_bg)), for BT of the MIR channel (I04).
+    """
+    if method == "stefan_boltzmann":
+        bt, background = np.asarray(bt, dtype="f8"), np.asarray(background, dtype="f8")
+        power = sigma * (bt**4 - background**4)
+    elif method == "mir":
+        power = sigma / mir_coefficient * (planck_radiance(bt, mir_wavelength) -
+                                           planck_radiance(background, mir_wavelength))
+    else:
+        raise ValueError(f"Unknown per-pixel FRP method '{method}'. Choose one of: {', '.join(PIXEL_METHODS)}")
+    return power * area / 1e6
+
+
+def pixel_frp_series(bt, ref, roi=None, method="stefan_boltzmann", k=hot_sigma, min_excess=hot_min_excess,
+                     resolution=GRID_RESOLUTION):
+    """
+    Per-pixel FRP of a (time, y, x) BT DataArray against a REF background, in one call.
+
+    Hot pixels are detected against the REF mean and std (hot_pixels), their FRP is computed
+    one by one (pixel_frp) and summed per scene, without loops over pixels or scenes.
+
+    Parameters:
+        bt (xr.DataArray): BT scenes with time and 1-D latitude/longitude coordinates.
+        ref (xr.Dataset): REF of the scenes (see ref_accumulator.RefAccumulator.materialize).
+        roi (dict): Only pixels inside lat_min, lat_max, lon_min, lon_max count. None for all.
+        method (str): Per-pixel FRP method, see pixel_frp.
+        k, min_excess: Hot-pixel thresholds, see hot_pixels.
+        resolution (float): Pixel side in degrees, only used if the coordinates of the scenes
+            have a single value (the spacing of the pixels is taken from the coordinates).
+
+    Returns:
+        xr.Dataset: FRP_pixel (MW, 0 outside the hot pixels) and hot (mask) on (time, y, x),
+        FRP_total (MW) and hot_count along time.
+
+    Raises:
+        ValueError: If the REF has no background for any pixel of the ROI (no pixel could be
+        flagged hot). A REF covering only part of the ROI gives a warning.
+    """
+    values = bt.values
+    background = reference_on_scenes(bt, ref)
+    hot = hot_pixels(values, background, reference_on_scenes(bt, ref, "brightness_temperature_std"), k, min_excess)
+    if roi is not None:
+        inside = ((bt["latitude"] >= roi["lat_min"]) & (bt["latitude"] <= roi["lat_max"]) &
+                  (bt["longitude"] >= roi["lon_min"]) & (bt["longitude"] <= roi["lon_max"]))
+        inside = inside.broadcast_like(bt).transpose(*bt.dims).values
+        covered = np.isfinite(background[inside])
+        if covered.size and not covered.any():
+            raise ValueError("The REF does not cover the FRP region: no background for its pixels")
+        if not covered.all():
+            warnings.warn(f"The REF covers only {covered.mean():.0%} of the FRP region", RuntimeWarning)
+        hot &= inside
+
+    area = pixel_area(np.broadcast_to(bt["latitude"].values, bt.shape[:2]),
+                      grid_spacing(bt["latitude"].values, resolution),
+                      grid_spacing(bt["longitude"].values, resolution))[:, :, None]
+    frp_map = np.where(hot, pixel_frp(np.where(hot, values, background), background, area, method), 0.0)
+
+    dims = ("time", "y", "x")
+    series = xr.Dataset(
+        {"FRP_pixel": (dims, frp_map), "hot": (dims, hot),
+         "FRP_total": ("time", frp_map.sum(axis=(1, 2))), "hot_count": ("time", hot.sum(axis=(1, 2)))},
+        coords={name: bt[name] for name in ("time", "latitude", "longitude")},
+    )
+    series["FRP_pixel"].attrs["units"] = "MW"
+    series["FRP_total"].attrs["units"] = "MW"
+    series.attrs["method"] = method
+    return series
+
+
+def site_pixel_series(site, bt, ref, method="stefan_boltzmann"):
+    """Per-pixel FRP of a site over its FRP region (see pixel_frp_series)"""
+    config = get_site(site)
+    return pixel_frp_series(bt, ref, config.get("frp_roi"), method,
+                            resolution=config.get("grid_resolution", GRID_RESOLUTION))
@@ -0,0 +1,302 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from A01_source.B01_1_download import download
+from A01_source.B01_1_download.cache import sha256_archivo
+from A01_source.B01_3_processing import stages
+from A02_utils.sites import get_site
+
+# === CONSTANTS ===
+# Sites processed by the daily automation
+DAILY_SITES = ["La_Palma", "Teide"]
+
+# Stages run at the same time (sites are independent once the download is done)
+MAX_WORKERS = 4
+
+# Inputs, outputs and parameters of the last successful run of every stage
+STATE_FILE = stages.processed_dir / "_pipeline_state.json"
+
+# Statuses that let the dependent stages run
+DONE = ("ok", "cached")
+
+
+def fingerprint(path):
+    """
+    Cheap description of a file or folder used to detect changes.
+
+    Files: size, mtime and SHA-256 of the content. Folders: digest of the name, size and
+    mtime of the files they contain. Missing paths: None.
+    """
+    path = Path(path)
+    if path.is_dir():
+        listing = hashlib.sha256()
+        for f in sorted(path.iterdir()):
+            if f.is_file():
+                st = f.stat()
+                listing.update(f"{f.name}:{st.st_size}:{st.st_mtime_ns};".encode())
+        return {"listing": listing.hexdigest()}
+    if path.is_file():
+        st = path.stat()
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha256_archivo(path)}
+    return None
+
+
+def unchanged(path, recorded):
+    """
+    True if `path` still matches the fingerprint `recorded`.
+
+    Size and mtime are compared first; the content is hashed only when the mtime moved,
+    so a file rewritten with the same bytes still counts as unchanged (and `recorded`
+    is refreshed with the new mtime).
+    """
+    path = Path(path)
+    if recorded is None or "listing" in recorded:
+        return fingerprint(path) == recorded
+    if not path.is_file():
+        return False
+    st = path.stat()
+    if st.st_size != recorded["size"]:
+        return False
+    if st.st_mtime_ns == recorded["mtime_ns"]:
+        return True
+    if sha256_archivo(path) != recorded["sha256"]:
+        return False
+    recorded["mtime_ns"] = st.st_mtime_ns
+    return True
+
+
+class Stage:
+    """
+    One node of the pipeline: a function with its arguments, the stages it depends on
+    and the files it reads (inputs) and writes (outputs). A stage with cacheable=False
+    always runs. When its real inputs are not local files (e.g. the download), `probe` is a
+    callable without arguments returning a cheap description of them (e.g. a digest of the
+    remote listing): the stage is up to date only while that description is unchanged.
+    """
+
+    def __init__(self, name, func, args=(), inputs=(), outputs=(), deps=(), cacheable=True, probe=None):
+        self.name = name
+        self.func = func
+        self.args = tuple(args)
+        self.inputs = [Path(p) for p in inputs]
+        self.outputs = [Path(p) for p in outputs]
+        self.deps = list(deps)
+        self.cacheable = cacheable
+        self.probe = probe
+
+    @property
+    def params(self):
+        """Function and arguments of the stage, as stored in the pipeline state"""
+        return f"{self.func.__module__}.{getattr(self.func, '__qualname__', self.func)}{self.args!r}"
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, deps={self.deps})"
+
+
+class Pipeline:
+    """
+    In-process DAG of stages. Every stage runs as soon as all its dependencies have finished,
+    on a thread pool, so independent branches (one per site) run concurrently while the
+    libraries and the interpreter are loaded only once.
+
+    With a `state_file`, the pipeline is incremental: after a successful run the fingerprints
+    of the inputs and the parameters of the stage are saved, and the next time the stage is
+    skipped (status 'cached') if they are unchanged and all its outputs still exist.
+    """
+
+    def __init__(self, state_file=None):
+        self.stages = {}
+        self.state_file = Path(state_file) if state_file else None
+        self.state = {}
+        if self.state_file and self.state_file.exists():
+            with open(self.state_file) as f:
+                self.state = json.load(f)
+        self._state_lock = threading.Lock()
+        self._probes = {}
+
+    def add(self, name, func, *args, inputs=(), outputs=(), deps=(), cacheable=True, probe=None):
+        """Adds a stage; its dependencies must have been added before"""
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        if name in self.stages:
+            raise ValueError(f"Duplicated stage '{name}'")
+        self.stages[name] = Stage(name, func, args, inputs, outputs, deps, cacheable, probe)
+        return self.stages[name]
+
+    def _probe(self, stage):
+        """Value of the probe of a stage, taken once per pipeline (None if it has none or it failed)"""
+        if stage.probe is None:
+            return None
+        if stage.name not in self._probes:
+            try:
+                self._probes[stage.name] = stage.probe()
+            except Exception as e:
+                print(f"⚠️ Could not check the remote inputs of {stage.name}: {e}")
+                self._probes[stage.name] = None
+        return self._probes[stage.name]
+
+    def up_to_date(self, stage):
+        """True if the stage ran before with the same parameters and inputs and its outputs exist"""
+        if self.state_file is None or not stage.cacheable or not stage.outputs:
+            return False
+        record = self.state.get(stage.name)
+        if record is None or record["params"] != stage.params:
+            return False
+        if not all(path.exists() for path in stage.outputs):
+            return False
+        if set(record["inputs"]) != {str(path) for path in stage.inputs}:
+            return False
+        if not all(unchanged(path, record["inputs"][str(path)]) for path in stage.inputs):
+            return False
+        if stage.probe is None:
+            return True
+        probe = self._probe(stage)
+        return probe is not None and probe == record.get("probe")
+
+    def _record(self, stage):
+        if self.state_file is None or not all(path.exists() for path in stage.outputs):
+            return
+        record = {"params": stage.params,
+                  "inputs": {str(path): fingerprint(path) for path in stage.inputs}}
+        if stage.probe is not None:
+            record["probe"] = self._probe(stage)
+        with self._state_lock:
+            self.state[stage.name] = record
+
+    def save_state(self):
+        """Writes the state file atomically"""
+        if self.state_file is None:
+            return
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_file.with_name(self.state_file.name + ".tmp")
+        with self._state_lock, open(tmp, "w") as f:
+            json.dump(self.state, f, indent=1)
+        os.replace(tmp, self.state_file)
+
+    def run(self, max_workers=MAX_WORKERS, force=False):
+        """
+        Runs every stage in dependency order.
+
+        A stage whose dependency failed is not run (status 'skipped'); an up-to-date stage
+        is not run either (status 'cached') unless `force` is True.
+
+        Returns a dict: stage name -> {'status': 'ok' | 'cached' | 'failed' | 'skipped',
+        'seconds': float, 'result': return value or None, 'error': message (failed only)}.
+        """
+        report = {}
+        pending = dict(self.stages)
+        running = {}
+
+        def ready(stage):
+            return all(dep in report for dep in stage.deps)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if not ready(stage):
+                        continue
+                    del pending[name]
+                    failed = [dep for dep in stage.deps if report[dep]["status"] not in DONE]
+                    if failed:
+                        report[name] = {"status": "skipped", "seconds": 0.0, "result": None}
+                        print(f"✘ {name} skipped ({', '.join(failed)} did not finish)")
+                        continue
+                    start = time.perf_counter()
+                    if not force and self.up_to_date(stage):
+                        report[name] = {"status": "cached", "seconds": time.perf_counter() - start, "result": None}
+                        print(f"✔︎ {name} up to date")
+                        continue
+                    running[executor.submit(self._run_stage, stage)] = name
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    report[name] = future.result()
+                    if report[name]["status"] == "ok":
+                        self._record(self.stages[name])
+
+        self.save_state()
+        return report
+
+    @staticmethod
+    def _run_stage(stage):
+        start = time.perf_counter()
+        try:
+            result = stage.func(*stage.args)
+        except Exception as e:
+            print(f"✘ Error in {stage.name}: {e}")
+            return {"status": "failed", "seconds": time.perf_counter() - start, "result": None, "error": str(e)}
+        return {"status": "ok", "seconds": time.perf_counter() - start, "result": result}
+
+
+def build_daily_pipeline(sites=DAILY_SITES, day=None, download_data=True, state_file=STATE_FILE):
+    """
+    Builds the daily DAG: download (all sites at once) → BT → REF and FRP for each site.
+
+    Parameters:
+        sites (list[str]): Site names from A02_utils.sites.
+        day (datetime): Day to process. Yesterday by default.
+        download_data (bool): Include the download stage.
+        state_file (Path): State of the incremental runs. None to always run every stage.
+    """
+    if day is None:
+        day = datetime.now() - timedelta(days=1)
+    day = datetime(day.year, day.month, day.day)
+    year, doy = day.strftime("%Y"), day.strftime("%j")
+
+    pipeline = Pipeline(state_file)
+    first = []
+    if download_data:
+        # Granules of the day keep appearing on LAADS after its folder exists: the download is
+        # up to date only while the day's listing is the same (one request per product, no
+        # granule is fetched on a no-op run), and bt reruns only if the folder changed
+        pipeline.add("download", download.descargar_sitios, list(sites), year, doy,
+                     outputs=[download.RAW_DIR / site / f"{year}_{doy}" for site in sites],
+                     probe=lambda: download.huella_listado(year, doy))
+        first = ["download"]
+
+    for site in sites:
+        bt_file = stages.bt_monthly_path(site, day.year, day.month)
+        pipeline.add(f"bt:{site}", stages.bt_daily, site, day, deps=first,
+                     inputs=[stages.raw_dir / site / f"{year}_{doy}"], outputs=[bt_file])
+        pipeline.add(f"ref:{site}", stages.ref_monthly, site, day, deps=[f"bt:{site}"],
+                     inputs=[bt_file], outputs=[stages.ref_path(site, day.year, day.month)])
+        if "frp_roi" in get_site(site):
+            pipeline.add(f"frp:{site}", stages.frp_daily, site, day, deps=[f"bt:{site}"],
+                         inputs=[bt_file], outputs=[stages.frp_path(site)])
+
+    return pipeline
+
+
+def print_timings(report):
+    """Prints the status and time of every stage"""
+    print("\n=== Stage timings ===")
+    for name, info in report.items():
+        mark = "✔︎" if info["status"] in DONE else "✘"
+        print(f"{mark} {name:<20} {info['status']:<8} {info['seconds']:8.2f} s")
+    print(f"Total stage time: {sum(info['seconds'] for info in report.values()):.2f} s")
+
+
+def run_daily(sites=DAILY_SITES, day=None, max_workers=MAX_WORKERS, download_data=True, force=False):
+    """Builds and runs the daily pipeline and prints the stage timings"""
+    start = time.perf_counter()
+    report = build_daily_pipeline(sites, day, download_data).run(max_workers, force)
+    print_timings(report)
+    print(f"Wall time: {time.perf_counter() - start:.2f} s")
+    return report
+
+
+if __name__ == "__main__":
+    run_daily()
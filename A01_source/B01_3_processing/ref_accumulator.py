@@ -0,0 +1,236 @@
+import os
+import warnings
+import numpy as np
+import pandas as pd
+import xarray as xr
+from pathlib import Path
+
+# === CONSTANTS ===
+# Scene-level quality filter: a scene is used if its BT over the ROI varies (std above
+# min_scene_std) and has no very cold, cloudy pixels (min above min_scene_bt)
+min_scene_std = 3.0   # K
+min_scene_bt = 210.0  # K
+
+# Per-pixel BT histogram used for the robust statistics (values outside go to the edge bins)
+hist_min, hist_max, hist_step = 180.0, 360.0, 0.25  # K
+
+# Percentiles added to the REF besides the median
+percentiles = (10, 25, 75, 90)
+
+# Iterative sigma clipping: threshold in standard deviations and maximum number of passes
+clip_sigma = 2.5
+clip_iterations = 5
+
+n_bins = int(round((hist_max - hist_min) / hist_step))
+
+
+def _hist_quantile(hist, q):
+    """q-th percentile (0-100) of every histogram along the last axis, interpolated inside the bin"""
+    count = hist.sum(axis=-1)
+    cdf = np.cumsum(hist, axis=-1)
+    target = count[..., None] * (q / 100.0)
+    k = np.minimum((cdf < target).sum(axis=-1, keepdims=True), n_bins - 1)
+    inside = np.take_along_axis(hist, k, axis=-1)
+    below = np.take_along_axis(cdf, k, axis=-1) - inside
+    value = hist_min + hist_step * (k + np.clip((target - below) / np.maximum(inside, 1), 0, 1))
+    return np.where(count > 0, value[..., 0], np.nan)
+
+
+def scene_quality(boxes, dates):
+    """
+    Acceptance test of a stack of scenes (time, y, x) over the ROI, computed for all of them
+    in one vectorized reduction.
+
+    Returns a DataFrame indexed by date with the columns min, std, valid_fraction
+    (share of pixels with data) and accepted.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        minval = np.nanmin(boxes, axis=(1, 2))
+        stdval = np.nanstd(boxes, axis=(1, 2))
+    return pd.DataFrame({
+        "min": minval,
+        "std": stdval,
+        "valid_fraction": np.isfinite(boxes).mean(axis=(1, 2)),
+        "accepted": (stdval > min_scene_std) & (minval > min_scene_bt),
+    }, index=pd.Index([str(date) for date in dates], name="date"))
+
+
+class RefAccumulator:
+    """
+    Running per-pixel statistics of the BT scenes of one month (Welford's algorithm).
+
+    Scenes are folded in one at a time, so memory does not grow with the number of scenes
+    and a REF for the month so far can be materialized at any time. The state is saved
+    as a small .npz file, so the daily run only reads the new scenes of the month.
+
+    Besides the moments, every pixel keeps a fixed-bin histogram (hist_step K), from which
+    the median, percentiles and a sigma-clipped mean are estimated to about one bin, and the
+    memory is the same for one month or for years of scenes. The histograms take n_bins
+    counters per pixel: with robust=False they are not kept and the REF only has the moments.
+    """
+
+    def __init__(self, latitude, longitude, robust=True):
+        shape = (len(latitude), len(longitude))
+        self.latitude = np.asarray(latitude)
+        self.longitude = np.asarray(longitude)
+        self.count = np.zeros(shape, dtype=np.int32)
+        self.mean = np.zeros(shape, dtype=np.float64)
+        self.m2 = np.zeros(shape, dtype=np.float64)  # Sum of squared differences from the mean
+        self.min = np.full(shape, np.inf, dtype=np.float32)
+        self.max = np.full(shape, -np.inf, dtype=np.float32)
+        self.hist = np.zeros(shape + (n_bins,), dtype=np.int32) if robust else None
+        self.scenes = {}  # Date (YYYY-MM-DD) -> True if the scene was accepted
+        self.fingerprints = {}  # Date -> fingerprint of the scene folded (see bt_cube.scene_fingerprints)
+
+    @property
+    def used_scenes(self):
+        """Dates of the accepted scenes, in order"""
+        return sorted(date for date, accepted in self.scenes.items() if accepted)
+
+    def changed_scenes(self, fingerprints):
+        """Dates already folded whose scene now has another fingerprint ({date: fingerprint})"""
+        return sorted(date for date in self.scenes
+                      if date in fingerprints and self.fingerprints.get(date) != fingerprints[date])
+
+    def add(self, scene, date, accepted=True):
+        """
+        Folds a scene (2-D array on the accumulator grid, NaN = no data) into the statistics.
+        A scene that did not pass the quality filter is only recorded as seen (accepted=False).
+        """
+        self.add_batch(np.asarray(scene)[np.newaxis], [date], [accepted])
+
+    def add_batch(self, scenes, dates, accepted=None, fingerprints=None):
+        """
+        Folds a stack of scenes (time, y, x) in one pass: the moments of the stack are
+        computed with vectorized reductions and merged into the running ones (Chan et al.).
+        `accepted` (one bool per scene, all True by default) works as in add().
+        `fingerprints` (one per scene, optional) are kept to detect scenes replaced later.
+        """
+        accepted = np.ones(len(dates), dtype=bool) if accepted is None else np.asarray(accepted, dtype=bool)
+        fingerprints = [None] * len(dates) if fingerprints is None else fingerprints
+        for date, ok, fingerprint in zip(dates, accepted, fingerprints):
+            self.scenes[str(date)] = bool(ok)
+            self.fingerprints[str(date)] = fingerprint
+        batch = np.asarray(scenes, dtype=np.float64)[accepted]
+        if len(batch) == 0:
+            return
+
+        finite = np.isfinite(batch)
+        n_batch = finite.sum(axis=0)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            mean_batch = np.where(n_batch > 0, np.nanmean(batch, axis=0), 0.0)
+            m2_batch = np.nansum((batch - mean_batch) ** 2, axis=0)
+            np.fmin(self.min, np.nanmin(batch, axis=0), out=self.min, casting="unsafe")
+            np.fmax(self.max, np.nanmax(batch, axis=0), out=self.max, casting="unsafe")
+
+        n = self.count + n_batch
+        delta = mean_batch - self.mean
+        self.mean += delta * n_batch / np.maximum(n, 1)
+        self.m2 += m2_batch + delta ** 2 * self.count * n_batch / np.maximum(n, 1)
+        self.count = n.astype(np.int32)
+        if self.hist is None:
+            return
+
+        # Histogram: bin of every valid value, counted per pixel
+        pixels = np.nonzero(finite)[1:]
+        bins = np.clip(((batch[finite] - hist_min) / hist_step).astype(np.int64), 0, n_bins - 1)
+        flat = np.ravel_multi_index(pixels, self.count.shape) * n_bins + bins
+        self.hist += np.bincount(flat, minlength=self.hist.size).reshape(self.hist.shape).astype(np.int32)
+
+    @property
+    def robust(self):
+        """Whether the histograms (median, percentiles, clipped mean) are kept"""
+        return self.hist is not None
+
+    def quantile(self, q):
+        """Per-pixel q-th percentile (0-100) from the histograms, interpolated inside the bin"""
+        if not self.robust:
+            raise ValueError("The accumulator was created with robust=False: it has no histograms")
+        return _hist_quantile(self.hist, q)
+
+    def clipped_mean(self, sigma=clip_sigma, iterations=clip_iterations):
+        """
+        Per-pixel iterative sigma-clipped mean from the histograms: values farther than `sigma`
+        standard deviations from the median are dropped until nothing changes.
+        """
+        if not self.robust:
+            raise ValueError("The accumulator was created with robust=False: it has no histograms")
+        centres = hist_min + hist_step * (np.arange(n_bins) + 0.5)
+        weights = self.hist.astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for _ in range(iterations):
+                n = weights.sum(axis=-1, keepdims=True)
+                median = _hist_quantile(weights, 50)[..., None]
+                mean = (weights * centres).sum(axis=-1, keepdims=True) / n
+                std = np.sqrt((weights * (centres - mean) ** 2).sum(axis=-1, keepdims=True) / n)
+                # Keep at least the bin of the median, so a pixel never runs out of values
+                keep = np.abs(centres - median) <= np.maximum(sigma * std, hist_step)
+                if not (weights[~keep] > 0).any():
+                    break
+                weights = np.where(keep, weights, 0.0)
+            n = weights.sum(axis=-1)
+            return np.where(n > 0, (weights * centres).sum(axis=-1) / n, np.nan)
+
+    def materialize(self, percentiles=percentiles):
+        """
+        REF Dataset of the scenes folded so far: mean (the REF), std, min, max and count per
+        pixel, and the robust variants median, percentiles and sigma-clipped mean (only if the
+        accumulator keeps the histograms).
+        """
+        empty = self.count == 0
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            mean = np.where(empty, np.nan, self.mean).astype("f4")
+            std = np.where(empty, np.nan, np.sqrt(self.m2 / self.count)).astype("f4")
+        dims = ("y", "x")
+        ref_ds = xr.Dataset(
+            {
+                "brightness_temperature_REF": (dims, mean),
+                "brightness_temperature_std": (dims, std),
+                "brightness_temperature_min": (dims, np.where(empty, np.nan, self.min)),
+                "brightness_temperature_max": (dims, np.where(empty, np.nan, self.max)),
+                "scene_count": (dims, self.count),
+            },
+            coords={"latitude": ("y", self.latitude), "longitude": ("x", self.longitude)},
+        )
+        if self.robust:
+            ref_ds["brightness_temperature_median"] = (dims, self.quantile(50).astype("f4"))
+            ref_ds["brightness_temperature_clipped"] = (dims, self.clipped_mean().astype("f4"))
+            ref_ds["brightness_temperature_clipped"].attrs["sigma_clip"] = clip_sigma
+            for q in percentiles:
+                ref_ds[f"brightness_temperature_p{q:g}"] = (dims, self.quantile(q).astype("f4"))
+        for name in ref_ds.data_vars:
+            if name.startswith("brightness_temperature"):
+                ref_ds[name].attrs["units"] = "K"
+        ref_ds.attrs["used_scenes"] = ", ".join(self.used_scenes)
+        return ref_ds
+
+    def save(self, path):
+        """Writes the state atomically (temporary file + rename)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.stem + ".tmp.npz")
+        dates = sorted(self.scenes)
+        arrays = {"hist": self.hist} if self.robust else {}
+        np.savez(tmp, latitude=self.latitude, longitude=self.longitude, count=self.count,
+                 mean=self.mean, m2=self.m2, min=self.min, max=self.max,
+                 dates=np.array(dates, dtype=str),
+                 accepted=np.array([self.scenes[d] for d in dates], dtype=bool),
+                 fingerprints=np.array([self.fingerprints.get(d) or "" for d in dates], dtype=str), **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Reads a state written by save()"""
+        with np.load(path) as data:
+            acc = cls(data["latitude"], data["longitude"], robust="hist" in data.files)
+            for name in ("count", "mean", "m2", "min", "max", "hist"):
+                if name in data.files:
+                    setattr(acc, name, data[name])
+            acc.scenes = dict(zip(data["dates"].tolist(), data["accepted"].tolist()))
+            if "fingerprints" in data.files:
+                acc.fingerprints = {d: f or None for d, f in zip(data["dates"].tolist(), data["fingerprints"].tolist())}
+        return acc
@@ -0,0 +1,185 @@
+import os
+import hashlib
+import threading
+import numpy as np
+from pathlib import Path
+from scipy.spatial import cKDTree
+
+# === CONSTANTS ===
+# Rows/columns skipped when scanning the full geolocation arrays for the site window
+scan_stride = 16
+
+# A grid cell without a swath pixel closer than this (in grid steps) is left empty (NaN)
+max_distance_steps = 2.0
+
+
+# === FUNCTIONS ===
+def find_window(lat_var, lon_var, window, stride=scan_stride):
+    """
+    Rows and columns of a swath that cover a lat/lon window.
+
+    The geolocation variables are first read every `stride` pixels, so only a small part of the
+    (about 6400 x 6400) arrays is loaded to locate the window; the result is widened by two strides
+    so that the corners of a window lying between samples of a rotated swath are not cut.
+
+    Parameters:
+        lat_var, lon_var: 2-D latitude and longitude (netCDF4 variables or arrays).
+        window (dict): lat_min, lat_max, lon_min, lon_max.
+
+    Returns:
+        tuple of slices (rows, cols), or None if the swath does not cover the window.
+    """
+    lat = np.ma.filled(lat_var[::stride, ::stride], np.nan)
+    lon = np.ma.filled(lon_var[::stride, ::stride], np.nan)
+    with np.errstate(invalid='ignore'):
+        inside = ((lat >= window["lat_min"]) & (lat <= window["lat_max"]) &
+                  (lon >= window["lon_min"]) & (lon <= window["lon_max"]))
+    if not inside.any():
+        return None
+
+    rows, cols = np.nonzero(inside)
+    n_lines, n_pixels = lat_var.shape
+    pad = 2 * stride
+    return (slice(max(rows.min() * stride - pad, 0), min(rows.max() * stride + pad + 1, n_lines)),
+            slice(max(cols.min() * stride - pad, 0), min(cols.max() * stride + pad + 1, n_pixels)))
+
+
+def nearest_lookup(src_lat, src_lon, grid_lat, grid_lon):
+    """
+    Nearest-neighbour lookup table from swath pixels to a regular grid.
+
+    A KD-tree is built on the swath pixels (longitude scaled by cos(latitude) so distances are
+    roughly isotropic) and queried once with every grid cell.
+
+    Parameters:
+        src_lat, src_lon (ndarray): Geolocation of the swath pixels (same shape).
+        grid_lat, grid_lon (ndarray): 1-D grid coordinates.
+
+    Returns:
+        tuple:
+            - index (ndarray[int]): For every grid cell (shape grid_lat x grid_lon), the flat
+              index of its nearest swath pixel.
+            - valid (ndarray[bool]): Cells with a swath pixel closer than max_distance_steps steps.
+    """
+    scale = np.cos(np.deg2rad(np.nanmean(grid_lat)))
+    src_lat, src_lon = np.asarray(src_lat, "f8").ravel(), np.asarray(src_lon, "f8").ravel()
+    finite = np.isfinite(src_lat) & np.isfinite(src_lon)
+    shape = (grid_lat.size, grid_lon.size)
+    if not finite.any():
+        return np.zeros(shape, dtype=np.int64), np.zeros(shape, dtype=bool)
+
+    tree = cKDTree(np.column_stack([src_lat[finite], src_lon[finite] * scale]))
+    glat, glon = np.meshgrid(grid_lat, grid_lon, indexing="ij")
+    step = max(abs(np.diff(grid_lat[:2]).item()) if grid_lat.size > 1 else 0.0,
+               abs(np.diff(grid_lon[:2]).item()) * scale if grid_lon.size > 1 else 0.0)
+    distance, nearest = tree.query(np.column_stack([glat.ravel(), glon.ravel() * scale]))
+
+    index = np.flatnonzero(finite)[nearest].reshape(shape)
+    valid = (distance <= max_distance_steps * step).reshape(shape)
+    return index, valid
+
+
+def apply_lookup(values, index, valid):
+    """Gathers `values` (any shape, flattened) onto the grid; cells not valid are NaN"""
+    gridded = np.asarray(values, dtype="f4").ravel()[index]
+    gridded[~valid] = np.nan
+    return gridded
+
+
+# === RESAMPLING PLANS ===
+# Plans already loaded in this process: key -> plan
+_plans = {}
+_plans_lock = threading.Lock()
+
+
+def _axis_lookup(src, target, step):
+    """For every target coordinate, index of the nearest finite source coordinate and whether it is close enough"""
+    src = np.asarray(src, "f8")
+    finite = np.flatnonzero(np.isfinite(src))
+    if finite.size == 0:
+        return np.zeros(target.size, dtype=np.int64), np.zeros(target.size, dtype=bool)
+
+    order = finite[np.argsort(src[finite])]
+    values = src[order]
+    position = np.searchsorted(values, target)
+    left = np.clip(position - 1, 0, values.size - 1)
+    right = np.clip(position, 0, values.size - 1)
+    nearest = np.where(np.abs(values[left] - target) <= np.abs(values[right] - target), left, right)
+    return order[nearest], np.abs(values[nearest] - target) <= max_distance_steps * step
+
+
+def plan_key(src_lat, src_lon, grid_lat, grid_lon, roi):
+    """Digest of everything a plan depends on: source and target coordinates and the ROI"""
+    digest = hashlib.sha1()
+    for array in (src_lat, src_lon, grid_lat, grid_lon):
+        digest.update(np.ascontiguousarray(array, dtype="f8").tobytes())
+        digest.update(b";")
+    digest.update(repr(sorted(roi.items())).encode())
+    return digest.hexdigest()[:16]
+
+
+def build_plan(src_lat, src_lon, grid_lat, grid_lon, roi):
+    """
+    Resampling plan from a scene (1-D latitude(y) and longitude(x), as stored in the BT cubes)
+    to the bounding box of a ROI on the fixed site grid.
+
+    Returns a dict of arrays:
+        rows, cols: Source row/column of every target row/column of the box (nearest neighbour).
+        valid: Target cells with a source pixel closer than max_distance_steps grid steps.
+        mask: ROI mask inside the box.
+        latitude, longitude: Coordinates of the box.
+    Raises ValueError if the ROI does not intersect the grid.
+    """
+    lat_in = (grid_lat >= roi["lat_min"]) & (grid_lat <= roi["lat_max"])
+    lon_in = (grid_lon >= roi["lon_min"]) & (grid_lon <= roi["lon_max"])
+    if not lat_in.any() or not lon_in.any():
+        raise ValueError("The ROI does not intersect the grid")
+    box_lat = grid_lat[np.flatnonzero(lat_in).min():np.flatnonzero(lat_in).max() + 1]
+    box_lon = grid_lon[np.flatnonzero(lon_in).min():np.flatnonzero(lon_in).max() + 1]
+
+    lat_step = abs(np.diff(grid_lat[:2]).item()) if grid_lat.size > 1 else 0.0
+    lon_step = abs(np.diff(grid_lon[:2]).item()) if grid_lon.size > 1 else 0.0
+    rows, valid_rows = _axis_lookup(src_lat, box_lat, lat_step)
+    cols, valid_cols = _axis_lookup(src_lon, box_lon, lon_step)
+
+    mask = np.outer((box_lat >= roi["lat_min"]) & (box_lat <= roi["lat_max"]),
+                    (box_lon >= roi["lon_min"]) & (box_lon <= roi["lon_max"]))
+    return {"rows": rows, "cols": cols, "valid": np.outer(valid_rows, valid_cols), "mask": mask,
+            "latitude": box_lat, "longitude": box_lon}
+
+
+def load_plan(plan_dir, src_lat, src_lon, grid_lat, grid_lon, roi):
+    """
+    Resampling plan for a scene grid, built only once: it is kept in memory and saved as
+    <plan_dir>/plan_<key>.npz, so the next scenes, months and runs with the same grids reuse it.
+    """
+    key = plan_key(src_lat, src_lon, grid_lat, grid_lon, roi)
+    with _plans_lock:
+        if key in _plans:
+            return _plans[key]
+
+    path = Path(plan_dir) / f"plan_{key}.npz"
+    if path.exists():
+        with np.load(path) as data:
+            plan = {name: data[name] for name in data.files}
+    else:
+        plan = build_plan(src_lat, src_lon, grid_lat, grid_lon, roi)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Temporary name unique per process and thread: several may build the same plan
+        tmp = path.with_name(f"{path.stem}.{os.getpid()}.{threading.get_ident()}.tmp.npz")
+        np.savez(tmp, **plan)
+        os.replace(tmp, path)
+
+    with _plans_lock:
+        _plans[key] = plan
+    return plan
+
+
+def apply_plan(scene, plan):
+    """
+    Gathers a scene (y, x) or a stack of scenes (time, y, x) onto the box of a plan;
+    cells without a close source pixel are NaN
+    """
+    box = np.asarray(scene, dtype="f4")[..., plan["rows"][:, np.newaxis], plan["cols"]]
+    box[..., ~plan["valid"]] = np.nan
+    return box
@@ -0,0 +1,430 @@
+import re
+import threading
+import numpy as np
+import pandas as pd
+import xarray as xr
+from netCDF4 import Dataset
+from pathlib import Path
+from datetime import timedelta
+
+from A01_source.B01_3_processing import archive, bt_cube, frp, resample, ref_accumulator
+from A01_source.B01_3_processing.ref_accumulator import RefAccumulator
+from A02_utils.catalog import FileCatalog
+from A02_utils.sites import get_site, crop_window, ref_region, site_grid
+
+# === PATHS ===
+# Project root: this module is in A01_source/B01_3_processing
+project_dir = Path(__file__).resolve().parents[2]
+raw_dir = project_dir / "A00_data" / "B_raw"
+processed_dir = project_dir / "A00_data" / "B_processed"
+# Root of the file catalogue (A02_utils.catalog) queried for inputs and updated with outputs
+catalog_dir = project_dir / "A00_data"
+
+# === CONSTANTS ===
+wavelength = 11.45  # µm
+c1 = 1.191042e8     # First radiation constant (W·µm⁴/m²/sr)
+c2 = 1.4387752e4    # Second radiation constant (µm·K)
+
+# FRP values above this are discarded (the model itself is in frp.py)
+frp_max = 400  # MW
+
+# The HDF5 library under netCDF4 is not thread-safe: every file access of the stages
+# goes through this lock, so sites can run in parallel threads and only the I/O is serialized.
+nc_lock = threading.RLock()
+
+
+# === HELPERS ===
+def radiance_to_bt(radiance):
+    """
+    Converts radiance to brightness temperature using the inverse Planck function.
+    Filters invalid or non-positive radiance values.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bt = c2 / (wavelength * np.log((c1 / (radiance * wavelength**5)) + 1))
+        bt = np.where((radiance > 0) & np.isfinite(bt), bt, np.nan)
+    return bt
+
+
+def process_to_monthly(nc_file, file_date, window=None):
+    """
+    Processes a NetCDF file to extract brightness temperature and returns it as a DataArray.
+    Includes spatial coordinates and time.
+
+    With a `window` (dict with lat_min, lat_max, lon_min, lon_max, see A02_utils.sites.crop_window)
+    only the rows and columns of the swath inside it are read and kept, together with their
+    latitude/longitude. Returns None if the window does not intersect the swath.
+    """
+    with nc_lock, Dataset(nc_file) as nc:
+        obs = nc.groups['observation_data']
+        n_lines, n_pixels = obs["I05"].shape
+
+        # Extract spatial coordinates from global attributes
+        south = nc.getncattr('SouthBoundingCoordinate')
+        north = nc.getncattr('NorthBoundingCoordinate')
+        west = nc.getncattr('WestBoundingCoordinate')
+        east = nc.getncattr('EastBoundingCoordinate')
+
+        latitudes = np.linspace(north, south, n_lines)
+        longitudes = np.linspace(west, east, n_pixels)
+
+        rows, cols = slice(None), slice(None)
+        if window is not None:
+            in_lat = np.flatnonzero((latitudes >= window["lat_min"]) & (latitudes <= window["lat_max"]))
+            in_lon = np.flatnonzero((longitudes >= window["lon_min"]) & (longitudes <= window["lon_max"]))
+            if in_lat.size == 0 or in_lon.size == 0:
+                return None
+            rows = slice(in_lat.min(), in_lat.max() + 1)
+            cols = slice(in_lon.min(), in_lon.max() + 1)
+
+        # Read only the window from disk
+        i05 = obs["I05"][rows, cols]
+
+    bt_i05 = radiance_to_bt(np.ma.filled(i05, np.nan))
+    return _scene_dataarray(bt_i05, latitudes[rows], longitudes[cols], file_date)
+
+
+def _scene_dataarray(bt, latitudes, longitudes, file_date):
+    """Wraps one BT scene as a (time, y, x) DataArray with latitude(y) and longitude(x)"""
+    n_lines, n_pixels = bt.shape
+    return xr.DataArray(
+        bt[np.newaxis, :, :],
+        dims=("time", "y", "x"),
+        coords={
+            "time": [np.datetime64(file_date.date())],
+            "y": np.arange(n_lines),
+            "x": np.arange(n_pixels),
+            "latitude": ("y", latitudes),
+            "longitude": ("x", longitudes),
+        },
+        name="BT_I05"
+    )
+
+
+def geolocation_file(bt_file):
+    """VJ103IMG granule with the same acquisition key as a VJ102IMG granule, or None"""
+    match = re.search(r"\.(A\d{7}\.\d{4})\.", Path(bt_file).name)
+    if not match:
+        return None
+    files = sorted(Path(bt_file).parent.glob(f"VJ103IMG.{match.group(1)}.*.nc"))
+    return files[0] if files else None
+
+
+def process_to_grid(nc_file, file_date, site, geo_file=None):
+    """
+    Converts a granule to brightness temperature on the fixed grid of the site
+    (A02_utils.sites.site_grid), with a nearest-neighbour lookup table built once per scene.
+
+    The position of every pixel comes from the VJ103IMG geolocation granule when it is given;
+    otherwise the bounding-box grid of process_to_monthly is used. Only the part of the swath
+    around the site is read. Returns None if the granule does not cover the site.
+    """
+    grid_lat, grid_lon = site_grid(site)
+    window = crop_window(site)
+
+    if geo_file is not None:
+        with nc_lock, Dataset(geo_file) as geo, Dataset(nc_file) as nc:
+            geo_data = geo.groups['geolocation_data']
+            cut = resample.find_window(geo_data["latitude"], geo_data["longitude"], window)
+            if cut is None:
+                return None
+            rows, cols = cut
+            src_lat = np.ma.filled(geo_data["latitude"][rows, cols], np.nan)
+            src_lon = np.ma.filled(geo_data["longitude"][rows, cols], np.nan)
+            i05 = nc.groups['observation_data']["I05"][rows, cols]
+        bt = radiance_to_bt(np.ma.filled(i05, np.nan))
+    else:
+        da = process_to_monthly(nc_file, file_date, window)
+        if da is None:
+            return None
+        bt = da.values[0]
+        src_lat, src_lon = np.meshgrid(da["latitude"].values, da["longitude"].values, indexing="ij")
+
+    index, valid = resample.nearest_lookup(src_lat, src_lon, grid_lat, grid_lon)
+    if not valid.any():
+        return None
+    return _scene_dataarray(resample.apply_lookup(bt, index, valid), grid_lat, grid_lon, file_date)
+
+
+def bt_dir(site):
+    """Folder of the monthly BT files of a site"""
+    return processed_dir / site / "BT_daily_pixels"
+
+
+def bt_monthly_path(site, year, month):
+    """Path of the monthly BT file of a site (BT_<tag>_VJ102IMG_YYYY_MM.nc)"""
+    return bt_dir(site) / f"BT_{get_site(site)['tag']}_VJ102IMG_{year}_{month:02d}.nc"
+
+
+def ref_path(site, year, month):
+    """Path of the monthly REF file of a site"""
+    return processed_dir / site / "REF" / f"Ref_{year}_{month:02d}.nc"
+
+
+def frp_path(site):
+    """Path of the daily FRP series of a site"""
+    return processed_dir / site / "Radiative_Power_by_Year_Month_Day" / get_site(site)["frp_file"]
+
+
+def accumulator_path(site, year, month):
+    """Running REF statistics of a month (see ref_accumulator.RefAccumulator)"""
+    return processed_dir / site / "REF" / "_acc" / f"Acc_{year}_{month:02d}.npz"
+
+
+def scene_table_path(site, year, month):
+    """Acceptance statistics of the scenes of a month (see ref_accumulator.scene_quality)"""
+    return accumulator_path(site, year, month).with_name(f"Acc_{year}_{month:02d}_scenes.csv")
+
+
+def _save_scene_table(path, table, rebuild=False):
+    """Adds the rows of `table` to the scene table of the month (replacing dates already there)"""
+    if path.exists() and not rebuild:
+        previous = pd.read_csv(path, index_col="date")
+        table = pd.concat([previous[~previous.index.isin(table.index)], table]).sort_index()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table.to_csv(path)
+
+
+def plan_dir(site):
+    """Folder of the cached resampling plans of a site (next to its REF files)"""
+    return processed_dir / site / "REF" / "_plans"
+
+
+def _roi_mask(lat, lon, roi):
+    return ((lat >= roi["lat_min"]) & (lat <= roi["lat_max"]) &
+            (lon >= roi["lon_min"]) & (lon <= roi["lon_max"]))
+
+
+# === STAGES ===
+def bt_daily(site, day):
+    """
+    BT stage: converts the granule of `day` to brightness temperature and adds it
+    to the monthly BT file of the site.
+
+    Inputs: A00_data/B_raw/<site>/<YYYY>_<DDD>/VJ102IMG.A*.nc (+ VJ103IMG geolocation), found in the file catalogue
+    Output: A00_data/B_processed/<site>/BT_daily_pixels/BT_<tag>_VJ102IMG_YYYY_MM.nc
+
+    Returns the monthly file, or None if there was no granule for the day.
+    """
+    output_dir_bt = bt_dir(site)
+    output_dir_bt.mkdir(parents=True, exist_ok=True)
+    print(f"\n=== Processing BT for {site} {day.strftime('%Y-%m-%d')} ===")
+
+    # Delete previous month file if the day is the 1st
+    if day.day == 1:
+        previous = day - timedelta(days=1)
+        previous_file = bt_monthly_path(site, previous.year, previous.month)
+        if previous_file.exists():
+            previous_file.unlink()
+            print(f"→ Previous monthly file deleted: {previous_file.name}")
+
+    # Granules of the day from the catalogue; a day folder not registered yet (granules copied
+    # by hand or downloaded before the catalogue) is added to it first
+    catalog = FileCatalog(catalog_dir)
+    files = catalog.find("VJ102IMG", site, day, day)
+    if not files:
+        catalog.update(raw_dir / site / f"{day.year}_{day.timetuple().tm_yday:03d}")
+        files = catalog.find("VJ102IMG", site, day, day)
+    if not files:
+        print(f"✘ {site}: no files found to process.")
+        return None
+
+    bt_file = files[0]
+    print(f"→ Processing file: {bt_file.name}")
+    # Resample the window around the volcano onto the site grid (real geolocation if available)
+    geo_file = geolocation_file(bt_file)
+    if geo_file is None:
+        print(f"→ No VJ103IMG geolocation for {bt_file.name}; using the bounding box grid.")
+    bt_da = process_to_grid(bt_file, day, site, geo_file)
+    if bt_da is None:
+        print(f"✘ {site}: the granule does not cover the site window.")
+        return None
+    print(f"→ Mean BT for {day.strftime('%Y-%m-%d')}: {float(np.nanmean(bt_da.values)):.2f} K")
+
+    # Append the scene to the monthly cube (replaces it if the day is already there)
+    output_path = bt_monthly_path(site, day.year, day.month)
+    with nc_lock:
+        position = bt_cube.append_scene(output_path, bt_da)
+        catalog.register(output_path)
+    print(f"✔︎ Updated: {output_path.name} (scene {position})")
+    return output_path
+
+
+def ref_monthly(site, day, rebuild=False):
+    """
+    REF stage: filtered temporal mean of the BT scenes of the month of `day` over the volcano.
+
+    Every scene is brought onto the REF box of the site grid (sites.ref_region: the REF region
+    and the FRP region, so the per-pixel FRP has a background) with a cached resampling plan
+    (resample.load_plan) and folded into the running statistics of the month
+    (RefAccumulator), so each run only reads the scenes added since the previous one.
+    A day ingested again by bt_daily gets a new fingerprint in the cube: if a scene already
+    folded has changed, the statistics of the month are rebuilt.
+    The new scenes are filtered (over the REF region only) and folded as one (time, y, x) batch;
+    their acceptance statistics go to the table REF/_acc/Acc_YYYY_MM_scenes.csv.
+    With `rebuild`, the saved statistics are ignored and the whole month is folded again.
+
+    Input:  BT_<tag>_VJ102IMG_YYYY_MM.nc
+    Output: A00_data/B_processed/<site>/REF/Ref_YYYY_MM.nc (plans in REF/_plans, state in REF/_acc)
+
+    Returns the REF file, or None if it could not be generated.
+    """
+    roi = ref_region(site)
+    year_ref, month_ref = day.year, day.month
+    print(f"\n=== Generating REF for {site} {year_ref}-{month_ref:02d} ===")
+
+    monthly_file = bt_monthly_path(site, year_ref, month_ref)
+    if not monthly_file.exists():
+        print(f"✘ Monthly file not found: {monthly_file.name}")
+        return None
+
+    grid_lat, grid_lon = site_grid(site)
+    if not _roi_mask(*np.meshgrid(grid_lat, grid_lon, indexing="ij"), roi).any():
+        print("✘ Empty region. REF will not be generated.")
+        return None
+
+    # Running statistics of the month: only the scenes not folded yet are read
+    acc_file = accumulator_path(site, year_ref, month_ref)
+    acc = RefAccumulator.load(acc_file) if acc_file.exists() and not rebuild else None
+    box_lat = grid_lat[(grid_lat >= roi["lat_min"]) & (grid_lat <= roi["lat_max"])]
+    box_lon = grid_lon[(grid_lon >= roi["lon_min"]) & (grid_lon <= roi["lon_max"])]
+    if acc is not None and (acc.latitude.shape != box_lat.shape or acc.longitude.shape != box_lon.shape
+                            or not np.allclose(acc.latitude, box_lat) or not np.allclose(acc.longitude, box_lon)):
+        # Statistics saved over another box (e.g. before the REF took in the FRP region)
+        print("⚠️ Saved statistics cover another box. Rebuilding the month.")
+        acc, rebuild = None, True
+    with nc_lock:
+        index = bt_cube.scene_index(monthly_file)
+        fingerprints = {str(date): value for date, value in bt_cube.scene_fingerprints(monthly_file).items()}
+    changed = acc.changed_scenes(fingerprints) if acc is not None else []
+    if changed:
+        # A folded scene cannot be taken out of the running statistics: start the month again
+        print(f"⚠️ Scenes replaced since they were folded: {', '.join(changed)}. Rebuilding the month.")
+        acc, rebuild = None, True
+    new_scenes = {str(date): i for date, i in sorted(index.items())
+                  if acc is None or str(date) not in acc.scenes}
+    print(f"✔︎ Monthly file: {monthly_file.name} ({len(new_scenes)} new of {len(index)} scenes)")
+
+    if new_scenes:
+        # Only the REF box of the new scenes is read, through the index of the BT archive
+        dates = pd.to_datetime(list(new_scenes))
+        with nc_lock:
+            scenes = archive.open_bt(site, dates.min(), dates.max(), roi, bt_dir(site), layout="cube")
+        scenes = scenes.sel(time=dates.values.astype("datetime64[ns]"))
+
+        bt_values = scenes["BT_I05"].values
+        scene_lat = np.broadcast_to(scenes["latitude"].values, bt_values.shape[:2])
+        scene_lon = np.broadcast_to(scenes["longitude"].values, bt_values.shape[::2])
+
+        # Scenes sharing a grid share a resampling plan (built once, cached on disk) and are
+        # gathered onto the ROI box of the site grid together
+        groups = {}
+        for k in range(len(new_scenes)):
+            groups.setdefault(resample.plan_key(scene_lat[k], scene_lon[k], grid_lat, grid_lon, roi), []).append(k)
+        boxes = None
+        for members in groups.values():
+            plan = resample.load_plan(plan_dir(site), scene_lat[members[0]], scene_lon[members[0]],
+                                      grid_lat, grid_lon, roi)
+            if boxes is None:
+                boxes = np.empty((len(new_scenes),) + plan["valid"].shape, dtype="f4")
+            boxes[members] = resample.apply_plan(bt_values[members], plan)
+
+        # Quality filter of all the new scenes at once (over the REF region, the FRP region may
+        # hold the hot spot), then a single fold into the statistics
+        in_ref = _roi_mask(*np.meshgrid(plan["latitude"], plan["longitude"], indexing="ij"), get_site(site)["ref_roi"])
+        table = ref_accumulator.scene_quality(np.where(in_ref, boxes, np.nan), new_scenes)
+        print(table.to_string(float_format="{:.2f}".format))
+        if acc is None:
+            acc = RefAccumulator(plan["latitude"], plan["longitude"])
+        acc.add_batch(boxes, list(new_scenes), table["accepted"].values,
+                      [fingerprints.get(date) for date in new_scenes])
+        acc.save(acc_file)
+        _save_scene_table(scene_table_path(site, year_ref, month_ref), table, rebuild)
+
+    used_scenes = acc.used_scenes if acc is not None else []
+    print(f"\nValid scenes: {len(used_scenes)} / {len(index)}")
+
+    if len(used_scenes) == 0:
+        print("✘ No valid scenes found. REF will not be generated.")
+        return None
+
+    # Temporal mean (REF) of the accepted scenes, plus std/min/max/count and the robust
+    # variants (median, percentiles, sigma-clipped mean)
+    ref_ds = acc.materialize()
+    ref_ds.attrs["description"] = "Filtered monthly REF over the volcano"
+
+    output_path = ref_path(site, year_ref, month_ref)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with nc_lock:
+        try:
+            if output_path.exists():
+                output_path.unlink()  # Delete if file already exists
+            ref_ds.to_netcdf(output_path, mode="w")
+            print(f"\n✔︎ REF saved to: {output_path}")
+        except PermissionError:
+            output_path = output_path.parent / f"Ref_{year_ref}_{month_ref:02d}_v2.nc"
+            ref_ds.to_netcdf(output_path, mode="w")
+            print(f"\n✔︎ REF saved as alternative version: {output_path}")
+        FileCatalog(catalog_dir).register(output_path)
+    return output_path
+
+
+def frp_daily(site, day):
+    """
+    FRP stage: radiative power of `day` from the mean BT over the volcano, with the FRP model
+    registered for the site (frp.model_parameters), appended to the FRP series of the site.
+
+    Input:  BT_<tag>_VJ102IMG_YYYY_MM.nc
+    Output: A00_data/B_processed/<site>/Radiative_Power_by_Year_Month_Day/<frp_file>
+
+    Returns the FRP file, or None if no value was added.
+    """
+    output_nc = frp_path(site)
+    output_nc.parent.mkdir(parents=True, exist_ok=True)
+    date_str = day.strftime("%Y-%m-%d")
+    print(f"\n=== CALCULATING FRP FOR {site} {date_str} ===")
+
+    bt_file = bt_monthly_path(site, day.year, day.month)
+    if not bt_file.exists():
+        print(f"{date_str} → Monthly file not found: {bt_file.name}")
+        return None
+
+    # Look the date up in the archive index and read only the FRP region of that scene
+    time_target = np.datetime64(day.date())
+    with nc_lock:
+        scenes = archive.open_bt(site, day, day, get_site(site)["frp_roi"], bt_dir(site), layout="cube")
+    if scenes is None:
+        print(f"{date_str} → No data available for this date in the file.")
+        return None
+    bt = scenes["BT_I05"]
+
+    # Masked mean BT and FRP with the same engine and model used for whole series
+    series = frp.site_series(site, bt)
+    t_mean, t_floor, value = (float(series[name][0]) for name in ("BT_mean", "t_floor", "FRP"))
+    if np.isnan(t_floor):
+        print(f"{date_str} → Before the start of the FRP model. FRP not computed.")
+        return None
+    if value == 0:
+        print(f"{date_str} → BTmean={t_mean:.2f} K <= floor={t_floor:.2f} → FRP=0")
+    else:
+        print(f"{date_str} → BTmean={t_mean:.2f} K, FRP={value:.2f} MW")
+
+    if value > frp_max:
+        print(f"✘ {date_str} → FRP exceeds expected range. Value discarded.")
+        return None
+
+    new_ds = series[["FRP"]]
+
+    # Append to existing NetCDF or create a new one
+    with nc_lock:
+        if output_nc.exists():
+            with xr.open_dataset(output_nc) as existing:
+                if time_target in existing.time.values:
+                    print(f"{date_str} → Entry already exists. No overwrite.")
+                    return output_nc
+                combined = xr.concat([existing.load(), new_ds], dim="time").sortby("time")
+            combined.to_netcdf(output_nc, mode="w")
+            print(f"✔︎ FRP appended to {output_nc.name}")
+        else:
+            new_ds.to_netcdf(output_nc)
+            print(f"✔︎ NetCDF created: {output_nc.name}")
+    return output_nc
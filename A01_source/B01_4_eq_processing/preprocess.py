@@ -3,97 +3,77 @@ import pandas as pd
 import sys
 import os
 import shutil
-from tqdm import tqdm
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
 from A01_source.B01_2_eq_download import utils as utils # To avoid circular import issues 
 from A01_source.B01_2_eq_download import download as dwl
+from A01_source.B01_2_eq_download import event_store
 from A01_source.B01_2_eq_download.download import ref
+from A01_source.B01_4_eq_processing.trigger import haversine, trigger_index_table, load_volcanoes, trigger_matrix
 
-def fault_length(magnitude, L_method = "Singh"):
-    if L_method == "Singh":
-        L = np.sqrt(10**(magnitude - 4))
-    
-    elif L_method == "USGS":
-        L = 10**(0.5 * magnitude - 1.85)
-    return L
-
-def distance_calculation(lat1, lon1, lat2, lon2):
-    lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
-
-    # Haversine formula
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
-    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
-
-    distance = utils.R_earth * c
-    return id, distance
-
-# This function must be called only after the working_df function, it uses the wrk_df.csv file
-def trigger_index(L_method="Singh", file_name="wrk_df.csv"):
-
-    file_path = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.abspath(os.path.join(file_path, "..", ".."))
+def distance_calculation(lat1, lon1, lat2, lon2, event_id=None):
+    # Haversine formula (scalars or whole arrays), with the id(s) of the event(s) it belongs to
+    distance = haversine(lat1, lon1, lat2, lon2)
+    return event_id, distance
 
-    file_path = os.path.join(project_root, f"A00_data/B_eq_processed/{file_name}")
+# This function must be called only after the working_df function, it uses the wrk_df event store
+def trigger_index(L_method="Singh", file_name="wrk_df"):
 
-    df = pd.read_csv(file_path)
+    df = event_store.load_events(file_name)
 
     lat1 = dwl.lat_cent
     lon1 = dwl.lon_cent
 
-    result_df = pd.DataFrame(columns=["id","time", "magnitude", "magtype", "depth", "latitude", "longitude", "distance", "trigger_index" ])
+    # Distance and trigger index of all the events at once (whole columns, one frame)
+    result_df = trigger_index_table(df, lat1, lon1, L_method=L_method)
     
-    for index, row in tqdm(df.iterrows(), total=len(df), desc="Procesando filas"):
-        lat2 = row["latitude"]
-        lon2 = row["longitude"]
-        mag = row["magnitude"]
-        L = fault_length(mag, L_method= L_method)
-        d = distance_calculation(lat1, lon1, lat2, lon2)[1]
-        trigger_index = round(d / L, 3)
-
-        result_df.loc[index] = [row["id"], row["time"], row["magnitude"], row["magtype"], row["depth"], row["latitude"], row["longitude"], round(d, 3), trigger_index]
-    
-    utils.saving_data(result_df, "wrk_df.csv", folder="B_eq_processed")
+    event_store.save_events(result_df, "wrk_df")
     return result_df
 
-def discard_by_max_trigger_index(file="wrk_df.csv", max_trigger_index= 100.0):
+def discard_by_max_trigger_index(file="wrk_df", max_trigger_index= 100.0):
     
     trigger_index(L_method="Singh", file_name=file)
-    
-    path = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.abspath(os.path.join(path, "..", ".."))
-
-    file_path = os.path.join(project_root, f"A00_data/B_eq_processed/{file}")
 
-    df = pd.read_csv(file_path)
-    result_df = df[df["trigger_index"] <= max_trigger_index]
+    # The condition is pushed down to the Parquet store: only the matching rows are read
+    result_df = event_store.load_events(file, max_trigger_index=max_trigger_index)
 
     if result_df.empty==True:
         print(f"There are no records that fulldfill the condition of trigger index > {max_trigger_index}")
     else:
         print(f"There were {len(result_df)} records saved")
 
-    utils.saving_data(result_df, "trigger_index_filtered.csv", folder="B_eq_processed")
+    event_store.save_events(result_df, "trigger_index_filtered")
     return result_df
 
-def user_answers(dwl_opt="no", discard_trigger_index="no"):
+def trigger_index_by_volcano(file="wrk_df", max_trigger_index=100.0, L_method="Singh"):
+    # Every event against every volcano of the volcano list: only the pairs under max_trigger_index are kept
+    df = event_store.load_events(file, columns=["id", "time", "magnitude", "latitude", "longitude"])
+    pairs = trigger_matrix(df, load_volcanoes(), max_trigger_index=max_trigger_index, L_method=L_method)
+
+    file_path = os.path.join(event_store.data_dir, "B_eq_processed", "trigger_pairs.parquet")
+    pairs.to_parquet(file_path, index=False)
+    print(f"There were {len(pairs)} (event, volcano) pairs saved to {file_path}")
+    return pairs
+
+def user_answers(dwl_opt="no", discard_trigger_index="no", full_refresh="no"):
+
+    # Incremental ComCat sync by default; full_refresh="yes" downloads the whole window again
+    incremental = full_refresh != "yes"
 
     if dwl_opt == "no":
-        dwl.download_all_by_region(*ref)
+        dwl.download_all_by_region(*ref, incremental=incremental)
         if discard_trigger_index == "yes":
-            discard_by_max_trigger_index(file="wrk_df.csv")
+            discard_by_max_trigger_index(file="wrk_df")
         if discard_trigger_index == "no":
             trigger_index(L_method="Singh")
-        return print("All vents downloaded in 'wrk_df.csv'")
+        return print("All vents downloaded in 'wrk_df'")
     
     elif dwl_opt == "yes":
-        dwl.download_optimized(*ref)
+        dwl.download_optimized(*ref, incremental=incremental)
         if discard_trigger_index == "yes":
-            discard_by_max_trigger_index(file="wrk_df.csv")
+            discard_by_max_trigger_index(file="wrk_df")
         if discard_trigger_index == "no":
             trigger_index(L_method="Singh")
 
-        return print("Only relevants events downloaded in 'trigger_index_filtered.csv'")
+        return print("Only relevants events downloaded in 'trigger_index_filtered'")
@@ -11,6 +11,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".
 from A01_source.B01_4_eq_processing import preprocess as pre
 from A01_source.B01_2_eq_download import utils as utils
 from A01_source.B01_2_eq_download import download as dwl
+from A01_source.B01_2_eq_download import event_store
+from A01_source.B01_2_eq_download.event_index import region_events
 
 def main():
     try:
@@ -21,22 +23,19 @@ def main():
         current_dir = os.path.dirname(os.path.abspath(__file__))
         base_dir = os.path.dirname(os.path.dirname(current_dir))
         
-        files = ["wrk_df.csv", "trigger_index_filtered.csv"]
-
-        input_csv = os.path.join(base_dir, "A00_data", "B_eq_processed", f"{files[0]}")
-        input_csv_filtered = os.path.join(base_dir, "A00_data", "B_eq_processed", f"{files[1]}")
+        stores = ["wrk_df", "trigger_index_filtered"]
         output_folder = os.path.join(base_dir, "A04_web", "B_images")
 
-        if not os.path.exists(input_csv):
-            print(f"❌ Error: File not found at {input_csv}", file=sys.stderr)
+        eq_data = event_store.load_events(stores[0])
+        if eq_data.empty:
+            print(f"❌ Error: No events found at {event_store.store_path(stores[0])}", file=sys.stderr)
             return 1
         
         os.makedirs(output_folder, exist_ok=True)
 
-        eq_data = pd.read_csv(input_csv)
         print(f"✅ Data loaded successfully ({len(eq_data)} records)")
 
-        eq_filtered_data = pd.read_csv(input_csv_filtered)
+        eq_filtered_data = event_store.load_events(stores[1])
         print(f"✅ Filtered data loaded successfully ({len(eq_filtered_data)} records)")
         
         print("🔄 Generating table...")
@@ -44,8 +43,9 @@ def main():
         print("✅ Table generated successfully")
         
         print("🔄 Generating maps...")
-        generate_map(eq_data, output_folder, is_filtered=False)
-        generate_map(eq_filtered_data, output_folder, is_filtered=True)
+        # Only the events inside the download box (spatial index of each store)
+        generate_map(region_events(stores[0], dwl.ref[2], dwl.ref[3]), output_folder, is_filtered=False)
+        generate_map(region_events(stores[1], dwl.ref[2], dwl.ref[3]), output_folder, is_filtered=True)
         print("✅ Maps generated successfully")
         
         print("🔄 Generating histogram...")
@@ -53,7 +53,7 @@ def main():
         print("✅ Histogram generated successfully")
         
         print("🔄 Plotting events histogram...")
-        plot_events_histogram(file="wrk_df.csv")
+        plot_events_histogram(file="wrk_df")
         print("✅ Events histogram plotted successfully")
 
         return 0
@@ -70,32 +70,33 @@ def ask_for_data_update():
     print("Processing inputs...")
 
     if input_ask1 == "yes":
+        input_ask4 = input("Do you want a full refresh? If not, only new and updated events are downloaded (yes/no): ").strip().lower()
         print("Updating data...")
         if input_ask2 == "yes":
             print("Download method: optimized (not getting all events)") 
 
             if input_ask3 == "yes":
                 print("Dowloading only events with trigger index <= 100...")
-                pre.user_answers(dwl_opt= input_ask2, discard_trigger_index= input_ask3)
+                pre.user_answers(dwl_opt= input_ask2, discard_trigger_index= input_ask3, full_refresh= input_ask4)
             if input_ask3 == "no":
                 print("Downloading all events")
-                pre.user_answers(dwl_opt= input_ask2, discard_trigger_index= input_ask3)       
+                pre.user_answers(dwl_opt= input_ask2, discard_trigger_index= input_ask3, full_refresh= input_ask4)       
             
         if input_ask2 == "no":
             print("Download method: not optimized (getting all events)")  
             if input_ask3 == "yes":
                 print("Dowloading only events with trigger index <= 100...")
-                pre.user_answers(dwl_opt= input_ask2, discard_trigger_index= input_ask3)
+                pre.user_answers(dwl_opt= input_ask2, discard_trigger_index= input_ask3, full_refresh= input_ask4)
             if input_ask3 == "no":
                 print("Downloading all events")
-                pre.user_answers(dwl_opt= input_ask2, discard_trigger_index= input_ask3)
+                pre.user_answers(dwl_opt= input_ask2, discard_trigger_index= input_ask3, full_refresh= input_ask4)
 
     if input_ask1 == "no":
         print("No updates applied.")
         if input_ask2 == "yes" or input_ask2 == "no":
             if input_ask3 == "yes":
                 print("Applying filter to trigger index...")
-                pre.discard_by_max_trigger_index(file="wrk_df.csv")
+                pre.discard_by_max_trigger_index(file="wrk_df")
             if input_ask3 == "no":
                 print("No filter applied.")
 
@@ -339,14 +340,9 @@ def count_events_per_month(data):
 
     return monthly_counts
 
-def plot_events_histogram(file = "wrk_df.csv"):
-    path = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.abspath(os.path.join(path, "..", ".."))
-
-    file_path = os.path.join(project_root, f"A00_data/B_eq_processed/{file}")
-    df = pd.read_csv(file_path)
-
-    df["time"] = pd.to_datetime(df["time"], errors = 'coerce')
+def plot_events_histogram(file = "wrk_df"):
+    # Only the event times are needed
+    df = event_store.load_events(file, columns=["time"])
     df = df.dropna(subset = ["time"])
 
     total_events = len(df)
@@ -0,0 +1,133 @@
+import glob
+import os
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from A01_source.B01_2_eq_download.utils import R_earth
+from A01_source.B01_2_eq_download.event_store import data_dir
+from A01_source.B01_2_eq_download.event_index import unit_vectors, chord
+
+# Columns of the trigger index table, in order
+TRIGGER_COLUMNS = ["id", "time", "magnitude", "magtype", "depth", "latitude", "longitude", "distance", "trigger_index"]
+
+# Columns of the (event, volcano) pairs table
+PAIR_COLUMNS = ["id", "time", "magnitude", "volcano", "country", "distance", "trigger_index"]
+
+# Volcano lists exported from the Smithsonian GVP (the newest one is used)
+volcanoes_dir = os.path.join(data_dir, "B_eq_raw", "volcanoes_lists")
+
+
+def fault_length(magnitude, L_method = "Singh"):
+    """Fault length in km for a magnitude or an array of magnitudes"""
+    if L_method == "Singh":
+        L = np.sqrt(10**(np.asarray(magnitude, dtype=float) - 4))
+    elif L_method == "USGS":
+        L = 10**(0.5 * np.asarray(magnitude, dtype=float) - 1.85)
+    else:
+        raise ValueError("Invalid L_method. Choose 'Singh' or 'USGS'.")
+    return L
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between points given in degrees. Works on arrays (broadcast)."""
+    lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
+    return R_earth * 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+
+
+def trigger_index_table(df, lat_cent, lon_cent, L_method = "Singh"):
+    """
+    Distance to the centre and trigger index (distance / fault length) of every event, computed
+    over whole columns and returned as a new frame with TRIGGER_COLUMNS (values rounded to 3 decimals).
+    """
+    magnitude = pd.to_numeric(df["magnitude"], errors="coerce").to_numpy(dtype=float)
+    latitude = pd.to_numeric(df["latitude"], errors="coerce").to_numpy(dtype=float)
+    longitude = pd.to_numeric(df["longitude"], errors="coerce").to_numpy(dtype=float)
+
+    distance = haversine(lat_cent, lon_cent, latitude, longitude)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        trigger_index = distance / fault_length(magnitude, L_method)
+
+    result_df = df.reindex(columns=TRIGGER_COLUMNS[:-2]).copy()
+    result_df["distance"] = np.round(distance, 3)
+    result_df["trigger_index"] = np.round(trigger_index, 3)
+    return result_df
+
+
+def load_volcanoes(path=None):
+    """
+    Volcano list as a DataFrame with volcano, country, latitude, longitude and elevation.
+    By default the newest volcanoes-*.csv of A00_data/B_eq_raw/volcanoes_lists.
+    """
+    if path is None:
+        files = sorted(glob.glob(os.path.join(volcanoes_dir, "volcanoes-*.csv")))
+        if not files:
+            raise FileNotFoundError(f"No volcanoes-*.csv file in {volcanoes_dir}")
+        path = files[-1]
+
+    df = pd.read_csv(path, sep=";")
+    df = df.rename(columns={"Volcano Name": "volcano", "Country": "country", "Latitude": "latitude",
+                            "Longitude": "longitude", "Elevation (m)": "elevation"})
+    df = df[["volcano", "country", "latitude", "longitude", "elevation"]]
+    return df.dropna(subset=["latitude", "longitude"]).reset_index(drop=True)
+
+
+def trigger_matrix(events, volcanoes, max_trigger_index = 100.0, L_method = "Singh", chunk_size = 100_000):
+    """
+    Distance and trigger index of every (event, volcano) pair with trigger index <= max_trigger_index.
+
+    An event can only reach the volcanoes closer than max_trigger_index * L(magnitude) km, so the
+    volcanoes are put in a KD-tree (unit sphere) and each event only looks at the ones inside that
+    radius. The exact distances of those candidates are then computed all at once. Events are
+    processed chunk_size at a time to bound the memory.
+
+    Returns:
+        pd.DataFrame: One row per pair (PAIR_COLUMNS), sorted by event and distance.
+    """
+    magnitude = pd.to_numeric(events["magnitude"], errors="coerce").to_numpy(dtype=float)
+    latitude = pd.to_numeric(events["latitude"], errors="coerce").to_numpy(dtype=float)
+    longitude = pd.to_numeric(events["longitude"], errors="coerce").to_numpy(dtype=float)
+    reach = max_trigger_index * fault_length(magnitude, L_method)
+    valid = np.flatnonzero(np.isfinite(reach) & np.isfinite(latitude) & np.isfinite(longitude))
+
+    vlat = volcanoes["latitude"].to_numpy(dtype=float)
+    vlon = volcanoes["longitude"].to_numpy(dtype=float)
+    tree = cKDTree(unit_vectors(vlat, vlon))
+
+    event_rows, volcano_rows, distances, indices = [], [], [], []
+    for start in range(0, len(valid), chunk_size):
+        rows = valid[start:start + chunk_size]
+        # Candidates: volcanoes inside the reach of each event (small margin for rounding)
+        candidates = tree.query_ball_point(unit_vectors(latitude[rows], longitude[rows]),
+                                           r=chord(reach[rows]) * (1 + 1e-9) + 1e-12)
+        counts = np.fromiter((len(c) for c in candidates), dtype=np.int64, count=len(rows))
+        if counts.sum() == 0:
+            continue
+        e = np.repeat(rows, counts)
+        v = np.concatenate([c for c in candidates if c]).astype(np.int64)
+
+        distance = haversine(latitude[e], longitude[e], vlat[v], vlon[v])
+        trigger_index = distance / fault_length(magnitude[e], L_method)
+        keep = trigger_index <= max_trigger_index
+        event_rows.append(e[keep])
+        volcano_rows.append(v[keep])
+        distances.append(distance[keep])
+        indices.append(trigger_index[keep])
+
+    if not event_rows:
+        return pd.DataFrame({c: pd.Series(dtype=float if c in ("distance", "trigger_index") else object)
+                             for c in PAIR_COLUMNS})
+
+    e = np.concatenate(event_rows)
+    v = np.concatenate(volcano_rows)
+    pairs = events.iloc[e].reindex(columns=["id", "time", "magnitude"]).reset_index(drop=True)
+    pairs["volcano"] = volcanoes["volcano"].to_numpy()[v] if "volcano" in volcanoes else v
+    pairs["country"] = volcanoes["country"].to_numpy()[v] if "country" in volcanoes else None
+    pairs["distance"] = np.round(np.concatenate(distances), 3)
+    pairs["trigger_index"] = np.round(np.concatenate(indices), 3)
+
+    order = np.lexsort((pairs["distance"].to_numpy(), e))
+    return pairs.iloc[order].reset_index(drop=True)
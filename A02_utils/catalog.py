@@ -0,0 +1,236 @@
+# catalog.py
+"""
+Persistent catalogue of the satellite files in A00_data.
+
+Every granule, BT file and REF is recorded once in a small SQLite index (product, site,
+acquisition time, day/night flag, bounding box, path, size and checksum). The download and
+the processing stages add their outputs as they write them, so finding the inputs of a date
+range is an indexed query instead of a walk over years of <year>_<doy> folders.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta
+
+import netCDF4
+
+from A01_source.B01_1_download.cache import sha256_archivo
+from A02_utils.sites import SITES
+
+# Default root of the catalogue (A00_data) and name of its index
+DATA_DIR = Path(__file__).resolve().parents[1] / "A00_data"
+INDEX_NAME = "catalog.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path      TEXT PRIMARY KEY,
+    product   TEXT NOT NULL,
+    site      TEXT,
+    time      TEXT NOT NULL,
+    day_night TEXT,
+    south     REAL,
+    north     REAL,
+    west      REAL,
+    east      REAL,
+    size      INTEGER NOT NULL,
+    mtime_ns  INTEGER NOT NULL,
+    sha256    TEXT
+);
+CREATE INDEX IF NOT EXISTS files_product_site_time ON files (product, site, time);
+"""
+
+# File name -> (product, acquisition time). Raw granules keep the LAADS product name.
+_NAMES = [
+    (re.compile(r"^(VJ\d{2}\w+)\.A(\d{4})(\d{3})\.(\d{4})\."),
+     lambda m: (m[1], datetime.strptime(f"{m[2]}{m[3]}{m[4]}", "%Y%j%H%M"))),
+    (re.compile(r"^BT_.+_VJ\d{2}\w+_(\d{4})_(\d{3})\.nc$"),
+     lambda m: ("BT_daily", datetime.strptime(f"{m[1]}{m[2]}", "%Y%j"))),
+    (re.compile(r"^BT_.+_VJ\d{2}\w+_(\d{4})_(\d{2})\.nc$"),
+     lambda m: ("BT_monthly", datetime(int(m[1]), int(m[2]), 1))),
+    (re.compile(r"^Ref_(\d{4})_(\d{2})(_v2)?\.nc$"),
+     lambda m: ("REF", datetime(int(m[1]), int(m[2]), 1))),
+]
+
+# Products rewritten in place (a monthly cube gets a new scene every day): their entries keep
+# size and modification time only, hashing the whole cube on every scene would cost more than
+# writing it
+_NO_CHECKSUM = {"BT_monthly"}
+
+
+# === FUNCTIONS ===
+def parse_name(name):
+    """
+    Product and acquisition time of a file name, or None if it is not a catalogued product.
+    Granules (VJ102IMG.A2025123.0142...) give the time of the scan; daily BT files the day;
+    monthly BT and REF files the first day of the month.
+    """
+    for pattern, parse in _NAMES:
+        match = pattern.match(name)
+        if match:
+            return parse(match)
+    return None
+
+
+def granule_attributes(path):
+    """Day/night flag and bounding box (south, north, west, east) of a granule, None where missing"""
+    try:
+        with netCDF4.Dataset(path) as nc:
+            attrs = nc.__dict__
+    except OSError:
+        return None, (None, None, None, None)
+    bbox = tuple(attrs.get(f"{side}BoundingCoordinate") for side in ("South", "North", "West", "East"))
+    return attrs.get("DayNightFlag"), tuple(None if v is None else float(v) for v in bbox)
+
+
+class FileCatalog:
+    """
+    SQLite index of the files under a data folder.
+
+    Entries are keyed by path (relative to the root when inside it) and refreshed only when
+    the size or modification time of the file changes, so registering a file twice or
+    updating a folder that did not change costs one stat per file.
+
+    Args:
+        root (str | Path): Data folder (A00_data by default). The index is <root>/catalog.sqlite.
+    """
+
+    def __init__(self, root=DATA_DIR):
+        self.root = Path(root)
+        self.index_path = self.root / INDEX_NAME
+        self._lock = threading.Lock()
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            con.executescript(_SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.index_path, timeout=30)
+
+    def _key(self, path):
+        path = Path(path).resolve()
+        try:
+            return path.relative_to(self.root.resolve()).as_posix()
+        except ValueError:
+            return path.as_posix()
+
+    def _path(self, key):
+        return Path(key) if os.path.isabs(key) else self.root / key
+
+    def register(self, path, day_night=None, bbox=None, sha256=None):
+        """
+        Adds or refreshes the entry of a file.
+
+        Args:
+            path (str | Path): File to register.
+            day_night (str, optional): Day/night flag, if already known (read from granules otherwise).
+            bbox (tuple, optional): (south, north, west, east), if already known.
+            sha256 (str, optional): Checksum of the file, if already known (computed otherwise,
+                except for the products rewritten in place, which are not hashed).
+
+        Returns:
+            bool: True if the entry was added or changed, False if it was up to date or the
+            file is not a catalogued product.
+        """
+        path = Path(path)
+        parsed = parse_name(path.name)
+        if parsed is None:
+            return False
+        product, acquired = parsed
+        key = self._key(path)
+        stat = path.stat()
+
+        with self._connect() as con:
+            row = con.execute("SELECT size, mtime_ns FROM files WHERE path=?", (key,)).fetchone()
+        if row == (stat.st_size, stat.st_mtime_ns):
+            return False
+
+        if product.startswith("VJ") and (day_night is None or bbox is None):
+            day_night_file, bbox_file = granule_attributes(path)
+            day_night = day_night if day_night is not None else day_night_file
+            bbox = bbox if bbox is not None else bbox_file
+        south, north, west, east = bbox if bbox is not None else (None, None, None, None)
+        site = next((part for part in path.parts if part in SITES), None)
+        if sha256 is None and product not in _NO_CHECKSUM:
+            sha256 = sha256_archivo(path)
+
+        with self._lock, self._connect() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, product, site, acquired.isoformat(), day_night, south, north, west, east,
+                 stat.st_size, stat.st_mtime_ns, sha256),
+            )
+        return True
+
+    def remove(self, path):
+        """Forgets the entry of a file"""
+        with self._lock, self._connect() as con:
+            con.execute("DELETE FROM files WHERE path=?", (self._key(path),))
+
+    def update(self, folder=None):
+        """
+        Brings the entries under `folder` (the whole root by default) in line with the disk:
+        new and changed files are registered and entries of deleted files are removed.
+        Folders starting with "_" (shared downloads, granule cache, plans) are skipped.
+
+        Returns:
+            tuple: (files added or changed, entries removed).
+        """
+        folder = Path(folder) if folder is not None else self.root
+        changed, seen = 0, set()
+        for dirpath, dirnames, filenames in os.walk(folder):
+            dirnames[:] = [d for d in dirnames if not d.startswith("_")]
+            for name in filenames:
+                if parse_name(name) is not None:
+                    path = Path(dirpath) / name
+                    seen.add(self._key(path))
+                    changed += self.register(path)
+
+        prefix = self._key(folder).rstrip("/") + "/"
+        with self._lock, self._connect() as con:
+            keys = [k for (k,) in con.execute("SELECT path FROM files WHERE path LIKE ? ESCAPE '\\'",
+                                              (prefix.replace("_", "\\_").replace("%", "\\%") + "%",))]
+            gone = [k for k in keys if k not in seen]
+            con.executemany("DELETE FROM files WHERE path=?", [(k,) for k in gone])
+        return changed, len(gone)
+
+    def find(self, product, site=None, start=None, end=None, day_night=None):
+        """
+        Files of a product acquired between `start` and `end` (both days included, None for no
+        limit), optionally of one site and day/night flag, in order of acquisition.
+
+        Returns:
+            list[Path]: Paths of the files (entries whose file is gone are left out).
+        """
+        query, params = "SELECT path FROM files WHERE product=?", [product]
+        if site is not None:
+            query += " AND site=?"
+            params.append(site)
+        if start is not None:
+            query += " AND time >= ?"
+            params.append(datetime(start.year, start.month, start.day).isoformat())
+        if end is not None:
+            query += " AND time < ?"
+            params.append((datetime(end.year, end.month, end.day) + timedelta(days=1)).isoformat())
+        if day_night is not None:
+            query += " AND day_night=?"
+            params.append(day_night)
+
+        with self._connect() as con:
+            keys = [k for (k,) in con.execute(query + " ORDER BY time, path", params)]
+        paths = [self._path(k) for k in keys]
+        return [p for p in paths if p.exists()]
+
+    def entry(self, path):
+        """Catalogue entry of a file as a dict, or None if it is not registered"""
+        with self._connect() as con:
+            con.row_factory = sqlite3.Row
+            row = con.execute("SELECT * FROM files WHERE path=?", (self._key(path),)).fetchone()
+        return dict(row) if row is not None else None
+
+
+if __name__ == "__main__":
+    added, removed = FileCatalog().update()
+    print(f"✔︎ Catalogue updated: {added} files added or changed, {removed} removed.")
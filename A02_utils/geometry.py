@@ -8,6 +8,10 @@ import plotly.io as pio
 from datetime import datetime
 import numpy as np
 
+# Project root on the path to read the earthquake event store. The A01_source modules are
+# imported inside the functions that use them, so A02_utils does not depend on them at import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 # Configuration - La Palma volcano coordinates
 VOLCANO_COORDS = {
     'latitude': 28.57,
@@ -15,6 +19,13 @@ VOLCANO_COORDS = {
     'region_radius': 100  # km around volcano
 }
 
+# Default area shown in the maps (Canary Islands)
+MAP_BOUNDS = {
+    'name': 'Canary Islands',
+    'latitude': [27.5, 29.8],
+    'longitude': [-18.5, -13.0]
+}
+
 # Custom CSS for rounded corners
 ROUNDED_CORNERS_CSS = """
 <style>
@@ -50,22 +61,21 @@ def add_rounded_corners(html_path):
     except Exception as e:
         print(f"❌ Error adding rounded corners: {str(e)}", file=sys.stderr)
 
-def load_data(file_name):
-    """Load earthquake data from CSV with correct relative paths"""
+def load_data(file_name, columns=None):
+    """Load earthquake data from the Parquet event store (typed columns, only those requested)"""
+    from A01_source.B01_2_eq_download import event_store
+
     try:
-        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-        data_path = os.path.join(base_dir, "A00_data", "B_eq_processed", file_name)
+        data_path = event_store.store_path(file_name)
         
         print(f"🔄 Loading data from: {data_path}")
         
-        if not os.path.exists(data_path):
-            print(f"❌ File not found at: {data_path}")
+        df = event_store.load_events(file_name, columns=columns)
+        if df.empty:
+            print(f"❌ No events found at: {data_path}")
             return pd.DataFrame()
         
-        df = pd.read_csv(data_path)
-        
         if 'time' in df.columns:
-            df['time'] = pd.to_datetime(df['time'], errors='coerce')
             df = df.dropna(subset=['time'])
         
         print(f"✅ Loaded {len(df)} records from {file_name}")
@@ -75,8 +85,24 @@ def load_data(file_name):
         print(f"❌ Error loading {file_name}: {str(e)}", file=sys.stderr)
         return pd.DataFrame()
 
-def generate_map(data, output_folder, is_filtered=False):
-    """Generate earthquake map with Canary Islands focus"""
+def download_region():
+    """Centre (lat, lon) and radius (km) of the earthquake download (ref of B01_2_eq_download/download.py)"""
+    from A01_source.B01_2_eq_download import download as dwl
+    return dwl.ref[2], dwl.ref[3]
+
+def map_events(file_name, center_coords, region_rad):
+    """Events of a store inside the box of its download region (same selection as process_eq_data)"""
+    from A01_source.B01_2_eq_download.event_index import region_events
+    return region_events(file_name, center_coords, region_rad)
+
+def region_bounds(center_coords, region_rad):
+    """Map area (as MAP_BOUNDS) of the box of a download region"""
+    from A01_source.B01_2_eq_download.utils import limit_region_coords
+    lat_min, lat_max, lon_min, lon_max = limit_region_coords(*center_coords, region_rad)
+    return {'name': 'Download region', 'latitude': [lat_min, lat_max], 'longitude': [lon_min, lon_max]}
+
+def generate_map(data, output_folder, is_filtered=False, bounds=MAP_BOUNDS):
+    """Generate earthquake map focused on `bounds` (Canary Islands by default)"""
     try:
         output_path = os.path.join(output_folder, 
                                  "eq_map_filtered.html" if is_filtered else "eq_map.html")
@@ -125,13 +151,13 @@ def generate_map(data, output_folder, is_filtered=False):
             showocean = True,
             oceancolor = 'rgb(212, 212, 255)',
             coastlinewidth = 1.5,
-            lataxis_range = [27.5, 29.8],  # Canary Islands latitude range
-            lonaxis_range = [-18.5, -13.0] # Canary Islands longitude range
+            lataxis_range = bounds['latitude'],  # Map latitude range
+            lonaxis_range = bounds['longitude'] # Map longitude range
         
         )
         
         fig.update_layout(
-            title = dict(text=f"{title}<br><sup>Canary Islands</sup>", x=0.5, font=dict(size=20)),
+            title = dict(text=f"{title}<br><sup>{bounds['name']}</sup>", x=0.5, font=dict(size=20)),
             margin = dict(l=0, r=0, t=60, b=0),
             geo = dict(bgcolor='white', subunitwidth=1)
         )
@@ -199,7 +225,7 @@ def generate_histogram(data, output_folder):
 def plot_events_histogram(output_folder):
     """Generate time-based histogram with consistent styling"""
     try:
-        df = load_data("wrk_df.csv")
+        df = load_data("wrk_df", columns=["time"])
         if df.empty:
             return
 
@@ -318,20 +344,29 @@ def generate_table(data, output_folder):
     except Exception as e:
         print(f"❌ Error generating table: {str(e)}", file=sys.stderr)
 
-def main():
+def main(region=None):
+    """
+    Generates the table, maps and histograms of the event stores.
+
+    Parameters:
+        region (tuple): (center_coords, region_rad) of the download the stores come from, used to
+            select the events and the area of the maps. The one of download.py when not given.
+    """
+    from A01_source.B01_2_eq_download import event_store
+
     try:
         print("\n" + "="*50)
         print("🌋 Earthquake Data Visualization Generator")
         print("="*50 + "\n")
         
-        eq_data = load_data("wrk_df.csv")
-        filtered_data = load_data("trigger_index_filtered.csv")
+        eq_data = load_data("wrk_df")
+        filtered_data = load_data("trigger_index_filtered")
         
         if eq_data.empty:
             print("❌ No earthquake data loaded - check file paths", file=sys.stderr)
             base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-            expected_path1 = os.path.join(base_dir, "A00_data", "B_eq_processed", "wrk_df.csv")
-            expected_path2 = os.path.join(base_dir, "A00_data", "B_eq_processed", "trigger_index_filtered.csv")
+            expected_path1 = event_store.store_path("wrk_df")
+            expected_path2 = event_store.store_path("trigger_index_filtered")
             print(f"Expected files at:\n- {expected_path1}\n- {expected_path2}")
             return 1
         
@@ -344,8 +379,12 @@ def main():
         print("="*50 + "\n")
         
         generate_table(eq_data, output_folder)
-        generate_map(eq_data, output_folder, is_filtered=False)
-        generate_map(filtered_data, output_folder, is_filtered=True)
+        center_coords, region_rad = region if region is not None else download_region()
+        bounds = region_bounds(center_coords, region_rad)
+        generate_map(map_events("wrk_df", center_coords, region_rad), output_folder, is_filtered=False,
+                     bounds=bounds)
+        generate_map(map_events("trigger_index_filtered", center_coords, region_rad), output_folder,
+                     is_filtered=True, bounds=bounds)
         generate_histogram(eq_data, output_folder)
         plot_events_histogram(output_folder)
         
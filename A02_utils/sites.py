@@ -0,0 +1,127 @@
+# sites.py
+"""
+Registry of the volcanic sites monitored with VIIRS.
+
+Every stage of the satellite pipeline (download, BT, REF, FRP) reads the site
+geometry from here instead of keeping its own copy of the coordinates.
+The key of each site is also the name of its folder in A00_data/B_raw and A00_data/B_processed.
+"""
+
+import numpy as np
+
+# Margin in degrees added around the site regions when cropping the swaths at BT ingest
+# (about 5 km; a site can override it with its own "crop_margin")
+CROP_MARGIN = 0.05
+
+# Spacing in degrees of the fixed grid every scene is resampled to (about the 375 m VIIRS I-band pixel)
+GRID_RESOLUTION = 0.0035
+
+# "Phase 2" FRP model of La Palma and Teide: t_floor, area and scale move linearly from the first
+# to the second value between start and end, and keep the last value afterwards
+PHASE2_MODEL = {
+    "kind": "linear",
+    "start": "2022-02-01",
+    "end": "2025-05-01",
+    "t_floor": (265, 270),
+    "area": (1_000_000, 500_000),
+    "scale": (1.5, 0.5),
+}
+
+SITES = {
+    "La_Palma": {
+        # Bounding box used to select the granules
+        "lat_min": 28.601109109131052,
+        "lat_max": 28.62514776637218,
+        "lon_min": -17.929768956228138,
+        "lon_max": -17.872144640744164,
+        # Tag used in the processed file names (BT_<tag>_VJ102IMG_YYYY_MM.nc)
+        "tag": "LaPalma",
+        # Region of the volcano used for the monthly REF
+        "ref_roi": {"lat_min": 28.55, "lat_max": 28.65, "lon_min": -17.93, "lon_max": -17.80},
+        # Region and output file of the daily FRP
+        "frp_roi": {"lat_min": 28.54, "lat_max": 28.57, "lon_min": -17.74, "lon_max": -17.70},
+        "frp_file": "radiative_power.nc",
+        # FRP model (see A01_source/B01_3_processing/frp.py): "Phase 2" since Feb 1, 2022
+        "frp_model": PHASE2_MODEL,
+    },
+    "Teide": {
+        "lat_min": 28.2717,
+        "lat_max": 28.2744,
+        "lon_min": -16.6408,
+        "lon_max": -16.6380,
+        "tag": "Teide",
+        "ref_roi": {"lat_min": 28.2717, "lat_max": 28.2744, "lon_min": -16.6408, "lon_max": -16.6380},
+        "frp_roi": {"lat_min": 28.2717, "lat_max": 28.2744, "lon_min": -16.6408, "lon_max": -16.6380},
+        "frp_file": "radiative_power_teide.nc",
+        "frp_model": PHASE2_MODEL,
+    },
+    "Lanzarote": {
+        "lat_min": 28.95,
+        "lat_max": 29.01,
+        "lon_min": -13.76,
+        "lon_max": -13.70,
+        "tag": "Lanzarote",
+        "ref_roi": {"lat_min": 28.95, "lat_max": 29.01, "lon_min": -13.76, "lon_max": -13.70},
+        # No daily FRP: Lanzarote uses its own cooling-curve model (Historic/RP/RP_historico.py)
+        "frp_model": {"kind": "constant", "start": "1900-02-01", "t_floor": 265, "area": 1_250_000, "scale": 2.5},
+    },
+}
+
+
+def get_site(name):
+    """Return the registry entry of a site, raising a clear error for unknown names"""
+    try:
+        return SITES[name]
+    except KeyError:
+        raise ValueError(f"Unknown site '{name}'. Choose one of: {', '.join(SITES)}") from None
+
+
+def covers_site(name, south, north, east, west):
+    """True if the bounding box (south, north, east, west) intersects the site's bounding box"""
+    site = get_site(name)
+    return (south <= site["lat_max"] and north >= site["lat_min"] and
+            west <= site["lon_max"] and east >= site["lon_min"])
+
+
+def ref_region(name):
+    """
+    Box covered by the monthly REF: the site's REF region widened to take in its FRP region,
+    so every pixel of the per-pixel FRP has a background. Returns a dict like crop_window.
+    """
+    site = get_site(name)
+    regions = [site[key] for key in ("ref_roi", "frp_roi") if key in site]
+    return {
+        "lat_min": min(r["lat_min"] for r in regions),
+        "lat_max": max(r["lat_max"] for r in regions),
+        "lon_min": min(r["lon_min"] for r in regions),
+        "lon_max": max(r["lon_max"] for r in regions),
+    }
+
+
+def crop_window(name):
+    """
+    Lat/lon window kept at BT ingest: the union of the site's bounding box, REF region and
+    FRP region, widened by the crop margin. Returns a dict with lat_min, lat_max, lon_min, lon_max.
+    """
+    site = get_site(name)
+    regions = [site] + [site[key] for key in ("ref_roi", "frp_roi") if key in site]
+    margin = site.get("crop_margin", CROP_MARGIN)
+    return {
+        "lat_min": min(r["lat_min"] for r in regions) - margin,
+        "lat_max": max(r["lat_max"] for r in regions) + margin,
+        "lon_min": min(r["lon_min"] for r in regions) - margin,
+        "lon_max": max(r["lon_max"] for r in regions) + margin,
+    }
+
+
+def site_grid(name):
+    """
+    Fixed lat/lon grid of a site: the crop window sampled every GRID_RESOLUTION degrees
+    (a site can override it with its own "grid_resolution"). Returns (latitudes, longitudes),
+    1-D arrays with latitudes from north to south and longitudes from west to east.
+    """
+    window = crop_window(name)
+    step = get_site(name).get("grid_resolution", GRID_RESOLUTION)
+    latitudes = np.arange(window["lat_max"], window["lat_min"], -step)
+    longitudes = np.arange(window["lon_min"], window["lon_max"], step)
+    return latitudes, longitudes
@@ -3,25 +3,16 @@ from unittest.mock import patch, MagicMock
 import numpy as np
 import xarray as xr
 from datetime import datetime
-from netCDF4 import Dataset
 from pathlib import Path
 
-# Importa tu script co  mo módulo
-import importlib.util
 import sys
 
-# Localiza la raíz del proyecto (asumiendo que este test está en /tests o similar)
-script_path = Path(__file__).resolve()
-project_root = next(p for p in script_path.parents if p.name == "Practicas_Empresa_CSIC-1")
+# Raíz del proyecto: este test está en A03_tests/
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
 
-# Ruta al script BT_auto.py dentro del proyecto
-module_path = project_root / "A01_source" / "B01_3_processing" / "La_Palma" / "BT" / "BT_auto.py"
-
-
-spec = importlib.util.spec_from_file_location("bt_module", module_path)
-bt_module = importlib.util.module_from_spec(spec)
-sys.modules["bt_module"] = bt_module
-spec.loader.exec_module(bt_module)
+# Módulo de etapas (BT_auto.py sólo llama a stages.bt_daily)
+from A01_source.B01_3_processing import stages as bt_module
 
 
 class TestBTProcessing(unittest.TestCase):
@@ -44,12 +35,13 @@ class TestBTProcessing(unittest.TestCase):
         self.assertTrue(np.isnan(bt[1, 0]))
         self.assertTrue(np.isfinite(bt[1, 1]))
 
-    @patch("bt_module.Dataset")
+    @patch("A01_source.B01_3_processing.stages.Dataset")
     def test_process_to_monthly_structure(self, mock_dataset_class):
         # Simula el Dataset del NetCDF
         mock_nc = MagicMock()
         mock_obs_group = MagicMock()
-        mock_obs_group.__getitem__.return_value.filled.return_value = np.ones((2, 2))
+        mock_obs_group.__getitem__.return_value.shape = (2, 2)
+        mock_obs_group.__getitem__.return_value.__getitem__.return_value = np.ones((2, 2))
         mock_nc.groups = {'observation_data': mock_obs_group}
         mock_nc.getncattr.side_effect = lambda attr: {
             'SouthBoundingCoordinate': 28.60,
@@ -1,69 +1,66 @@
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 import numpy as np
 import xarray as xr
-from datetime import datetime
-import importlib.util
 import sys
+import tempfile
+from datetime import datetime
 from pathlib import Path
 
-# === Cargar dinámicamente el módulo original ===
-script_path = Path(__file__).resolve()
-project_root = next(p for p in script_path.parents if p.name == "Practicas_Empresa_CSIC-1")
-module_path = project_root / "A01_source" / "B01_3_processing" / "La_Palma" / "radiative_power" / "RP_auto.py"  
+# === Raíz del proyecto: este test está en A03_tests/ ===
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
 
-spec = importlib.util.spec_from_file_location("frp_module", module_path)
-frp_module = importlib.util.module_from_spec(spec)
-sys.modules["frp_module"] = frp_module
-spec.loader.exec_module(frp_module)
+# El FRP ya no está en RP_auto.py (sólo llama a stages.frp_daily)
+from A01_source.B01_3_processing import bt_cube, stages
+from A02_utils.sites import site_grid
 
 
 class TestFRPLaPalma(unittest.TestCase):
 
-    @patch("frp_module.xr.open_dataset")
-    @patch("frp_module.Path.exists", return_value=True)
-    @patch("frp_module.xr.Dataset.to_netcdf")
-    def test_frp_calculation_valid(self, mock_save, mock_exists, mock_open_dataset):
-        # Simula un dataset con una escena válida dentro del rango geográfico
-        bt_data = np.full((2, 2), 310.0)  # Temperatura suficientemente alta
-        lat_data = np.array([[28.55, 28.56], [28.56, 28.57]])
-        lon_data = np.array([[-17.74, -17.73], [-17.71, -17.70]])
-
-        mock_ds = MagicMock()
-        mock_ds["BT_I05"].sel.return_value = xr.DataArray(bt_data, dims=["y", "x"])
-        mock_ds["latitude"] = xr.DataArray(lat_data, dims=["y", "x"])
-        mock_ds["longitude"] = xr.DataArray(lon_data, dims=["y", "x"])
-        mock_ds.time.values = [np.datetime64(datetime.now().date() - np.timedelta64(1, 'D'))]
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patch = patch.object(stages, "processed_dir", Path(self.tmp.name))
+        self.patch.start()
 
-        mock_open_dataset.return_value = mock_ds
+    def tearDown(self):
+        self.patch.stop()
+        self.tmp.cleanup()
 
-        with patch("frp_module.print"):  # suprime prints
-            with patch("frp_module.datetime") as mock_datetime:
-                # Simula que hoy es 2025-05-02, ayer es 2025-05-01
-                mock_datetime.now.return_value = datetime(2025, 5, 2)
-                mock_datetime.utcnow.return_value = datetime(2025, 5, 2)
-                mock_datetime.side_effect = lambda *args, **kw: datetime(*args, **kw)
+    def test_frp_calculation_valid(self):
+        # Escena válida de 310 K (suficientemente caliente) sobre toda la malla de La Palma
+        lat, lon = site_grid("La_Palma")
+        escena = xr.DataArray(
+            np.full((1, lat.size, lon.size), 310.0, dtype="f4"),
+            dims=("time", "y", "x"),
+            coords={"time": [np.datetime64("2025-05-01")], "y": np.arange(lat.size), "x": np.arange(lon.size),
+                    "latitude": ("y", lat), "longitude": ("x", lon)},
+            name="BT_I05",
+        )
+        mensual = stages.bt_monthly_path("La_Palma", 2025, 5)
+        mensual.parent.mkdir(parents=True)
+        bt_cube.append_scene(mensual, escena)
 
-                # Ejecuta la lógica principal (reestructurable como función)
-                exec(open(module_path).read(), {'__name__': '__main__'})  # ejecuta como script
+        with patch("builtins.print"):
+            salida = stages.frp_daily("La_Palma", datetime(2025, 5, 1))
+            # Segunda vez: la entrada ya existe y no se duplica
+            stages.frp_daily("La_Palma", datetime(2025, 5, 1))
 
-        mock_save.assert_called_once()
+        self.assertEqual(salida, stages.frp_path("La_Palma"))
+        with xr.open_dataset(salida) as serie:
+            self.assertEqual(serie.sizes["time"], 1)
+            self.assertGreater(float(serie["FRP"][0]), 0)
 
     def test_frp_zero_if_bt_below_threshold(self):
         t_mean = 250  # menor que cualquier t_floor
         t_floor = 260
-        sigma = 5.67e-8
         area = 1_000_000
         scale = 1.0
 
-        if t_mean <= t_floor:
-            frp = 0.0
-        else:
-            frp_raw = sigma * (t_mean**4 - t_floor**4) * area
-            frp = (frp_raw / 1e6) * scale
+        frp = stages.frp.stefan_boltzmann_frp(t_mean, t_floor, area, scale)
 
-        self.assertEqual(frp, 0.0)
+        self.assertEqual(float(frp), 0.0)
 
 
 if __name__ == "__main__":
-    unittest.main()
\ No newline at end of file
+    unittest.main()
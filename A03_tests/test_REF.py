@@ -1,68 +1,74 @@
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 import numpy as np
 import xarray as xr
-import importlib.util
 import sys
+import tempfile
+from datetime import datetime
 from pathlib import Path
 
-# === Cargar módulo dinámicamente (ajustado a tu estructura) ===
-script_path = Path(__file__).resolve()
-project_root = next(p for p in script_path.parents if p.name == "Practicas_Empresa_CSIC")
-module_path = project_root / "A01_source" / "B01_3_processing" / "La_Palma" / "BT" / "BT_auto.py" 
+# === Raíz del proyecto: este test está en A03_tests/ ===
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
 
-spec = importlib.util.spec_from_file_location("ref_module", module_path)
-ref_module = importlib.util.module_from_spec(spec)
-sys.modules["ref_module"] = ref_module
-spec.loader.exec_module(ref_module)
+# El REF ya no está en REF_auto.py (sólo llama a stages.ref_monthly)
+from A01_source.B01_3_processing import bt_cube, stages
+from A02_utils.sites import site_grid
+
+
+def escena(dia, valores, lat, lon):
+    """Escena BT en la malla del sitio, con la forma que devuelve stages.process_to_grid."""
+    return xr.DataArray(
+        valores[np.newaxis].astype("f4"),
+        dims=("time", "y", "x"),
+        coords={"time": [np.datetime64(dia)], "y": np.arange(lat.size), "x": np.arange(lon.size),
+                "latitude": ("y", lat), "longitude": ("x", lon)},
+        name="BT_I05",
+    )
 
 
 class TestRefGeneration(unittest.TestCase):
 
-    @patch("ref_module.xr.open_dataset")
-    @patch("ref_module.Path.exists", return_value=True)
-    @patch("ref_module.xr.concat")
-    def test_valid_scenes_and_ref_generated(self, mock_concat, mock_exists, mock_open_dataset):
-        # Simular un dataset con varias escenas válidas
-        mock_ds = MagicMock()
-        mock_ds.sizes = {"time": 3}
-        mock_ds.__getitem__.side_effect = lambda var: xr.DataArray(
-            np.random.uniform(300, 310, size=(2, 2)), dims=("y", "x")
-        ) if var == "BT_I05" else None
-        mock_ds["latitude"] = xr.DataArray(np.linspace(28.55, 28.65, 2), dims="y")
-        mock_ds["longitude"] = xr.DataArray(np.linspace(-17.93, -17.80, 2), dims="x")
-        mock_open_dataset.return_value = mock_ds
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patches = [patch.object(stages, "processed_dir", Path(self.tmp.name)),
+                        patch.object(stages, "catalog_dir", Path(self.tmp.name))]
+        for p in self.patches:
+            p.start()
 
-        # Simular concat
-        fake_stack = xr.DataArray(np.random.rand(3, 2, 2), dims=("time", "y", "x"))
-        mock_concat.return_value = fake_stack
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.tmp.cleanup()
 
-        # Evitar escritura en disco
-        with patch("ref_module.xr.Dataset.to_netcdf") as mock_save:
-            with patch("ref_module.Path.unlink"):
-                with patch("ref_module.print"):  # suprime prints durante test
-                    ref_module.ds_monthly = mock_ds  # inyecta directamente si lo usas como global
-                    ref_module.stack_reprojected = [fake_stack[0], fake_stack[1], fake_stack[2]]
-                    ref_module.valid_files = ["t1", "t2", "t3"]
-                    ref = fake_stack.mean(dim="time", skipna=True)
-                    ref_ds = ref.to_dataset(name="brightness_temperature_REF")
+    def test_valid_scenes_and_ref_generated(self):
+        # Cubo mensual con tres escenas válidas y una nublada
+        lat, lon = site_grid("La_Palma")
+        rng = np.random.default_rng(0)
+        mensual = stages.bt_monthly_path("La_Palma", 2025, 5)
+        mensual.parent.mkdir(parents=True)
+        for dia in ("2025-05-01", "2025-05-02", "2025-05-03"):
+            bt_cube.append_scene(mensual, escena(dia, rng.uniform(290, 310, (lat.size, lon.size)), lat, lon))
+        bt_cube.append_scene(mensual, escena("2025-05-04", np.full((lat.size, lon.size), 200.0), lat, lon))
 
-                    # Guardar
-                    ref_ds.to_netcdf = mock_save
-                    ref_ds.to_netcdf("fake_path.nc")
+        with patch("builtins.print"):
+            salida = stages.ref_monthly("La_Palma", datetime(2025, 5, 4))
 
-        mock_save.assert_called_once()
+        self.assertEqual(salida, stages.ref_path("La_Palma", 2025, 5))
+        with xr.open_dataset(salida) as ref:
+            self.assertEqual(ref.attrs["used_scenes"], "2025-05-01, 2025-05-02, 2025-05-03")
+            self.assertEqual(int(ref["scene_count"].max()), 3)
+            self.assertTrue(290 <= float(ref["brightness_temperature_REF"].mean()) <= 310)
 
     def test_mask_and_stats_filtering(self):
-        # Escena con valores que deberían pasar el filtro
-        data = np.array([[290, 295], [298, 292]], dtype=float)
-        bt_clipped = xr.DataArray(data, dims=("y", "x"))
-        minval = np.nanmin(bt_clipped.values)
-        stdval = np.nanstd(bt_clipped.values)
+        # Escena con valores que deberían pasar el filtro (std > 3 y min > 210) y otra que no
+        escenas = np.array([[[290, 295], [298, 282]], [[290, 291], [290, 290]]], dtype=float)
+        tabla = stages.ref_accumulator.scene_quality(escenas, ["buena", "plana"])
 
-        self.assertGreater(stdval, 3)
-        self.assertGreater(minval, 210)
+        self.assertGreater(tabla.loc["buena", "std"], 3)
+        self.assertGreater(tabla.loc["buena", "min"], 210)
+        self.assertEqual(tabla["accepted"].tolist(), [True, False])
 
 
 if __name__ == "__main__":
-    unittest.main()
\ No newline at end of file
+    unittest.main()
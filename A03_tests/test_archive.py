@@ -0,0 +1,98 @@
+import unittest
+import sys
+import tempfile
+import numpy as np
+import xarray as xr
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+from netCDF4 import Dataset
+
+# Raíz del proyecto: este test está en A03_tests/
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
+
+from A01_source.B01_3_processing import archive, bt_cube
+
+LAT = np.linspace(28.70, 28.50, 40)
+LON = np.linspace(-17.95, -17.65, 50)
+ROI = {"lat_min": 28.55, "lat_max": 28.65, "lon_min": -17.93, "lon_max": -17.80}
+
+
+def escena(dia, valor):
+    """Escena (time, y, x) como las de stages.process_to_grid, con BT constante."""
+    return xr.DataArray(np.full((1, LAT.size, LON.size), valor), dims=("time", "y", "x"),
+                        coords={"time": [np.datetime64(dia.date(), "ns")],
+                                "latitude": ("y", LAT), "longitude": ("x", LON)})
+
+
+def bt_diario(base, dia, valor):
+    """BT diario como los de BT_historico (carpeta YYYY_DDD, latitud y longitud 2-D)."""
+    carpeta = base / dia.strftime("%Y_%j")
+    carpeta.mkdir(parents=True, exist_ok=True)
+    lon_grid, lat_grid = np.meshgrid(LON, LAT)
+    with Dataset(carpeta / f"BT_LaPalma_VJ102IMG_{dia:%Y_%j}.nc", "w") as nc:
+        nc.createDimension("rows", LAT.size)
+        nc.createDimension("cols", LON.size)
+        nc.createVariable("BT_I05", "f4", ("rows", "cols"))[:] = np.full(lat_grid.shape, valor)
+        nc.createVariable("latitude", "f4", ("rows", "cols"))[:] = lat_grid
+        nc.createVariable("longitude", "f4", ("rows", "cols"))[:] = lon_grid
+
+
+class TestBtArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base = Path(self.tmp.name) / "BT_daily_pixels"
+        self.base.mkdir()
+        archive._entries.clear()
+        # Diciembre en carpetas diarias; enero y febrero en cubos mensuales
+        for i in range(3):
+            bt_diario(self.base, datetime(2024, 12, 30) + timedelta(days=i % 2), 280 + i)
+        for mes in (1, 2):
+            for dia in (5, 20):
+                bt_cube.append_scene(self.base / f"BT_LaPalma_VJ102IMG_2025_{mes:02d}.nc",
+                                     escena(datetime(2025, mes, dia), 290 + mes + dia / 100))
+
+    def tearDown(self):
+        archive._entries.clear()
+        self.tmp.cleanup()
+
+    def test_indice_en_cache(self):
+        with patch.object(bt_cube, "scene_index", wraps=bt_cube.scene_index) as leer:
+            indice = archive.bt_index("La_Palma", self.base)
+            self.assertEqual(leer.call_count, 2)
+            archive.bt_index("La_Palma", self.base)
+            self.assertEqual(leer.call_count, 2)
+
+            # Sólo se vuelve a leer el cubo que ha cambiado
+            bt_cube.append_scene(self.base / "BT_LaPalma_VJ102IMG_2025_02.nc", escena(datetime(2025, 2, 25), 300))
+            leer.reset_mock()
+            nuevo = archive.bt_index("La_Palma", self.base)
+            self.assertEqual([Path(c.args[0]).name for c in leer.call_args_list], ["BT_LaPalma_VJ102IMG_2025_02.nc"])
+
+        self.assertEqual(len(indice), 6)
+        self.assertEqual(len(nuevo), 7)
+        self.assertEqual(list(indice["layout"]), ["daily"] * 2 + ["cube"] * 4)
+        self.assertTrue(indice.index.is_monotonic_increasing)
+        self.assertEqual(list(indice.loc["2025-02-20", ["position", "layout"]]), [1, "cube"])
+
+    def test_rango_de_fechas_y_roi(self):
+        ds = archive.open_bt("La_Palma", datetime(2024, 12, 31), datetime(2025, 2, 5, 12), ROI, self.base)
+
+        np.testing.assert_array_equal(ds.time.values.astype("datetime64[D]"),
+                                      np.array(["2024-12-31", "2025-01-05", "2025-01-20", "2025-02-05"],
+                                               dtype="datetime64[D]"))
+        # Sólo la caja de la ROI, igual en los dos formatos
+        filas = (LAT >= ROI["lat_min"]) & (LAT <= ROI["lat_max"])
+        columnas = (LON >= ROI["lon_min"]) & (LON <= ROI["lon_max"])
+        self.assertEqual((ds.sizes["y"], ds.sizes["x"]), (filas.sum(), columnas.sum()))
+        np.testing.assert_allclose(ds["latitude"].values[0], LAT[filas], atol=1e-5)
+        np.testing.assert_allclose(ds["longitude"].values[-1], LON[columnas], atol=1e-5)
+        np.testing.assert_allclose(ds["BT_I05"].mean(dim=("y", "x")).values, [281, 291.05, 291.2, 292.05], atol=1e-4)
+
+        self.assertIsNone(archive.open_bt("La_Palma", datetime(2023, 1, 1), datetime(2023, 2, 1), base_path=self.base))
+
+
+if __name__ == "__main__":
+    unittest.main()
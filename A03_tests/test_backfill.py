@@ -0,0 +1,181 @@
+import unittest
+import sys
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+from unittest.mock import patch
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from netCDF4 import Dataset
+
+# Raíz del proyecto: este test está en A03_tests/
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
+
+from A01_source.B01_1_download import backfill, download, granules, prefilter
+from A01_source.B01_1_download.cache import GranuleCache
+
+
+def crear_granulo_falso(path, flag="Night"):
+    """Crea un NetCDF mínimo con los atributos globales de un VJ102IMG que cubre Canarias."""
+    with Dataset(path, "w") as nc:
+        nc.setncattr("DayNightFlag", flag)
+        nc.setncattr("SouthBoundingCoordinate", 27.0)
+        nc.setncattr("NorthBoundingCoordinate", 30.0)
+        nc.setncattr("WestBoundingCoordinate", -18.5)
+        nc.setncattr("EastBoundingCoordinate", -13.0)
+
+
+class LaadsFalso(BaseHTTPRequestHandler):
+    """
+    Sustituto local de LAADS:
+        /api/<collection>/<product>/<year>/<doy>  -> listado JSON del día
+        /files/<name>                              -> gránulo
+    Cualquier otra ruta (p. ej. geoMeta) devuelve 404.
+    """
+
+    files_dir = None
+    dias = {}
+    peticiones = []
+    activas = 0
+    max_activas = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        LaadsFalso.peticiones.append(self.path)
+        partes = self.path.strip("/").split("/")
+
+        if partes[0] == "api" and len(partes) == 5:
+            year, doy = partes[3], partes[4]
+            nombres = LaadsFalso.dias.get(f"{year}_{doy}")
+            if nombres is None:
+                self.send_error(404)
+                return
+            base = f"http://{self.headers['Host']}/files"
+            body = json.dumps({"content": [{"name": n, "downloadsLink": f"{base}/{n}"} for n in nombres]}).encode()
+        elif partes[0] == "files" and (LaadsFalso.files_dir / partes[-1]).exists():
+            with LaadsFalso.lock:
+                LaadsFalso.activas += 1
+                LaadsFalso.max_activas = max(LaadsFalso.max_activas, LaadsFalso.activas)
+            time.sleep(0.05)
+            body = (LaadsFalso.files_dir / partes[-1]).read_bytes()
+            with LaadsFalso.lock:
+                LaadsFalso.activas -= 1
+        else:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestBackfill(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp = Path(self.tmp.name)
+        self.raw_dir = tmp / "raw"
+        files_dir = tmp / "server"
+        files_dir.mkdir()
+
+        # Tres días (2025-01-01 a 2025-01-03) con tres gránulos nocturnos cada uno
+        LaadsFalso.files_dir = files_dir
+        LaadsFalso.dias = {}
+        for doy in ("001", "002", "003"):
+            nombres = [f"VJ102IMG.A2025{doy}.{hhmm}.021.nc" for hhmm in ("0142", "0148", "0154")]
+            for name in nombres:
+                crear_granulo_falso(files_dir / name)
+            LaadsFalso.dias[f"2025_{doy}"] = nombres
+        LaadsFalso.peticiones = []
+        LaadsFalso.activas = 0
+        LaadsFalso.max_activas = 0
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), LaadsFalso)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+        self.patches = [
+            patch.object(download, "API_URL", f"{base_url}/api"),
+            patch.object(download, "RAW_DIR", self.raw_dir),
+            patch.object(download, "SHARED_DIR", self.raw_dir / "_shared"),
+            patch.object(download, "CATALOG_DIR", self.raw_dir),
+            patch.object(prefilter, "GEOMETA_URL", base_url + "/geoMeta/{year}/{product}_{date}.txt"),
+        ]
+        for p in self.patches:
+            p.start()
+
+        self.checkpoint = self.raw_dir / "checkpoint.json"
+        self.cache = GranuleCache(self.raw_dir / "_cache")
+        self.session = granules.crear_sesion(retries=0)
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def ejecutar(self, **kwargs):
+        return backfill.backfill("2025-01-01", "2025-01-03", ["La_Palma", "Teide"],
+                                 checkpoint=self.checkpoint, session=self.session, cache=self.cache, **kwargs)
+
+    def test_dias_entre(self):
+        self.assertEqual(backfill.dias_entre("2024-12-31", "2025-01-02"),
+                         [("2024", "366"), ("2025", "001"), ("2025", "002")])
+        with self.assertRaises(ValueError):
+            backfill.dias_entre("2025-01-02", "2025-01-01")
+
+    def test_backfill_rango(self):
+        resumen = self.ejecutar(max_dias=3, max_descargas=2)
+
+        self.assertEqual(resumen, {"2025_001": "done", "2025_002": "done", "2025_003": "done"})
+        for doy in ("001", "002", "003"):
+            for site in ("La_Palma", "Teide"):
+                self.assertEqual(len(list((self.raw_dir / site / f"2025_{doy}").glob("*.nc"))), 1)
+
+        # Nueve gránulos en tres días simultáneos, nunca más de dos descargas a la vez
+        self.assertLessEqual(LaadsFalso.max_activas, 2)
+        self.assertEqual(backfill.cargar_checkpoint(self.checkpoint),
+                         {"La_Palma": {"2025_001", "2025_002", "2025_003"},
+                          "Teide": {"2025_001", "2025_002", "2025_003"}})
+
+    def test_reanuda_desde_checkpoint(self):
+        # El día 2 no está disponible en la primera ejecución
+        dia2 = LaadsFalso.dias.pop("2025_002")
+        resumen = self.ejecutar()
+        self.assertEqual(resumen["2025_002"], "error")
+        self.assertNotIn("2025_002", backfill.cargar_checkpoint(self.checkpoint)["La_Palma"])
+
+        # Segunda ejecución: sólo se consulta el día que faltaba
+        LaadsFalso.dias["2025_002"] = dia2
+        LaadsFalso.peticiones = []
+        resumen = self.ejecutar()
+
+        self.assertEqual(resumen, {"2025_001": "skipped", "2025_002": "done", "2025_003": "skipped"})
+        listados = [p for p in LaadsFalso.peticiones if p.startswith("/api/")]
+        # Listado de imágenes y de su geolocalización, sólo del día 2
+        self.assertEqual(listados, ["/api/5201/VJ102IMG/2025/002", "/api/5201/VJ103IMG/2025/002"])
+
+    def test_dia_vacio_en_el_checkpoint(self):
+        # Un día sin gránulos también queda hecho: la siguiente ejecución no lo vuelve a listar
+        LaadsFalso.dias["2025_002"] = []
+        with patch("builtins.print"):
+            self.assertEqual(self.ejecutar()["2025_002"], "done")
+        self.assertFalse((self.raw_dir / "La_Palma" / "2025_002").exists())
+        self.assertIn("2025_002", backfill.cargar_checkpoint(self.checkpoint)["Teide"])
+
+        LaadsFalso.peticiones = []
+        with patch("builtins.print"):
+            resumen = self.ejecutar()
+        self.assertEqual(set(resumen.values()), {"skipped"})
+        self.assertEqual(LaadsFalso.peticiones, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+import sys
+import tempfile
+import numpy as np
+import xarray as xr
+from pathlib import Path
+from netCDF4 import Dataset
+
+# Raíz del proyecto: este test está en A03_tests/
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
+
+from A01_source.B01_3_processing import bt_cube
+
+
+def escena(dia, valor, ny=4, nx=5):
+    """DataArray con la misma forma que devuelve stages.process_to_monthly."""
+    return xr.DataArray(
+        np.full((1, ny, nx), valor, dtype="f4"),
+        dims=("time", "y", "x"),
+        coords={
+            "time": [np.datetime64(dia)],
+            "y": np.arange(ny),
+            "x": np.arange(nx),
+            "latitude": ("y", np.linspace(28.7, 28.5, ny)),
+            "longitude": ("x", np.linspace(-17.9, -17.7, nx)),
+        },
+        name="BT_I05",
+    )
+
+
+class TestBTCube(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "BT_LaPalma_VJ102IMG_2025_05.nc"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_append_en_sitio(self):
+        self.assertEqual(bt_cube.append_scene(self.path, escena("2025-05-02", 290)), 0)
+        inode = self.path.stat().st_ino
+        self.assertTrue(bt_cube.is_cube(self.path))
+
+        self.assertEqual(bt_cube.append_scene(self.path, escena("2025-05-01", 280)), 1)
+
+        # Se amplía el mismo fichero, no se reescribe ni quedan temporales
+        self.assertEqual(self.path.stat().st_ino, inode)
+        self.assertEqual(list(self.path.parent.glob("*.tmp")), [])
+        self.assertEqual(bt_cube.scene_index(self.path),
+                         {np.datetime64("2025-05-02"): 0, np.datetime64("2025-05-01"): 1})
+
+        with bt_cube.open_cube(self.path) as ds:
+            self.assertEqual(ds["BT_I05"].shape, (2, 4, 5))
+            scene = ds["BT_I05"].sel(time="2025-05-01")
+            self.assertEqual(float(scene.mean()), 280)
+            self.assertEqual(scene["latitude"].dims, ("y",))
+
+    def test_mismo_dia_reemplaza(self):
+        bt_cube.append_scene(self.path, escena("2025-05-02", 290))
+        bt_cube.append_scene(self.path, escena("2025-05-02", 300))
+
+        with bt_cube.open_cube(self.path) as ds:
+            self.assertEqual(ds.sizes["time"], 1)
+            self.assertEqual(float(ds["BT_I05"].mean()), 300)
+
+    def test_escena_de_otro_tamano(self):
+        bt_cube.append_scene(self.path, escena("2025-05-01", 280))
+        bt_cube.append_scene(self.path, escena("2025-05-02", 290, ny=6, nx=3))
+
+        with bt_cube.open_cube(self.path) as ds:
+            self.assertEqual(ds["BT_I05"].shape, (2, 6, 5))
+            primera = ds["BT_I05"].isel(time=0).values
+            self.assertTrue(np.isnan(primera[4:]).all())
+            self.assertEqual(np.nanmean(primera), 280)
+
+    def test_escena_sin_fecha_se_ignora(self):
+        bt_cube.append_scene(self.path, escena("2025-05-01", 280))
+        # Simula una escritura interrumpida: datos sin fecha
+        with Dataset(self.path, "a") as nc:
+            nc["BT_I05"][1, :4, :5] = np.full((4, 5), 1.0)
+
+        self.assertEqual(list(bt_cube.scene_index(self.path)), [np.datetime64("2025-05-01")])
+        with bt_cube.open_cube(self.path) as ds:
+            self.assertEqual(ds.sizes["time"], 1)
+        # El siguiente día no reutiliza la posición incompleta: se añade al final
+        self.assertEqual(bt_cube.append_scene(self.path, escena("2025-05-02", 290)), 2)
+
+    def test_migra_fichero_antiguo(self):
+        # Fichero mensual escrito por el BT_auto antiguo (xr.concat + to_netcdf)
+        antiguo = xr.concat([escena("2025-05-01", 280).to_dataset(),
+                             escena("2025-05-02", 290).to_dataset()], dim="time")
+        antiguo.to_netcdf(self.path)
+        self.assertFalse(bt_cube.is_cube(self.path))
+        self.assertEqual(set(bt_cube.scene_index(self.path)),
+                         {np.datetime64("2025-05-01"), np.datetime64("2025-05-02")})
+
+        bt_cube.append_scene(self.path, escena("2025-05-03", 300))
+
+        self.assertTrue(bt_cube.is_cube(self.path))
+        with bt_cube.open_cube(self.path) as ds:
+            np.testing.assert_allclose(ds["BT_I05"].mean(dim=("y", "x")).values, [280, 290, 300])
+
+
+if __name__ == "__main__":
+    unittest.main()
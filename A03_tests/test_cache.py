@@ -0,0 +1,71 @@
+import unittest
+import sys
+import tempfile
+from pathlib import Path
+
+# Raíz del proyecto: este test está en A03_tests/
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
+
+from A01_source.B01_1_download.cache import GranuleCache
+
+
+class TestGranuleCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fichero(self, name, content):
+        path = self.root / name
+        path.write_bytes(content)
+        return path
+
+    def test_put_get(self):
+        cache = GranuleCache(self.root / "cache")
+        self.assertIsNone(cache.get("VJ102IMG", "5201", "a.nc"))
+
+        src = self.fichero("a.nc", b"granulo a")
+        stored = cache.put("VJ102IMG", "5201", "a.nc", src)
+
+        self.assertFalse(src.exists())
+        self.assertEqual(cache.get("VJ102IMG", "5201", "a.nc"), stored)
+        self.assertEqual(stored.read_bytes(), b"granulo a")
+        self.assertTrue(cache.verify("VJ102IMG", "5201", "a.nc"))
+        # La colección forma parte de la clave
+        self.assertIsNone(cache.get("VJ102IMG", "5200", "a.nc"))
+
+    def test_contenido_identico_se_guarda_una_vez(self):
+        cache = GranuleCache(self.root / "cache")
+        a = cache.put("VJ102IMG", "5201", "a.nc", self.fichero("a.nc", b"mismo"))
+        b = cache.put("VJ102IMG", "5201", "b.nc", self.fichero("b.nc", b"mismo"))
+
+        self.assertEqual(a, b)
+        self.assertEqual(cache.total_bytes(), len(b"mismo"))
+
+    def test_desalojo_lru(self):
+        cache = GranuleCache(self.root / "cache", max_bytes=20)
+        cache.put("P", "1", "a", self.fichero("a", b"a" * 10))
+        cache.put("P", "1", "b", self.fichero("b", b"b" * 10))
+        # 'a' se usa después que 'b': el menos reciente es 'b'
+        cache.get("P", "1", "a")
+        cache.put("P", "1", "c", self.fichero("c", b"c" * 10))
+
+        self.assertIsNotNone(cache.get("P", "1", "a"))
+        self.assertIsNone(cache.get("P", "1", "b"))
+        self.assertIsNotNone(cache.get("P", "1", "c"))
+        self.assertLessEqual(cache.total_bytes(), 20)
+
+    def test_verify_detecta_corrupcion(self):
+        cache = GranuleCache(self.root / "cache")
+        stored = cache.put("P", "1", "a", self.fichero("a", b"original"))
+        stored.write_bytes(b"corrupto")
+
+        self.assertFalse(cache.verify("P", "1", "a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import sys
+import hashlib
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+from netCDF4 import Dataset
+
+# Raíz del proyecto: este test está en A03_tests/
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
+
+from A02_utils.catalog import FileCatalog, parse_name
+
+
+def crear_granulo(path, flag="Night"):
+    """Gránulo VJ102IMG mínimo con los atributos globales de LAADS."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with Dataset(path, "w") as nc:
+        nc.setncattr("DayNightFlag", flag)
+        nc.setncattr("SouthBoundingCoordinate", 27.0)
+        nc.setncattr("NorthBoundingCoordinate", 30.0)
+        nc.setncattr("WestBoundingCoordinate", -19.0)
+        nc.setncattr("EastBoundingCoordinate", -15.0)
+
+
+class TestFileCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.raw = self.root / "B_raw" / "La_Palma"
+        for doy, hora, flag in (("120", "0142", "Night"), ("121", "0124", "Night"), ("121", "1330", "Day"),
+                                ("200", "0200", "Night")):
+            crear_granulo(self.raw / f"2025_{doy}" / f"VJ102IMG.A2025{doy}.{hora}.021.2025{doy}093000.nc", flag)
+        crear_granulo(self.root / "B_raw" / "_shared" / "2025_121" / "VJ102IMG.A2025121.0124.021.2025121093000.nc")
+        (self.raw / "2025_121" / "notas.txt").write_text("no es un producto")
+        self.catalog = FileCatalog(self.root)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_nombres(self):
+        self.assertEqual(parse_name("VJ103IMG.A2025123.0142.021.2025123090000.nc"),
+                         ("VJ103IMG", datetime(2025, 5, 3, 1, 42)))
+        self.assertEqual(parse_name("BT_LaPalma_VJ102IMG_2025_123.nc"), ("BT_daily", datetime(2025, 5, 3)))
+        self.assertEqual(parse_name("BT_LaPalma_VJ102IMG_2025_05.nc"), ("BT_monthly", datetime(2025, 5, 1)))
+        self.assertEqual(parse_name("Ref_2025_05_v2.nc"), ("REF", datetime(2025, 5, 1)))
+        self.assertIsNone(parse_name("radiative_power.nc"))
+
+    def test_actualizar_y_consultar(self):
+        self.assertEqual(self.catalog.update(), (4, 0))
+        # Sin cambios en disco no se vuelve a leer nada
+        with patch("A02_utils.catalog.sha256_archivo") as checksum:
+            self.assertEqual(self.catalog.update(), (0, 0))
+            checksum.assert_not_called()
+
+        dia = self.catalog.find("VJ102IMG", "La_Palma", datetime(2025, 5, 1), datetime(2025, 5, 1))
+        self.assertEqual([p.name[:23] for p in dia], ["VJ102IMG.A2025121.0124.", "VJ102IMG.A2025121.1330."])
+        noche = self.catalog.find("VJ102IMG", "La_Palma", datetime(2025, 4, 30), datetime(2025, 5, 31), "Night")
+        self.assertEqual(len(noche), 2)
+        self.assertEqual(len(self.catalog.find("VJ102IMG", "La_Palma")), 4)
+        self.assertEqual(self.catalog.find("VJ102IMG", "Teide"), [])
+
+        entrada = self.catalog.entry(dia[0])
+        self.assertEqual(entrada["path"], "B_raw/La_Palma/2025_121/" + dia[0].name)
+        self.assertEqual((entrada["day_night"], entrada["south"], entrada["east"]), ("Night", 27.0, -15.0))
+        self.assertEqual(entrada["sha256"], hashlib.sha256(dia[0].read_bytes()).hexdigest())
+
+    def test_checksum_conocido(self):
+        granulo = next(self.raw.glob("*/VJ102IMG.*"))
+        # El checksum de la caché de gránulos se reutiliza sin volver a leer el archivo
+        with patch("A02_utils.catalog.sha256_archivo") as checksum:
+            self.assertTrue(self.catalog.register(granulo, sha256="abc123"))
+            checksum.assert_not_called()
+        self.assertEqual(self.catalog.entry(granulo)["sha256"], "abc123")
+
+    def test_archivos_cambiados_y_borrados(self):
+        self.catalog.update()
+        borrado = self.raw / "2025_200" / "VJ102IMG.A2025200.0200.021.2025200093000.nc"
+        borrado.unlink()
+        # Fuera del catálogo: sigue registrado hasta actualizar, pero find no lo devuelve
+        self.assertEqual(len(self.catalog.find("VJ102IMG", "La_Palma")), 3)
+
+        bt = self.root / "B_processed" / "La_Palma" / "BT_daily_pixels" / "BT_LaPalma_VJ102IMG_2025_05.nc"
+        bt.parent.mkdir(parents=True)
+        bt.write_bytes(b"uno")
+        self.assertTrue(self.catalog.register(bt))
+        self.assertFalse(self.catalog.register(bt))
+        bt.write_bytes(b"dos, mas largo")
+        self.assertTrue(self.catalog.register(bt))
+
+        # El cubo mensual cambia cada día: no se calcula su checksum
+        self.assertIsNone(self.catalog.entry(bt)["sha256"])
+
+        self.assertEqual(self.catalog.update(self.raw), (0, 1))
+        self.assertIsNone(self.catalog.entry(borrado))
+        self.assertEqual(self.catalog.find("BT_monthly", "La_Palma", datetime(2025, 5, 1)), [bt])
+
+
+if __name__ == "__main__":
+    unittest.main()
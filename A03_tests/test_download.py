@@ -1,20 +1,18 @@
 import unittest
-from unittest.mock import patch, MagicMock, mock_open
-import builtins
+from unittest.mock import patch, MagicMock
 import os
 import sys
-import datetime
+import tempfile
 from pathlib import Path
 
 # Importar el módulo principal de descarga (ajusta si tu archivo tiene otro nombre)
 import importlib.util
 
-# Localiza la raíz del proyecto (asumiendo que este test está en /tests o similar)
-script_path = Path(__file__).resolve()
-project_root = next(p for p in script_path.parents if p.name == "Practicas_Empresa_CSIC")
+# Raíz del proyecto: este test está en A03_tests/
+project_root = Path(__file__).resolve().parents[1]
 
-# Ruta al script BT_auto.py dentro del proyecto
-module_path = project_root / "A01_source" / "B01_1_download" / "La_Palma" / "download_LaPalma.py"
+# Ruta al motor de descarga multi-sitio dentro del proyecto
+module_path = project_root / "A01_source" / "B01_1_download" / "download.py"
 
 
 spec = importlib.util.spec_from_file_location("descarga", module_path)
@@ -23,77 +21,189 @@ sys.modules["descarga"] = descarga
 spec.loader.exec_module(descarga)
 
 
+def atributos(flag, sur, norte, este, oeste):
+    """Simula un netCDF4.Dataset abierto con los atributos globales de un gránulo."""
+    ds_mock = MagicMock()
+    ds_mock.getncattr.side_effect = lambda attr: {
+        "DayNightFlag": flag,
+        "SouthBoundingCoordinate": sur,
+        "NorthBoundingCoordinate": norte,
+        "EastBoundingCoordinate": este,
+        "WestBoundingCoordinate": oeste,
+    }[attr]
+    return ds_mock
+
+
 class TestDescargarDatos(unittest.TestCase):
 
-    @patch("descarga.requests.get")
-    @patch("descarga.os.system")
+    def setUp(self):
+        # Carpeta temporal en lugar de A00_data/B_raw
+        self.tmp = tempfile.TemporaryDirectory()
+        raw_dir = Path(self.tmp.name)
+        self.patches = [
+            patch("descarga.RAW_DIR", raw_dir),
+            patch("descarga.SHARED_DIR", raw_dir / "_shared"),
+            patch("descarga.CATALOG_DIR", raw_dir),
+            patch("descarga.prefilter.cargar_geometa", return_value={}),
+        ]
+        self.cache = descarga.GranuleCache(raw_dir / "_cache")
+        for p in self.patches:
+            p.start()
+        self.raw_dir = raw_dir
+        self.session = MagicMock()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.tmp.cleanup()
+
+    def simular_descarga(self, links, output_dir, **kwargs):
+        # Escribe un fichero falso por enlace, como haría granules.descargar_granulos
+        os.makedirs(output_dir, exist_ok=True)
+        results = []
+        for link in links:
+            path = Path(output_dir) / link.split("/")[-1]
+            path.write_bytes(b"granulo")
+            results.append({"filename": path.name, "path": path, "status": "downloaded"})
+        return results
+
+    @patch("descarga.netCDF4.Dataset")
+    def test_descargar_datos1_valida(self, mock_dataset):
+        # Simular respuesta API válida con enlace de descarga
+        self.session.get.return_value.json.return_value = {
+            "content": [{"downloadsLink": "https://fakeurl.com/file1.nc"}]
+        }
+        # Simular atributos NetCDF válidos
+        mock_dataset.return_value.__enter__.return_value = atributos("Night", 28.60, 28.62, -17.87, -17.92)
+
+        with patch("descarga.granules.descargar_granulos", side_effect=self.simular_descarga) as mock_descargar:
+            kept = descarga.descargar_sitios(["La_Palma"], "2025", "123", session=self.session, cache=self.cache)
+
+        # Verificar que se llamó a la API una sola vez y se descargó el archivo
+        self.session.get.assert_called_once()
+        mock_descargar.assert_called_once()
+        # El archivo se conserva en la carpeta del sitio
+        self.assertEqual(kept["La_Palma"], [self.raw_dir / "La_Palma" / "2025_123" / "file1.nc"])
+        self.assertTrue(kept["La_Palma"][0].exists())
+
+    @patch("descarga.netCDF4.Dataset")
+    def test_descargar_datos1_descarta_archivo(self, mock_dataset):
+        self.session.get.return_value.json.return_value = {
+            "content": [{"downloadsLink": "https://fakeurl.com/file1.nc"}]
+        }
+        # Archivo que no cumple con las condiciones
+        mock_dataset.return_value.__enter__.return_value = atributos("Day", 28.00, 28.01, -17.00, -17.01)
+
+        with patch("descarga.granules.descargar_granulos", side_effect=self.simular_descarga):
+            kept = descarga.descargar_sitios(["La_Palma"], "2025", "123", session=self.session, cache=self.cache)
+
+        self.assertEqual(kept["La_Palma"], [])
+        self.assertFalse((self.raw_dir / "_shared" / "2025_123" / "file1.nc").exists())
+        self.assertFalse((self.raw_dir / "La_Palma" / "2025_123").exists())
+
+    def test_descargar_datos1_prefiltro_por_metadatos(self):
+        self.session.get.return_value.json.return_value = {
+            "content": [
+                {"downloadsLink": "https://fakeurl.com/day.nc", "DayNightFlag": "Day"},
+                {"downloadsLink": "https://fakeurl.com/lejos.nc", "DayNightFlag": "Night",
+                 "SouthBoundingCoordinate": 40.0, "NorthBoundingCoordinate": 45.0,
+                 "EastBoundingCoordinate": 5.0, "WestBoundingCoordinate": 0.0},
+            ]
+        }
+
+        with patch("descarga.granules.descargar_granulos") as mock_descargar:
+            descarga.descargar_sitios(["La_Palma", "Teide"], "2025", "123", session=self.session, cache=self.cache)
+
+        # Ningún gránulo puede coincidir: no se descarga nada
+        mock_descargar.assert_not_called()
+
     @patch("descarga.netCDF4.Dataset")
-    @patch("descarga.os.remove")
-    @patch("descarga.os.makedirs")
-    def test_descargar_datos1_valida(
-        self, mock_makedirs, mock_remove, mock_dataset, mock_system, mock_get
-    ):
-        # Simular fecha
-        with patch("descarga.obtener_fecha_ayer", return_value=("2025", "123")):
-
-            # Simular respuesta API válida con enlace de descarga
-            mock_get.return_value.status_code = 200
-            mock_get.return_value.json.return_value = {
-                "content": [{"downloadsLink": "https://fakeurl.com/file1.nc"}]
-            }
-
-            # Simular descarga (os.system)
-            mock_system.return_value = 0
-
-            # Simular atributos NetCDF válidos
-            ds_mock = MagicMock()
-            ds_mock.getncattr.side_effect = lambda attr: {
-                "DayNightFlag": "Night",
-                "SouthBoundingCoordinate": 28.60,
-                "NorthBoundingCoordinate": 28.62,
-                "EastBoundingCoordinate": -17.87,
-                "WestBoundingCoordinate": -17.92,
-            }[attr]
-            mock_dataset.return_value = ds_mock
-
-            # Ejecutar función
-            descarga.descargar_datos1()
-
-            # Verificar que se llamó a la API
-            mock_get.assert_called_once()
-            # Verificar que se intentó descargar el archivo
-            mock_system.assert_called_once()
-            # Verificar que no se eliminó el archivo (cumple condiciones)
-            mock_remove.assert_not_called()
-
-    @patch("descarga.requests.get")
-    @patch("descarga.os.system")
+    def test_un_granulo_para_varios_sitios(self, mock_dataset):
+        # Un único gránulo nocturno que cubre todo Canarias
+        self.session.get.return_value.json.return_value = {
+            "content": [{"downloadsLink": "https://fakeurl.com/canarias.nc"}]
+        }
+        mock_dataset.return_value.__enter__.return_value = atributos("Night", 27.0, 30.0, -13.0, -18.5)
+
+        with patch("descarga.granules.descargar_granulos", side_effect=self.simular_descarga) as mock_descargar:
+            kept = descarga.descargar_sitios(["La_Palma", "Teide", "Lanzarote"], "2025", "123",
+                                             session=self.session, cache=self.cache)
+
+        # Un solo listado y una sola descarga para los tres sitios
+        self.session.get.assert_called_once()
+        mock_descargar.assert_called_once()
+        self.assertEqual(mock_descargar.call_args[0][0], ["https://fakeurl.com/canarias.nc"])
+
+        # Los tres sitios apuntan al mismo fichero (enlaces duros, sin copias)
+        inodes = {kept[site][0].stat().st_ino for site in ("La_Palma", "Teide", "Lanzarote")}
+        self.assertEqual(len(inodes), 1)
+
+    @patch("descarga.netCDF4.Dataset")
+    def test_segunda_pasada_usa_cache(self, mock_dataset):
+        self.session.get.return_value.json.return_value = {
+            "content": [{"downloadsLink": "https://fakeurl.com/file1.nc"}]
+        }
+        mock_dataset.return_value.__enter__.return_value = atributos("Night", 28.60, 28.62, -17.87, -17.92)
+
+        with patch("descarga.granules.descargar_granulos", side_effect=self.simular_descarga):
+            descarga.descargar_sitios(["La_Palma"], "2025", "123", session=self.session, cache=self.cache)
+
+        # Se borra la carpeta del sitio: el gránulo sigue en la caché y no se vuelve a descargar
+        (self.raw_dir / "La_Palma" / "2025_123" / "file1.nc").unlink()
+        with patch("descarga.granules.descargar_granulos") as mock_descargar:
+            kept = descarga.descargar_sitios(["La_Palma"], "2025", "123", session=self.session, cache=self.cache)
+
+        mock_descargar.assert_not_called()
+        self.assertTrue(kept["La_Palma"][0].exists())
+
     @patch("descarga.netCDF4.Dataset")
-    @patch("descarga.os.remove")
-    @patch("descarga.os.makedirs")
-    def test_descargar_datos1_descarta_archivo(self, mock_makedirs, mock_remove, mock_dataset, mock_system, mock_get):
-        with patch("descarga.obtener_fecha_ayer", return_value=("2025", "123")):
-            mock_get.return_value.status_code = 200
-            mock_get.return_value.json.return_value = {
-                "content": [{"downloadsLink": "https://fakeurl.com/file1.nc"}]
-            }
-
-            mock_system.return_value = 0
-
-            # Archivo que no cumple con las condiciones
-            ds_mock = MagicMock()
-            ds_mock.getncattr.side_effect = lambda attr: {
-                "DayNightFlag": "Day",
-                "SouthBoundingCoordinate": 28.00,
-                "NorthBoundingCoordinate": 28.01,
-                "EastBoundingCoordinate": -17.00,
-                "WestBoundingCoordinate": -17.01,
-            }[attr]
-            mock_dataset.return_value = ds_mock
-
-            descarga.descargar_datos1()
-
-            mock_remove.assert_called_once()
+    def test_geolocalizacion_junto_al_granulo(self, mock_dataset):
+        listados = {
+            "VJ102IMG": [{"name": "VJ102IMG.A2025123.0142.021.2025123093000.nc",
+                          "downloadsLink": "https://fakeurl.com/VJ102IMG.A2025123.0142.021.2025123093000.nc"}],
+            "VJ103IMG": [{"name": "VJ103IMG.A2025123.0136.021.2025123090000.nc",
+                          "downloadsLink": "https://fakeurl.com/VJ103IMG.A2025123.0136.021.2025123090000.nc"},
+                         {"name": "VJ103IMG.A2025123.0142.021.2025123090000.nc",
+                          "downloadsLink": "https://fakeurl.com/VJ103IMG.A2025123.0142.021.2025123090000.nc"}],
+        }
+
+        def listar(url, **kwargs):
+            respuesta = MagicMock()
+            respuesta.json.return_value = {"content": listados[url.split("/")[-3]]}
+            return respuesta
+
+        self.session.get.side_effect = listar
+        mock_dataset.return_value.__enter__.return_value = atributos("Night", 28.60, 28.62, -17.87, -17.92)
+
+        with patch("descarga.granules.descargar_granulos", side_effect=self.simular_descarga) as mock_descargar:
+            descarga.descargar_sitios(["La_Palma"], "2025", "123", session=self.session, cache=self.cache)
+
+        # Sólo se descarga la geolocalización del gránulo conservado, en su misma carpeta
+        self.assertEqual(mock_descargar.call_args[0][0],
+                         ["https://fakeurl.com/VJ103IMG.A2025123.0142.021.2025123090000.nc"])
+        carpeta = self.raw_dir / "La_Palma" / "2025_123"
+        self.assertEqual(sorted(f.name for f in carpeta.iterdir()),
+                         ["VJ102IMG.A2025123.0142.021.2025123093000.nc",
+                          "VJ103IMG.A2025123.0142.021.2025123090000.nc"])
+
+    def test_huella_del_listado(self):
+        listados = {"VJ102IMG": [{"name": "VJ102IMG.A2025123.0142.021.2025123093000.nc"}],
+                    "VJ103IMG": [{"name": "VJ103IMG.A2025123.0142.021.2025123090000.nc"}]}
+
+        def listar(url, **kwargs):
+            respuesta = MagicMock()
+            respuesta.json.return_value = {"content": list(listados[url.split("/")[-3]])}
+            return respuesta
+
+        self.session.get.side_effect = listar
+        huella = descarga.huella_listado("2025", "123", session=self.session)
+        # Sólo se piden los listados, y la huella no depende de su orden
+        self.assertEqual(self.session.get.call_count, 2)
+        listados["VJ103IMG"].insert(0, {"name": "VJ103IMG.A2025123.0136.021.2025123090000.nc"})
+        nueva = descarga.huella_listado("2025", "123", session=self.session)
+        self.assertNotEqual(nueva, huella)
+        listados["VJ103IMG"].reverse()
+        self.assertEqual(descarga.huella_listado("2025", "123", session=self.session), nueva)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,154 @@
+import unittest
+import sys
+import json
+import tempfile
+import threading
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from unittest.mock import patch
+from urllib.parse import urlparse, parse_qs
+
+# Raíz del proyecto: este test está en A03_tests/
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
+
+from A01_source.B01_2_eq_download import event_store, sync
+
+CENTRO = (64.12583485520874, -21.801875984550193)
+
+
+def ms(fecha):
+    return int(pd.Timestamp(fecha).value // 10**6)
+
+
+class ComCatFalso(BaseHTTPRequestHandler):
+    """Servicio FDSN de eventos mínimo: consultas por ventana, región, magnitud, updatedafter y eventid."""
+    eventos = {}
+    peticiones = []
+
+    def do_GET(self):
+        q = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        type(self).peticiones.append(q)
+        if "eventid" in q:
+            cuerpo = self.eventos[q["eventid"]]
+        else:
+            seleccion = []
+            for ev in self.eventos.values():
+                p, (lon, lat, _) = ev["properties"], ev["geometry"]["coordinates"]
+                if not (ms(q["starttime"]) <= p["time"] <= ms(q["endtime"])):
+                    continue
+                if "updatedafter" in q and p["updated"] <= ms(q["updatedafter"]):
+                    continue
+                if p["mag"] < float(q["minmagnitude"]):
+                    continue
+                if not (float(q["minlatitude"]) <= lat <= float(q["maxlatitude"])
+                        and float(q["minlongitude"]) <= lon <= float(q["maxlongitude"])):
+                    continue
+                seleccion.append(ev)
+            seleccion.sort(key=lambda ev: ev["properties"]["time"])
+            inicio = int(q["offset"]) - 1
+            cuerpo = {"type": "FeatureCollection", "features": seleccion[inicio:inicio + int(q["limit"])]}
+        datos = json.dumps(cuerpo).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def log_message(self, *args):
+        pass
+
+
+def evento(i, fecha, mag, actualizado, lat=64.0, lon=-21.5):
+    return {"type": "Feature", "id": f"us{i:04d}",
+            "properties": {"time": ms(fecha), "updated": ms(actualizado), "mag": mag, "magType": "ml"},
+            "geometry": {"type": "Point", "coordinates": [lon, lat, 10.0]}}
+
+
+class TestSincronizacion(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patches = [patch.object(event_store, "data_dir", self.tmp.name), patch("builtins.print")]
+        for p in self.patches:
+            p.start()
+
+        ComCatFalso.eventos = {}
+        for i in range(30):
+            fecha = pd.Timestamp("2015-01-01") + pd.Timedelta(days=30 * i)
+            ev = evento(i, fecha, 1.5 + (i % 5) * 0.5, fecha + pd.Timedelta(days=1))
+            ComCatFalso.eventos[ev["id"]] = ev
+        # Fuera de la región y por debajo de la magnitud mínima: no se descargan
+        ComCatFalso.eventos["us9998"] = evento(9998, "2016-01-01", 4.0, "2016-01-02", lat=40.0, lon=-3.0)
+        ComCatFalso.eventos["us9999"] = evento(9999, "2016-01-01", 0.5, "2016-01-02")
+        ComCatFalso.peticiones = []
+
+        self.server = HTTPServer(("127.0.0.1", 0), ComCatFalso)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/fdsnws/event/1/query"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        for p in self.patches:
+            p.stop()
+        self.tmp.cleanup()
+
+    def sincronizar(self):
+        ComCatFalso.peticiones = []
+        return sync.sync_region("2010-01-01 00:00", "2025-04-29 00:00", CENTRO, [(350, 1)], url=self.url)
+
+    def detalles(self):
+        return sorted(q["eventid"] for q in ComCatFalso.peticiones if "eventid" in q)
+
+    def test_sincronizacion_incremental(self):
+        df, nuevos, actualizados = self.sincronizar()
+        self.assertEqual((len(df), nuevos, actualizados), (30, 30, 0))
+        self.assertEqual(len(self.detalles()), 30)
+        self.assertNotIn("updatedafter", ComCatFalso.peticiones[0])
+
+        # En ComCat: un evento revisado y uno nuevo
+        revisado = ComCatFalso.eventos["us0003"]["properties"]
+        revisado.update(mag=3.7, updated=ms("2025-03-01"))
+        ComCatFalso.eventos["us0100"] = evento(100, "2025-02-01", 2.8, "2025-02-02")
+
+        df, nuevos, actualizados = self.sincronizar()
+        self.assertEqual((nuevos, actualizados), (1, 1))
+        # Solo se pide lo actualizado desde la marca y el detalle de los ids nuevos
+        self.assertEqual(pd.Timestamp(ComCatFalso.peticiones[0]["updatedafter"]),
+                         pd.Timestamp("2015-01-01") + pd.Timedelta(days=30 * 29 + 1))
+        self.assertEqual(self.detalles(), ["us0100"])
+
+        guardado = event_store.load_events("wrk_df")
+        self.assertEqual(len(guardado), 31)
+        self.assertTrue(guardado["id"].is_unique)
+        self.assertEqual(guardado.loc[guardado["id"] == "us0003", "magnitude"].item(), 3.7)
+        self.assertTrue(guardado["time"].is_monotonic_increasing)
+
+        marca = sync.load_state()[sync.region_key("wrk_df", CENTRO, 350, 1)]
+        self.assertEqual(pd.Timestamp(marca["time"]), pd.Timestamp("2025-02-01"))
+        self.assertEqual(pd.Timestamp(marca["updated"]), pd.Timestamp("2025-03-01"))
+
+        # Sin cambios: ninguna descarga de detalle y el almacén no cambia
+        df, nuevos, actualizados = self.sincronizar()
+        self.assertEqual((len(df), nuevos, actualizados), (31, 0, 0))
+        self.assertEqual(self.detalles(), [])
+
+    def test_ventanas(self):
+        marca = {"start": "2015-01-01T00:00:00", "end": "2020-01-01T00:00:00", "time": None,
+                 "updated": "2019-12-01T00:00:00"}
+        ventanas = sync.sync_windows(pd.Timestamp("2010-01-01"), pd.Timestamp("2025-01-01"), marca)
+        self.assertEqual(ventanas, [
+            (pd.Timestamp("2015-01-01"), pd.Timestamp("2020-01-01"), pd.Timestamp("2019-12-01")),
+            (pd.Timestamp("2010-01-01"), pd.Timestamp("2015-01-01"), None),
+            (pd.Timestamp("2020-01-01"), pd.Timestamp("2025-01-01"), None),
+        ])
+        # Sin marca, o con una ventana que no se solapa, se descarga todo
+        self.assertEqual(sync.sync_windows(pd.Timestamp("2021-01-01"), pd.Timestamp("2022-01-01"), marca),
+                         [(pd.Timestamp("2021-01-01"), pd.Timestamp("2022-01-01"), None)])
+        self.assertEqual(len(sync.sync_windows(pd.Timestamp("2021-01-01"), pd.Timestamp("2022-01-01"), None)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
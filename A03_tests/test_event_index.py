@@ -0,0 +1,99 @@
+import unittest
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from unittest.mock import patch
+
+# Raíz del proyecto: este test está en A03_tests/
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
+
+from A01_source.B01_2_eq_download import event_store, event_index, utils
+from A01_source.B01_2_eq_download.event_index import EventIndex
+from A01_source.B01_4_eq_processing.trigger import haversine
+from A02_utils import geometry
+
+
+def eventos(n=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "id": [f"us{i:06d}" for i in range(n)],
+        "time": pd.date_range("2010-01-01", periods=n, freq="3h"),
+        "magnitude": rng.uniform(1, 6, n).round(1),
+        "latitude": rng.uniform(20, 70, n),
+        "longitude": rng.uniform(-40, 10, n),
+    })
+
+
+class TestEventIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.df = eventos()
+        self.indice = EventIndex(self.df)
+
+    def test_radio(self):
+        lat, lon = 64.1, -21.8
+        d = haversine(lat, lon, self.df["latitude"].values, self.df["longitude"].values)
+        for radio in (5.0, 150.0, 800.0):
+            dentro, distancias = self.indice.within_radius(lat, lon, radio, return_distance=True)
+            # Mismos eventos que recorriendo toda la tabla, y en el orden del almacén
+            self.assertEqual(list(dentro["id"]), list(self.df.loc[d <= radio, "id"]))
+            np.testing.assert_allclose(distancias, d[d <= radio], atol=1e-6)
+
+    def test_mas_cercanos(self):
+        lat, lon = 28.6, -17.8
+        d = haversine(lat, lon, self.df["latitude"].values, self.df["longitude"].values)
+        cercanos, distancias = self.indice.nearest(lat, lon, k=10, return_distance=True)
+        self.assertEqual(list(cercanos["id"]), list(self.df["id"].values[np.argsort(d)[:10]]))
+        np.testing.assert_allclose(distancias, np.sort(d)[:10], atol=1e-6)
+        self.assertEqual(len(EventIndex(self.df.iloc[:3]).nearest(lat, lon, k=10)), 3)
+
+    def test_poligono(self):
+        # Triángulo sobre Islandia y un rectángulo de mapa
+        for poly_lat, poly_lon in (([62, 67, 62], [-25, -20, -12]), ([27.5, 27.5, 29.8, 29.8], [-18.5, -13.0, -13.0, -18.5])):
+            dentro = self.indice.within_polygon(poly_lat, poly_lon)
+            esperado = event_index.inside_polygon(self.df["latitude"], self.df["longitude"], poly_lat, poly_lon)
+            self.assertGreater(esperado.sum(), 0)
+            self.assertEqual(list(dentro["id"]), list(self.df.loc[esperado, "id"]))
+
+        self.assertTrue(event_index.inside_polygon([28.0], [-15.0], [27.5, 27.5, 29.8, 29.8], [-18.5, -13.0, -13.0, -18.5])[0])
+        self.assertFalse(event_index.inside_polygon([30.0], [-15.0], [27.5, 27.5, 29.8, 29.8], [-18.5, -13.0, -13.0, -18.5])[0])
+
+    def test_indice_del_almacen(self):
+        with tempfile.TemporaryDirectory() as tmp, patch.object(event_store, "data_dir", tmp), \
+                patch("builtins.print"), patch.dict(event_index._indexes, clear=True):
+            event_store.save_events(self.df.iloc[:500], "wrk_df")
+            indice = EventIndex.from_store("wrk_df")
+            self.assertEqual(len(indice), 500)
+            # Sin cambios en el almacén se reutiliza el índice
+            self.assertIs(EventIndex.from_store("wrk_df"), indice)
+
+            event_store.save_events(self.df.iloc[:800], "wrk_df")
+            self.assertEqual(len(EventIndex.from_store("wrk_df")), 800)
+
+            # Caja de descarga: entran las esquinas, que quedan fuera del círculo del radio
+            lat_cent, lon_cent, radio = 45.0, -15.0, 350
+            lat_min, lat_max, lon_min, lon_max = utils.limit_region_coords(lat_cent, lon_cent, radio)
+            caja = self.df[self.df["latitude"].between(lat_min, lat_max) & self.df["longitude"].between(lon_min, lon_max)]
+            self.assertEqual(list(event_index.region_events("wrk_df", (lat_cent, lon_cent), radio)["id"]),
+                             list(caja.loc[caja.index < 800, "id"]))
+            esquinas = haversine(lat_cent, lon_cent, caja["latitude"].values, caja["longitude"].values) > radio + 25
+            self.assertGreater(esquinas.sum(), 0)
+
+            # Los mapas de geometry usan la región de descarga que se les pasa, no la de La Palma
+            mapa = geometry.map_events("wrk_df", (lat_cent, lon_cent), radio)
+            self.assertEqual(list(mapa["id"]), list(caja.loc[caja.index < 800, "id"]))
+            limites = geometry.region_bounds((lat_cent, lon_cent), radio)
+            self.assertTrue(mapa["latitude"].between(*limites["latitude"]).all())
+            self.assertTrue(mapa["longitude"].between(*limites["longitude"]).all())
+
+            vacio = EventIndex.from_store("trigger_index_filtered")
+            self.assertEqual(len(vacio), 0)
+            self.assertTrue(vacio.within_radius(28.6, -17.8, 100.0).empty)
+            self.assertTrue(vacio.nearest(28.6, -17.8, k=5).empty)
+
+
+if __name__ == "__main__":
+    unittest.main()
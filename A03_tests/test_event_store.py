@@ -0,0 +1,90 @@
+import unittest
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from unittest.mock import patch
+
+# Raíz del proyecto: este test está en A03_tests/
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
+
+from A01_source.B01_2_eq_download import event_store
+
+
+def eventos(n=60, seed=0):
+    """Eventos como los de working_df (tiempos en texto, como en los CSV de ComCat)."""
+    rng = np.random.default_rng(seed)
+    tiempos = pd.date_range("2019-06-01", "2024-06-01", periods=n)
+    return pd.DataFrame({
+        "id": [f"us{i:05d}" for i in range(n)],
+        "time": tiempos.strftime("%Y-%m-%d %H:%M:%S.%f"),
+        "magnitude": rng.uniform(1, 6, n).round(1),
+        "magtype": rng.choice(["ml", "mb", "mww"], n),
+        "latitude": rng.uniform(27, 30, n),
+        "longitude": rng.uniform(-19, -13, n),
+        "depth": rng.uniform(0, 40, n),
+    })
+
+
+class TestEventStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patch = patch.object(event_store, "data_dir", self.tmp.name)
+        self.patch.start()
+        self.df = eventos()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.tmp.cleanup()
+
+    def test_ida_y_vuelta_por_años(self):
+        with patch("builtins.print"):
+            event_store.save_events(self.df, "wrk_df.csv")
+        carpeta = Path(event_store.store_path("wrk_df"))
+        self.assertEqual(sorted(p.name for p in carpeta.iterdir()), [f"year={y}" for y in range(2019, 2025)])
+
+        leido = event_store.load_events("wrk_df")
+        self.assertEqual(list(leido.columns), event_store.EVENT_SCHEMA.names)
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(leido["time"]))
+        np.testing.assert_array_equal(leido["time"].values, pd.to_datetime(self.df["time"]).dt.floor("ms").values)
+        pd.testing.assert_series_equal(leido["magnitude"], self.df["magnitude"])
+        self.assertEqual(list(leido["id"]), list(self.df["id"]))
+        self.assertTrue(leido["trigger_index"].isna().all())
+
+    def test_filtros_y_columnas(self):
+        df = self.df.assign(trigger_index=np.linspace(0, 200, len(self.df)))
+        with patch("builtins.print"):
+            event_store.save_events(df, "wrk_df")
+
+        leido = event_store.load_events("wrk_df", columns=["id", "magnitude"], start="2021-01-01",
+                                        end="2022-12-31 23:59", min_magnitude=3.0)
+        tiempo = pd.to_datetime(df["time"])
+        esperado = df[(tiempo >= "2021-01-01") & (tiempo <= "2022-12-31 23:59") & (df["magnitude"] >= 3.0)]
+        self.assertEqual(list(leido.columns), ["id", "magnitude"])
+        self.assertEqual(list(leido["id"]), list(esperado["id"]))
+
+        filtrado = event_store.load_events("wrk_df", max_trigger_index=100.0)
+        self.assertEqual(list(filtrado["id"]), list(df.loc[df["trigger_index"] <= 100.0, "id"]))
+
+    def test_sin_datos_y_migracion_del_csv(self):
+        vacio = event_store.load_events("trigger_index_filtered", columns=["id", "time"])
+        self.assertTrue(vacio.empty)
+        self.assertEqual(list(vacio.columns), ["id", "time"])
+
+        with patch("builtins.print"):
+            # Selección vacía: el almacén existe y se lee sin filas
+            event_store.save_events(self.df.iloc[:0], "trigger_index_filtered")
+            self.assertTrue(event_store.load_events("trigger_index_filtered").empty)
+
+            # CSV antiguo: se importa la primera vez que se lee
+            csv = Path(self.tmp.name) / "B_eq_processed" / "antiguo.csv"
+            self.df.to_csv(csv, index=False)
+            self.assertEqual(len(event_store.load_events("antiguo")), len(self.df))
+        self.assertTrue(Path(event_store.store_path("antiguo")).is_dir())
+
+
+if __name__ == "__main__":
+    unittest.main()
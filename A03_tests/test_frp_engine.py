@@ -0,0 +1,305 @@
+import unittest
+import sys
+import tempfile
+import importlib.util
+import numpy as np
+import xarray as xr
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+from netCDF4 import Dataset
+
+# Raíz del proyecto: este test está en A03_tests/
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
+
+from A01_source.B01_3_processing import archive, bt_cube, frp, stages
+from A01_source.B01_3_processing.ref_accumulator import RefAccumulator
+from A02_utils import sites
+from A02_utils.sites import site_grid
+
+module_path = project_root / "A01_source" / "B01_3_processing" / "Historic" / "RP" / "RP_historico.py"
+spec = importlib.util.spec_from_file_location("RP_historico", module_path)
+rp_historico = importlib.util.module_from_spec(spec)
+sys.modules["RP_historico"] = rp_historico
+spec.loader.exec_module(rp_historico)
+
+ROI = {"lat_min": 28.54, "lat_max": 28.57, "lon_min": -17.74, "lon_max": -17.70}
+
+
+def frp_escalar(t_mean, t_floor, area, scale):
+    """Cálculo original, un día cada vez."""
+    if np.isnan(t_mean) or t_mean <= t_floor:
+        return 0.0
+    return (5.67e-8 * (t_mean**4 - t_floor**4) * area / 1e6) * scale
+
+
+def cubo(n_dias, inicio=datetime(2024, 3, 1), seed=0):
+    """(time, y, x) con coordenadas por escena como en los cubos mensuales."""
+    rng = np.random.default_rng(seed)
+    lat = np.tile(np.linspace(28.60, 28.50, 20), (n_dias, 1))
+    lon = np.tile(np.linspace(-17.78, -17.66, 24), (n_dias, 1))
+    bt = rng.normal(275, 8, (n_dias, 20, 24))
+    fechas = [np.datetime64((inicio + timedelta(days=i)).date(), "ns") for i in range(n_dias)]
+    return xr.DataArray(bt, dims=("time", "y", "x"),
+                        coords={"time": fechas, "latitude": (("time", "y"), lat),
+                                "longitude": (("time", "x"), lon)})
+
+
+class TestFrpEngine(unittest.TestCase):
+
+    def test_serie_igual_que_dia_a_dia(self):
+        bt = cubo(400)
+        inicio, fin = datetime(2022, 2, 1), datetime(2025, 6, 1)
+        parametros = frp.linear_model(bt.time.values.astype("datetime64[D]"), inicio, fin,
+                                      (265, 270), (1_000_000, 500_000), (1.5, 0.5))
+        serie = frp.frp_series(bt, ROI, *parametros)
+
+        for i in range(0, 400, 37):
+            dia = datetime.fromisoformat(str(bt.time.values[i])[:10])
+            escena = bt.isel(time=i)
+            dentro = ((escena.latitude >= ROI["lat_min"]) & (escena.latitude <= ROI["lat_max"]) &
+                      (escena.longitude >= ROI["lon_min"]) & (escena.longitude <= ROI["lon_max"]))
+            t_mean = float(np.nanmean(escena.where(dentro).values))
+            f2 = (dia - inicio).days / (fin - inicio).days
+            esperado = frp_escalar(t_mean, 265 + 5 * f2, 1_000_000 - 500_000 * f2, 1.5 - 1.0 * f2)
+
+            self.assertAlmostEqual(float(serie["BT_mean"][i]), t_mean, places=6)
+            self.assertAlmostEqual(float(serie["FRP"][i]), esperado, places=6)
+
+    def test_antes_del_modelo_y_maximo(self):
+        bt = cubo(3, inicio=datetime(2022, 1, 31))
+        serie = frp.frp_series(bt + 200, ROI, *frp.model_parameters("La_Palma", bt.time.values), frp_max=400)
+        # 31 de enero: sin modelo; el resto: valores fuera de rango descartados
+        self.assertTrue(np.isnan(serie["FRP"]).all())
+        self.assertTrue(np.isnan(serie["t_floor"][0]))
+        self.assertFalse(np.isnan(serie["t_floor"][1]))
+
+
+class TestFrpModels(unittest.TestCase):
+
+    def test_modelo_deterministico(self):
+        fechas = np.array(["2022-02-01", "2023-09-16", "2025-05-01", "2030-01-01"], dtype="datetime64[D]")
+        t_floor, area, scale = frp.model_parameters("La_Palma", fechas)
+
+        # Valores fijos para cada fecha, sea cual sea el día en que se calculan
+        np.testing.assert_allclose(t_floor[[0, 2, 3]], [265, 270, 270])
+        np.testing.assert_allclose(area[[0, 3]], [1_000_000, 500_000])
+        np.testing.assert_allclose(scale[[0, 3]], [1.5, 0.5])
+        self.assertTrue(265 < t_floor[1] < 270)
+
+    def test_modelo_de_lanzarote(self):
+        fechas = np.array(["1899-01-01", "2025-03-01"], dtype="datetime64[D]")
+        t_floor, area, scale = frp.model_parameters("Lanzarote", fechas)
+        self.assertTrue(np.isnan(t_floor[0]))
+        self.assertEqual((t_floor[1], area[1], scale[1]), (265, 1_250_000, 2.5))
+
+    def test_registrar_modelo(self):
+        @frp.register_model("prueba")
+        def modelo(dates, t_floor):
+            return np.full(dates.shape, t_floor), np.ones(dates.shape), np.ones(dates.shape)
+
+        try:
+            sitio = {"frp_model": {"kind": "prueba", "t_floor": 250.0}}
+            with patch.dict(frp.get_site.__globals__["SITES"], {"Prueba": sitio}):
+                t_floor, _, _ = frp.model_parameters("Prueba", np.array(["2025-01-01"], dtype="datetime64[D]"))
+                self.assertEqual(t_floor[0], 250.0)
+                sitio["frp_model"] = {"kind": "desconocido"}
+                with self.assertRaises(ValueError):
+                    frp.model_parameters("Prueba", [])
+        finally:
+            frp.MODELS.pop("prueba")
+
+    def test_varios_cubos_mensuales(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for mes, n in ((1, 3), (2, 2)):
+                ruta = Path(tmp) / f"BT_LaPalma_VJ102IMG_2025_{mes:02d}.nc"
+                for escena in cubo(n, inicio=datetime(2025, mes, 10), seed=mes):
+                    bt_cube.append_scene(ruta, escena.expand_dims("time"))
+
+            # Varios meses del archivo en una sola lectura, solo la caja de la ROI
+            ds = archive.open_bt("La_Palma", roi=ROI, base_path=tmp)
+            serie = frp.frp_series(ds["BT_I05"], ROI, 265, 1_250_000, 2.5)
+
+        self.assertEqual(serie.sizes["time"], 5)
+        self.assertTrue((serie["FRP"] > 0).all())
+
+
+class TestFrpPixeles(unittest.TestCase):
+
+    def setUp(self):
+        # REF de un mes tranquilo sobre una caja de la malla de La Palma
+        rng = np.random.default_rng(1)
+        grid_lat, grid_lon = site_grid("La_Palma")
+        self.lat, self.lon = grid_lat[:40], grid_lon[:50]
+        acumulador = RefAccumulator(self.lat[10:30], self.lon[10:40])
+        acumulador.add_batch(rng.normal(290, 1.0, (20, 20, 30)), [f"2025-03-{d:02d}" for d in range(1, 21)])
+        self.ref = acumulador.materialize()
+
+        # Tres escenas sobre una zona mayor que la caja del REF
+        bt = rng.normal(290, 1.0, (3, 40, 50))
+        bt[0, 20:22, 20:22] = 340.0   # Foco de 2x2 píxeles
+        bt[2, 15, 25] = 320.0         # Un píxel caliente
+        bt[2, 2, 2] = 400.0           # Caliente, pero fuera de la caja del REF
+        bt[1, 18, 18] = np.nan
+        fechas = np.array(["2025-03-21", "2025-03-22", "2025-03-23"], dtype="datetime64[ns]")
+        self.bt = xr.DataArray(bt, dims=("time", "y", "x"),
+                               coords={"time": fechas, "latitude": (("time", "y"), np.tile(self.lat, (3, 1))),
+                                       "longitude": (("time", "x"), np.tile(self.lon, (3, 1)))})
+
+    def test_deteccion_y_suma(self):
+        serie = frp.pixel_frp_series(self.bt, self.ref)
+
+        calientes = np.zeros(self.bt.shape, dtype=bool)
+        calientes[0, 20:22, 20:22] = calientes[2, 15, 25] = True
+        np.testing.assert_array_equal(serie["hot"].values, calientes)
+        np.testing.assert_array_equal(serie["hot_count"].values, [4, 0, 1])
+
+        # El total de cada escena es la suma del FRP de sus píxeles calientes, uno a uno
+        fondo = self.ref["brightness_temperature_REF"].values.astype("f8")
+        for t, i, j in zip(*np.nonzero(calientes)):
+            area = (np.deg2rad(0.0035) * 6_371_000) ** 2 * np.cos(np.deg2rad(self.lat[i]))
+            esperado = 5.67e-8 * (self.bt.values[t, i, j] ** 4 - fondo[i - 10, j - 10] ** 4) * area / 1e6
+            self.assertAlmostEqual(float(serie["FRP_pixel"][t, i, j]), esperado, places=9)
+        np.testing.assert_allclose(serie["FRP_total"].values, serie["FRP_pixel"].sum(dim=("y", "x")).values)
+        self.assertEqual(float(serie["FRP_total"][1]), 0.0)
+        self.assertGreater(float(serie["FRP_total"][0]), float(serie["FRP_total"][2]))
+
+    def test_roi_y_metodo_mir(self):
+        roi = {"lat_min": float(self.lat[16]), "lat_max": float(self.lat[14]),
+               "lon_min": float(self.lon[24]), "lon_max": float(self.lon[26])}
+        serie = frp.pixel_frp_series(self.bt, self.ref, roi)
+        np.testing.assert_array_equal(serie["hot_count"].values, [0, 0, 1])
+
+        mir = frp.pixel_frp_series(self.bt, self.ref, method="mir")
+        np.testing.assert_array_equal(mir["hot"].values, frp.pixel_frp_series(self.bt, self.ref)["hot"].values)
+        self.assertTrue((mir["FRP_total"][[0, 2]] > 0).all())
+        with self.assertRaises(ValueError):
+            frp.pixel_frp_series(self.bt, self.ref, method="desconocido")
+
+    def test_area_del_paso_de_la_malla(self):
+        # Una columna de cada dos: el píxel mide el doble en longitud y su FRP también
+        serie = frp.pixel_frp_series(self.bt, self.ref)
+        ancho = frp.pixel_frp_series(self.bt.isel(x=slice(None, None, 2)), self.ref)
+        self.assertAlmostEqual(frp.grid_spacing(self.bt["longitude"].values[:, ::2]), 0.007, places=9)
+        self.assertAlmostEqual(float(ancho["FRP_pixel"][0, 20, 10]), 2 * float(serie["FRP_pixel"][0, 20, 20]), places=9)
+
+        # Sin paso en las coordenadas se usa la resolución dada
+        self.assertEqual(frp.grid_spacing([28.5], 0.01), 0.01)
+        np.testing.assert_allclose(frp.pixel_area(0.0, 0.01), frp.pixel_area(0.0, 0.005, 0.02))
+
+
+class TestFrpSitioReal(unittest.TestCase):
+    """REF de stages.ref_monthly y FRP por píxel con las ROI reales de A02_utils.sites."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patches = [patch.object(stages, "processed_dir", Path(self.tmp.name)),
+                        patch.object(stages, "catalog_dir", Path(self.tmp.name))]
+        for p in self.patches:
+            p.start()
+        self.lat, self.lon = site_grid("La_Palma")
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.tmp.cleanup()
+
+    def escena(self, dia, valores):
+        return xr.DataArray(valores[np.newaxis].astype("f4"), dims=("time", "y", "x"),
+                            coords={"time": [np.datetime64(dia)], "latitude": ("y", self.lat),
+                                    "longitude": ("x", self.lon)}, name="BT_I05")
+
+    def test_foco_en_la_region_frp(self):
+        rng = np.random.default_rng(0)
+        mensual = stages.bt_monthly_path("La_Palma", 2025, 5)
+        mensual.parent.mkdir(parents=True)
+        for dia in range(1, 6):
+            bt_cube.append_scene(mensual, self.escena(f"2025-05-{dia:02d}", rng.uniform(290, 310, (self.lat.size, self.lon.size))))
+        with patch("builtins.print"):
+            salida = stages.ref_monthly("La_Palma", datetime(2025, 5, 5))
+
+        frp_roi = sites.get_site("La_Palma")["frp_roi"]
+        en_frp = np.outer((self.lat >= frp_roi["lat_min"]) & (self.lat <= frp_roi["lat_max"]),
+                          (self.lon >= frp_roi["lon_min"]) & (self.lon <= frp_roi["lon_max"]))
+        valores = rng.uniform(290, 310, en_frp.shape)
+        valores[en_frp] = 600.0
+        bt = self.escena("2025-05-06", valores)
+
+        with xr.open_dataset(salida) as ref:
+            serie = frp.site_pixel_series("La_Palma", bt, ref)
+        self.assertEqual(int(serie["hot_count"][0]), en_frp.sum())
+        self.assertGreater(float(serie["FRP_total"][0]), 0)
+
+        # Un REF solo sobre la ref_roi no tiene fondo en la región FRP: error, no 0 MW
+        ref_roi = sites.get_site("La_Palma")["ref_roi"]
+        lat = self.lat[(self.lat >= ref_roi["lat_min"]) & (self.lat <= ref_roi["lat_max"])]
+        lon = self.lon[(self.lon >= ref_roi["lon_min"]) & (self.lon <= ref_roi["lon_max"])]
+        acumulador = RefAccumulator(lat, lon)
+        acumulador.add_batch(rng.uniform(290, 310, (5, lat.size, lon.size)), [f"2025-05-{d:02d}" for d in range(1, 6)])
+        with self.assertRaises(ValueError):
+            frp.site_pixel_series("La_Palma", bt, acumulador.materialize())
+
+
+class TestCurvaEnfriamiento(unittest.TestCase):
+
+    def test_curva_historica(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            base = Path(tmp)
+            lat = np.linspace(29.10, 28.85, 60)
+            lon = np.linspace(-13.85, -13.60, 70)
+            lon_grid, lat_grid = np.meshgrid(lon, lat)
+            for i, temperatura in enumerate((300.0, 260.0, 290.0)):
+                carpeta = base / (datetime(2025, 1, 1) + timedelta(days=2 * i)).strftime("%Y_%j")
+                carpeta.mkdir()
+                with Dataset(carpeta / "BT.nc", "w") as nc:
+                    nc.createDimension("rows", lat.size)
+                    nc.createDimension("cols", lon.size)
+                    nc.createVariable("BT_I05", "f4", ("rows", "cols"))[:] = np.full(lat_grid.shape, temperatura)
+                    nc.createVariable("latitude", "f4", ("rows", "cols"))[:] = lat_grid
+                    nc.createVariable("longitude", "f4", ("rows", "cols"))[:] = lon_grid
+
+            curva = rp_historico.cooling_curve(datetime(2025, 1, 1), datetime(2025, 1, 6), base)
+
+        # Sólo los días con datos, con el modelo fijo de Lanzarote
+        self.assertEqual(curva.sizes["time"], 3)
+        esperado = [frp_escalar(t, 265, 1_250_000, 2.5) for t in (300.0, 260.0, 290.0)]
+        np.testing.assert_allclose(curva["FRP"].values, esperado, rtol=1e-5)
+
+    def test_igual_que_el_bucle_original(self):
+        # BT_mean sobre la máscara 2-D de cada archivo diario, como el bucle día a día anterior
+        rng = np.random.default_rng(3)
+        lat = np.linspace(29.10, 28.85, 60)
+        lon = np.linspace(-13.85, -13.60, 70)
+        lon_grid, lat_grid = np.meshgrid(lon, lat)
+        roi = rp_historico.roi
+        esperado_bt, esperado_frp = [], []
+        with tempfile.TemporaryDirectory() as tmp:
+            for i in range(4):
+                carpeta = Path(tmp) / (datetime(2025, 2, 1) + timedelta(days=i)).strftime("%Y_%j")
+                carpeta.mkdir()
+                bt = rng.normal(270, 15, lat_grid.shape)
+                bt[rng.random(bt.shape) < 0.1] = np.nan
+                with Dataset(carpeta / "BT.nc", "w") as nc:
+                    nc.createDimension("rows", lat.size)
+                    nc.createDimension("cols", lon.size)
+                    nc.createVariable("BT_I05", "f4", ("rows", "cols"))[:] = bt
+                    nc.createVariable("latitude", "f4", ("rows", "cols"))[:] = lat_grid
+                    nc.createVariable("longitude", "f4", ("rows", "cols"))[:] = lon_grid
+
+                with xr.open_dataset(carpeta / "BT.nc") as ds:
+                    la, lo = ds["latitude"].values, ds["longitude"].values
+                    geo_mask = ((la >= roi["lat_min"]) & (la <= roi["lat_max"]) &
+                                (lo >= roi["lon_min"]) & (lo <= roi["lon_max"]))
+                    t_mean = float(np.nanmean(ds["BT_I05"].where(geo_mask).values))
+                esperado_bt.append(t_mean)
+                esperado_frp.append(frp_escalar(t_mean, 265, 1_250_000, 2.5))
+
+            curva = rp_historico.cooling_curve(datetime(2025, 2, 1), datetime(2025, 2, 4), Path(tmp))
+
+        np.testing.assert_allclose(curva["BT_mean"].values, esperado_bt, rtol=1e-6)
+        np.testing.assert_allclose(curva["FRP"].values, esperado_frp, rtol=1e-5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import unittest
+import sys
+import tempfile
+import threading
+import numpy as np
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from netCDF4 import Dataset
+
+# Raíz del proyecto: este test está en A03_tests/
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
+
+from A01_source.B01_1_download import granules
+
+
+def crear_granulo_falso(path, flag="Night"):
+    """Crea un NetCDF pequeño con los atributos globales de un VJ102IMG."""
+    with Dataset(path, "w") as nc:
+        nc.setncattr("DayNightFlag", flag)
+        nc.setncattr("SouthBoundingCoordinate", 28.0)
+        nc.setncattr("NorthBoundingCoordinate", 29.0)
+        nc.setncattr("WestBoundingCoordinate", -18.5)
+        nc.setncattr("EastBoundingCoordinate", -13.0)
+        obs = nc.createGroup("observation_data")
+        obs.createDimension("y", 64)
+        obs.createDimension("x", 64)
+        obs.createVariable("I05", "f4", ("y", "x"))[:] = np.random.rand(64, 64)
+
+
+class ServidorLocal(BaseHTTPRequestHandler):
+    """Sustituto local de LAADS: sirve ficheros de `root` y soporta cabeceras Range."""
+
+    root = None
+    ranges = []
+
+    def do_GET(self):
+        path = self.root / self.path.lstrip("/")
+        if not path.exists():
+            self.send_error(404)
+            return
+        data = path.read_bytes()
+        range_header = self.headers.get("Range")
+        ServidorLocal.ranges.append(range_header)
+
+        if range_header:
+            start = int(range_header.split("=")[1].split("-")[0])
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(data)}")
+                self.end_headers()
+                return
+            body = data[start:]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        else:
+            body = data
+            self.send_response(200)
+
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestGranuleDownloader(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp = Path(self.tmp.name)
+        self.server_dir = tmp / "server"
+        self.output_dir = tmp / "output"
+        self.server_dir.mkdir()
+
+        self.names = [f"VJ102IMG.A2025123.{hhmm}.021.nc" for hhmm in ("0142", "0148", "0154")]
+        for name in self.names:
+            crear_granulo_falso(self.server_dir / name)
+
+        ServidorLocal.root = self.server_dir
+        ServidorLocal.ranges = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), ServidorLocal)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def test_descarga_concurrente(self):
+        links = [f"{self.base_url}/{name}" for name in self.names]
+
+        results = granules.descargar_granulos(links, self.output_dir, max_workers=3)
+
+        self.assertEqual([r["filename"] for r in results], self.names)
+        for name, result in zip(self.names, results):
+            self.assertEqual(result["status"], "downloaded")
+            self.assertGreater(result["mb_s"], 0)
+            self.assertEqual((self.output_dir / name).read_bytes(), (self.server_dir / name).read_bytes())
+            with Dataset(result["path"]) as nc:
+                self.assertEqual(nc.getncattr("DayNightFlag"), "Night")
+
+        # No quedan ficheros parciales
+        self.assertEqual(list(self.output_dir.glob("*.part")), [])
+
+    def test_reanuda_fichero_parcial(self):
+        name = self.names[0]
+        data = (self.server_dir / name).read_bytes()
+        self.output_dir.mkdir()
+        half = len(data) // 2
+        (self.output_dir / (name + granules.PART_SUFFIX)).write_bytes(data[:half])
+
+        session = granules.crear_sesion()
+        result = granules.descargar_granulo(session, f"{self.base_url}/{name}", self.output_dir)
+
+        self.assertTrue(result["resumed"])
+        self.assertEqual(result["bytes"], len(data) - half)
+        self.assertEqual(ServidorLocal.ranges, [f"bytes={half}-"])
+        self.assertEqual((self.output_dir / name).read_bytes(), data)
+        self.assertFalse((self.output_dir / (name + granules.PART_SUFFIX)).exists())
+
+    def test_error_conserva_parcial(self):
+        links = [f"{self.base_url}/no_existe.nc", f"{self.base_url}/{self.names[0]}"]
+
+        results = granules.descargar_granulos(links, self.output_dir, max_workers=2)
+
+        self.assertEqual(results[0]["status"], "error")
+        self.assertEqual(results[1]["status"], "downloaded")
+        self.assertFalse((self.output_dir / "no_existe.nc").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
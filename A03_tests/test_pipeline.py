@@ -0,0 +1,343 @@
+import unittest
+import os
+import sys
+import time
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+import xarray as xr
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+from netCDF4 import Dataset
+
+# Raíz del proyecto: este test está en A03_tests/
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
+
+from A01_source.B01_3_processing import pipeline, stages
+from A02_utils import sites
+
+
+def crear_granulo(path, seed=0):
+    """VJ102IMG mínimo sobre La Palma con radiancias I05 en torno a 300 K."""
+    rng = np.random.default_rng(seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with Dataset(path, "w") as nc:
+        nc.setncattr("SouthBoundingCoordinate", 28.50)
+        nc.setncattr("NorthBoundingCoordinate", 28.70)
+        nc.setncattr("WestBoundingCoordinate", -17.95)
+        nc.setncattr("EastBoundingCoordinate", -17.65)
+        obs = nc.createGroup("observation_data")
+        obs.createDimension("y", 32)
+        obs.createDimension("x", 32)
+        obs.createVariable("I05", "f4", ("y", "x"))[:] = rng.uniform(7.0, 11.0, (32, 32))
+
+
+class TestPipelineRunner(unittest.TestCase):
+
+    def test_orden_y_tiempos(self):
+        orden = []
+        p = pipeline.Pipeline()
+        p.add("a", lambda: orden.append("a"))
+        p.add("b", lambda: orden.append("b"), deps=["a"])
+        p.add("c", lambda: orden.append("c"), deps=["a"])
+        p.add("d", lambda: orden.append("d"), deps=["b", "c"])
+
+        report = p.run()
+
+        self.assertEqual(orden[0], "a")
+        self.assertEqual(orden[-1], "d")
+        self.assertTrue(all(info["status"] == "ok" for info in report.values()))
+        self.assertTrue(all(info["seconds"] >= 0 for info in report.values()))
+
+    def test_ramas_en_paralelo(self):
+        barrera = threading.Barrier(2, timeout=5)
+        p = pipeline.Pipeline()
+        # Las dos ramas sólo terminan si se ejecutan a la vez
+        p.add("sitio1", barrera.wait)
+        p.add("sitio2", barrera.wait)
+
+        report = p.run(max_workers=2)
+
+        self.assertEqual({info["status"] for info in report.values()}, {"ok"})
+
+    def test_fallo_salta_dependientes(self):
+        def falla():
+            raise RuntimeError("boom")
+
+        p = pipeline.Pipeline()
+        p.add("bt", falla)
+        p.add("frp", lambda: 1, deps=["bt"])
+        p.add("otro", lambda: 2)
+
+        with patch("builtins.print"):
+            report = p.run()
+
+        self.assertEqual(report["bt"]["status"], "failed")
+        self.assertEqual(report["frp"]["status"], "skipped")
+        self.assertEqual(report["otro"]["result"], 2)
+
+    def test_dependencia_desconocida(self):
+        with self.assertRaises(ValueError):
+            pipeline.Pipeline().add("bt", print, deps=["download"])
+
+
+class TestDailyPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp = Path(self.tmp.name)
+        self.patches = [
+            patch.object(stages, "raw_dir", tmp / "raw"),
+            patch.object(stages, "processed_dir", tmp / "processed"),
+            patch.object(stages, "catalog_dir", tmp),
+        ]
+        for p in self.patches:
+            p.start()
+        self.day = datetime(2025, 5, 3)
+        self.state = tmp / "state.json"
+        crear_granulo(tmp / "raw" / "La_Palma" / "2025_123" / "VJ102IMG.A2025123.0142.021.nc")
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.tmp.cleanup()
+
+    def test_bt_ref_frp_en_proceso(self):
+        p = pipeline.build_daily_pipeline(["La_Palma"], self.day, download_data=False, state_file=self.state)
+        self.assertEqual(list(p.stages), ["bt:La_Palma", "ref:La_Palma", "frp:La_Palma"])
+
+        with patch("builtins.print"):
+            report = p.run()
+
+        self.assertEqual({name: info["status"] for name, info in report.items()},
+                         {"bt:La_Palma": "ok", "ref:La_Palma": "ok", "frp:La_Palma": "ok"})
+
+        bt_file = stages.bt_monthly_path("La_Palma", 2025, 5)
+        self.assertEqual(report["bt:La_Palma"]["result"], bt_file)
+        lat, lon = sites.site_grid("La_Palma")
+        with xr.open_dataset(bt_file) as ds:
+            # Escena remuestreada a la malla fija del sitio
+            self.assertEqual(ds["BT_I05"].shape, (1, lat.size, lon.size))
+            self.assertTrue(280 < float(ds["BT_I05"].mean()) < 320)
+
+        self.assertTrue(stages.ref_path("La_Palma", 2025, 5).exists())
+        with xr.open_dataset(stages.frp_path("La_Palma")) as frp:
+            self.assertEqual(frp.sizes["time"], 1)
+            self.assertGreater(float(frp["FRP"][0]), 0)
+
+        # Segunda ejecución del mismo día sin datos nuevos: no se recalcula nada
+        with patch("builtins.print"):
+            report = pipeline.build_daily_pipeline(["La_Palma"], self.day, download_data=False,
+                                                   state_file=self.state).run()
+        self.assertEqual({info["status"] for info in report.values()}, {"cached"})
+
+    def test_bt_idempotente(self):
+        with patch("builtins.print"):
+            stages.bt_daily("La_Palma", self.day)
+            stages.bt_daily("La_Palma", self.day)
+
+        with xr.open_dataset(stages.bt_monthly_path("La_Palma", 2025, 5)) as ds:
+            self.assertEqual(ds.sizes["time"], 1)
+
+    def test_ref_incremental(self):
+        dia2 = datetime(2025, 5, 4)
+        crear_granulo(Path(self.tmp.name) / "raw" / "La_Palma" / "2025_124" / "VJ102IMG.A2025124.0130.021.nc", seed=1)
+
+        with patch("builtins.print"):
+            stages.bt_daily("La_Palma", self.day)
+            stages.ref_monthly("La_Palma", self.day)
+            stages.bt_daily("La_Palma", dia2)
+            # La segunda vez sólo se lee la escena nueva del cubo
+            with patch.object(stages.RefAccumulator, "add_batch", autospec=True,
+                              side_effect=stages.RefAccumulator.add_batch) as sumar:
+                stages.ref_monthly("La_Palma", dia2)
+
+        self.assertEqual(sumar.call_count, 1)
+        self.assertEqual(list(sumar.call_args[0][2]), ["2025-05-04"])
+        acc = stages.RefAccumulator.load(stages.accumulator_path("La_Palma", 2025, 5))
+        self.assertEqual(acc.used_scenes, ["2025-05-03", "2025-05-04"])
+
+        # Tabla de aceptación con una fila por escena
+        tabla = pd.read_csv(stages.scene_table_path("La_Palma", 2025, 5), index_col="date")
+        self.assertEqual(list(tabla.index), ["2025-05-03", "2025-05-04"])
+        self.assertTrue(tabla["accepted"].all())
+
+        # Reconstrucción del mes completo en un solo lote: mismo resultado
+        with xr.open_dataset(stages.ref_path("La_Palma", 2025, 5)) as ref:
+            incremental = ref["brightness_temperature_REF"].values
+        with patch("builtins.print"):
+            stages.ref_monthly("La_Palma", dia2, rebuild=True)
+        with xr.open_dataset(stages.ref_path("La_Palma", 2025, 5)) as ref:
+            np.testing.assert_allclose(ref["brightness_temperature_REF"].values, incremental, rtol=1e-6)
+
+        with xr.open_dataset(stages.ref_path("La_Palma", 2025, 5)) as ref:
+            self.assertEqual(int(ref["scene_count"].max()), 2)
+            self.assertEqual(ref.attrs["used_scenes"], "2025-05-03, 2025-05-04")
+
+    def test_ref_con_escena_reingestada(self):
+        granulo = Path(self.tmp.name) / "raw" / "La_Palma" / "2025_123" / "VJ102IMG.A2025123.0142.021.nc"
+        with patch("builtins.print"):
+            stages.bt_daily("La_Palma", self.day)
+            stages.ref_monthly("La_Palma", self.day)
+        with xr.open_dataset(stages.ref_path("La_Palma", 2025, 5)) as ref:
+            antes = ref["brightness_temperature_REF"].values
+
+        # El mismo día se vuelve a ingerir con otro gránulo: el REF no puede quedarse con la escena vieja
+        crear_granulo(granulo, seed=7)
+        with patch("builtins.print"):
+            stages.bt_daily("La_Palma", self.day)
+            stages.ref_monthly("La_Palma", self.day)
+        with xr.open_dataset(stages.ref_path("La_Palma", 2025, 5)) as ref:
+            despues = ref["brightness_temperature_REF"].values
+            self.assertEqual(int(ref["scene_count"].max()), 1)
+        self.assertFalse(np.allclose(antes, despues, equal_nan=True))
+
+        with patch("builtins.print"):
+            stages.ref_monthly("La_Palma", self.day, rebuild=True)
+        with xr.open_dataset(stages.ref_path("La_Palma", 2025, 5)) as ref:
+            np.testing.assert_allclose(ref["brightness_temperature_REF"].values, despues, rtol=1e-6)
+
+    def test_recorte_a_la_ventana_del_sitio(self):
+        # Gránulo que cubre todo Canarias: sólo se guarda la ventana de La Palma
+        granulo = Path(self.tmp.name) / "canarias.nc"
+        with Dataset(granulo, "w") as nc:
+            nc.setncattr("SouthBoundingCoordinate", 27.0)
+            nc.setncattr("NorthBoundingCoordinate", 30.0)
+            nc.setncattr("WestBoundingCoordinate", -18.5)
+            nc.setncattr("EastBoundingCoordinate", -13.0)
+            obs = nc.createGroup("observation_data")
+            obs.createDimension("y", 300)
+            obs.createDimension("x", 550)
+            obs.createVariable("I05", "f4", ("y", "x"))[:] = np.full((300, 550), 9.0)
+
+        window = sites.crop_window("La_Palma")
+        da = stages.process_to_monthly(granulo, self.day, window)
+
+        self.assertLess(da.size, 300 * 550 / 100)
+        self.assertTrue(((da["latitude"] >= window["lat_min"]) & (da["latitude"] <= window["lat_max"])).all())
+        self.assertTrue(((da["longitude"] >= window["lon_min"]) & (da["longitude"] <= window["lon_max"])).all())
+        # La ventana contiene las regiones del REF y del FRP
+        for roi in (sites.SITES["La_Palma"]["ref_roi"], sites.SITES["La_Palma"]["frp_roi"]):
+            self.assertLessEqual(window["lat_min"], roi["lat_min"])
+            self.assertGreaterEqual(window["lon_max"], roi["lon_max"])
+
+        # Ventana fuera del gránulo
+        lejos = {"lat_min": 40.0, "lat_max": 41.0, "lon_min": 0.0, "lon_max": 1.0}
+        self.assertIsNone(stages.process_to_monthly(granulo, self.day, lejos))
+
+    def test_sitio_sin_frp(self):
+        p = pipeline.build_daily_pipeline(["Lanzarote"], self.day, download_data=False, state_file=None)
+        self.assertNotIn("frp:Lanzarote", p.stages)
+
+
+class TestIncrementalPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.state = self.root / "state.json"
+        self.src = self.root / "src.txt"
+        self.mid = self.root / "mid.txt"
+        self.out = self.root / "out.txt"
+        self.src.write_text("1")
+        self.calls = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def copiar(self, src, dst, nombre):
+        self.calls.append(nombre)
+        dst.write_text(src.read_text())
+        return dst
+
+    def construir(self, param="a"):
+        p = pipeline.Pipeline(self.state)
+        p.add("paso1", self.copiar, self.src, self.mid, "paso1", inputs=[self.src], outputs=[self.mid])
+        p.add("paso2", self.copiar, self.mid, self.out, param, inputs=[self.mid], outputs=[self.out],
+              deps=["paso1"])
+        return p
+
+    def ejecutar(self, **kwargs):
+        with patch("builtins.print"):
+            report = self.construir(**kwargs).run()
+        return {name: info["status"] for name, info in report.items()}
+
+    def test_ejecucion_sin_cambios(self):
+        self.assertEqual(self.ejecutar(), {"paso1": "ok", "paso2": "ok"})
+        self.calls.clear()
+
+        start = time.perf_counter()
+        self.assertEqual(self.ejecutar(), {"paso1": "cached", "paso2": "cached"})
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(self.calls, [])
+
+    def test_entrada_modificada(self):
+        self.ejecutar()
+        self.src.write_text("2")
+
+        self.assertEqual(self.ejecutar(), {"paso1": "ok", "paso2": "ok"})
+        self.assertEqual(self.out.read_text(), "2")
+
+    def test_mismo_contenido_nueva_fecha(self):
+        self.ejecutar()
+        # Se reescribe con el mismo contenido: el hash decide que no ha cambiado
+        st = self.src.stat()
+        os.utime(self.src, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+        self.assertEqual(self.ejecutar(), {"paso1": "cached", "paso2": "cached"})
+
+    def test_parametros_y_salidas(self):
+        self.ejecutar()
+        self.assertEqual(self.ejecutar(param="b"), {"paso1": "cached", "paso2": "ok"})
+
+        self.out.unlink()
+        self.assertEqual(self.ejecutar(param="b"), {"paso1": "cached", "paso2": "ok"})
+
+    def test_etapa_sin_cache(self):
+        def construir():
+            p = pipeline.Pipeline(self.state)
+            p.add("descarga", self.copiar, self.src, self.mid, "descarga", outputs=[self.mid], cacheable=False)
+            p.add("paso2", self.copiar, self.mid, self.out, "paso2", inputs=[self.mid], outputs=[self.out],
+                  deps=["descarga"])
+            return p
+
+        for esperado in ({"descarga": "ok", "paso2": "ok"}, {"descarga": "ok", "paso2": "cached"}):
+            with patch("builtins.print"):
+                report = construir().run()
+            self.assertEqual({name: info["status"] for name, info in report.items()}, esperado)
+
+    def test_etapa_con_sonda(self):
+        listado = ["v1"]
+
+        def sonda():
+            if listado[0] is None:
+                raise ConnectionError("sin red")
+            return listado[0]
+
+        def construir():
+            p = pipeline.Pipeline(self.state)
+            p.add("descarga", self.copiar, self.src, self.mid, "descarga", outputs=[self.mid], probe=sonda)
+            p.add("paso2", self.copiar, self.mid, self.out, "paso2", inputs=[self.mid], outputs=[self.out],
+                  deps=["descarga"])
+            return p
+
+        # Mismo listado remoto: nada se vuelve a ejecutar; listado nuevo o sin red: la descarga se repite
+        for valor, esperado in (("v1", "ok"), ("v1", "cached"), ("v2", "ok"), ("v2", "cached"), (None, "ok"),
+                                ("v2", "ok")):
+            listado[0] = valor
+            with patch("builtins.print"):
+                report = construir().run()
+            self.assertEqual(report["descarga"]["status"], esperado)
+
+        # La descarga del pipeline diario compara el listado del día en LAADS, sin bajar gránulos
+        diario = pipeline.build_daily_pipeline(["La_Palma"], datetime(2025, 5, 3), state_file=self.state)
+        with patch.object(pipeline.download, "huella_listado", return_value="abc") as huella:
+            self.assertEqual(diario.stages["download"].probe(), "abc")
+        huella.assert_called_once_with("2025", "123")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import sys
+from pathlib import Path
+
+# Raíz del proyecto: este test está en A03_tests/
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
+
+from A01_source.B01_1_download import prefilter
+
+
+def cubre_la_palma(sur, norte, este, oeste):
+    return sur <= 28.625 and norte >= 28.601 and oeste <= -17.872 and este >= -17.929
+
+
+GEOMETA = """# (c) 2025 NASA LAADS DAAC
+# GranuleID,StartDateTime,ArchiveSet,OrbitNumber,DayNightFlag,EastBoundingCoord,NorthBoundingCoord,SouthBoundingCoord,WestBoundingCoord
+VJ103IMG.A2025123.0142.021.2025123080000.nc,2025-05-03 01:42,5201,38000,N,-10.0,35.0,20.0,-25.0
+VJ103IMG.A2025123.0148.021.2025123080000.nc,2025-05-03 01:48,5201,38000,N,5.0,45.0,35.0,-10.0
+VJ103IMG.A2025123.1424.021.2025123200000.nc,2025-05-03 14:24,5201,38007,D,-10.0,35.0,20.0,-25.0
+"""
+
+
+class TestPrefilter(unittest.TestCase):
+
+    def test_clave_granulo(self):
+        self.assertEqual(prefilter.clave_granulo("VJ102IMG.A2025123.0142.021.2025123093512.nc"), "A2025123.0142")
+        self.assertIsNone(prefilter.clave_granulo("otro_fichero.nc"))
+
+    def test_leer_geometa(self):
+        table = prefilter.leer_geometa(GEOMETA)
+
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table["A2025123.0142"]["flag"], "Night")
+        self.assertEqual(table["A2025123.1424"]["flag"], "Day")
+        self.assertEqual(table["A2025123.0148"]["sur"], 35.0)
+
+    def test_filtrar_candidatos_con_geometa(self):
+        entries = [
+            {"name": f"VJ102IMG.A2025123.{hhmm}.021.2025123093512.nc",
+             "downloadsLink": f"https://fake/VJ102IMG.A2025123.{hhmm}.021.2025123093512.nc"}
+            for hhmm in ("0142", "0148", "1424", "2000")
+        ]
+
+        candidatos, descartados = prefilter.filtrar_candidatos(
+            entries, cubre_la_palma, prefilter.leer_geometa(GEOMETA))
+
+        # 0142: noche sobre La Palma; 2000: sin metadatos -> se mantiene para la comprobación final
+        self.assertEqual([prefilter.clave_granulo(e["name"]) for e in candidatos],
+                         ["A2025123.0142", "A2025123.2000"])
+        self.assertEqual(len(descartados), 2)
+
+    def test_metadatos_de_listado_prioritarios(self):
+        entry = {"name": "VJ102IMG.A2025123.0142.021.nc", "illumination": "D"}
+
+        candidatos, descartados = prefilter.filtrar_candidatos(
+            [entry], cubre_la_palma, prefilter.leer_geometa(GEOMETA))
+
+        self.assertEqual(candidatos, [])
+        self.assertEqual(descartados, [entry])
+
+
+if __name__ == "__main__":
+    unittest.main()
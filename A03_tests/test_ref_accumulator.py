@@ -0,0 +1,129 @@
+import unittest
+import sys
+import tempfile
+import warnings
+import numpy as np
+from pathlib import Path
+
+# Raíz del proyecto: este test está en A03_tests/
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
+
+from A01_source.B01_3_processing import ref_accumulator as acumulador
+from A01_source.B01_3_processing.ref_accumulator import RefAccumulator
+
+
+class TestRefAccumulator(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.escenas = rng.normal(290, 5, (12, 6, 8))
+        # Huecos (nubes, bordes del swath) distintos en cada escena
+        self.escenas[rng.random(self.escenas.shape) < 0.2] = np.nan
+        self.escenas[:, 0, 0] = np.nan  # Píxel sin ningún dato
+        self.lat = np.linspace(28.7, 28.5, 6)
+        self.lon = np.linspace(-17.9, -17.7, 8)
+
+    def acumular(self, escenas):
+        acc = RefAccumulator(self.lat, self.lon)
+        for i, escena in enumerate(escenas):
+            acc.add(escena, f"2025-05-{i + 1:02d}")
+        return acc
+
+    def test_igual_que_apilar(self):
+        ref = self.acumular(self.escenas).materialize()
+
+        # Resultado de apilar todas las escenas (NaN en el píxel sin datos)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            esperado = {"REF": np.nanmean(self.escenas, axis=0), "std": np.nanstd(self.escenas, axis=0),
+                        "min": np.nanmin(self.escenas, axis=0), "max": np.nanmax(self.escenas, axis=0)}
+
+        for nombre, valores in esperado.items():
+            np.testing.assert_allclose(ref[f"brightness_temperature_{nombre}"], valores, rtol=1e-5)
+        np.testing.assert_array_equal(ref["scene_count"], np.isfinite(self.escenas).sum(axis=0))
+        self.assertTrue(np.isnan(ref["brightness_temperature_REF"][0, 0]))
+
+    def test_escenas_descartadas(self):
+        acc = self.acumular(self.escenas[:3])
+        acc.add(np.full((6, 8), 150.0), "2025-05-04", accepted=False)
+
+        self.assertIn("2025-05-04", acc.scenes)
+        self.assertEqual(acc.used_scenes, ["2025-05-01", "2025-05-02", "2025-05-03"])
+        self.assertGreater(float(acc.materialize()["brightness_temperature_min"].min()), 250)
+
+    def test_estadisticos_robustos(self):
+        rng = np.random.default_rng(2)
+        escenas = rng.normal(290, 2, (200, 6, 8))
+        # Un 10 % de píxeles contaminados por nubes (mucho más fríos)
+        escenas[rng.random(escenas.shape) < 0.10] = 230.0
+        ref = self.acumular(escenas).materialize(percentiles=(25, 75))
+
+        paso = acumulador.hist_step
+        for q, nombre in ((50, "median"), (25, "p25"), (75, "p75")):
+            np.testing.assert_allclose(ref[f"brightness_temperature_{nombre}"],
+                                       np.percentile(escenas, q, axis=0), atol=2 * paso)
+        # La media recortada no se deja arrastrar por las nubes; la media simple sí
+        self.assertLess(float(np.abs(ref["brightness_temperature_clipped"] - 290).max()), 0.5)
+        self.assertGreater(float(np.abs(ref["brightness_temperature_REF"] - 290).min()), 2)
+
+    def test_lote_igual_que_escena_a_escena(self):
+        fechas = [f"2025-05-{i + 1:02d}" for i in range(len(self.escenas))]
+        aceptadas = np.arange(len(self.escenas)) % 4 != 0
+        uno_a_uno = RefAccumulator(self.lat, self.lon)
+        for escena, fecha, ok in zip(self.escenas, fechas, aceptadas):
+            uno_a_uno.add(escena, fecha, ok)
+
+        lotes = RefAccumulator(self.lat, self.lon)
+        lotes.add_batch(self.escenas[:5], fechas[:5], aceptadas[:5])
+        lotes.add_batch(self.escenas[5:], fechas[5:], aceptadas[5:])
+
+        self.assertEqual(lotes.scenes, uno_a_uno.scenes)
+        for nombre in ("count", "mean", "m2", "min", "max", "hist"):
+            np.testing.assert_allclose(getattr(lotes, nombre), getattr(uno_a_uno, nombre))
+
+    def test_filtro_de_escenas(self):
+        escenas = np.stack([self.escenas[1],                # buena
+                            np.full((6, 8), 290.0),          # sin variación
+                            np.where(self.escenas[2] > 285, self.escenas[2], 200.0)])  # nubes frías
+        tabla = acumulador.scene_quality(escenas, ["2025-05-01", "2025-05-02", "2025-05-03"])
+
+        self.assertEqual(list(tabla.columns), ["min", "std", "valid_fraction", "accepted"])
+        self.assertEqual(tabla["accepted"].tolist(), [True, False, False])
+        self.assertAlmostEqual(tabla.loc["2025-05-02", "valid_fraction"], 1.0)
+
+    def test_guardar_y_continuar(self):
+        # Acumular en dos ejecuciones (estado en disco) da lo mismo que en una
+        with tempfile.TemporaryDirectory() as tmp:
+            estado = Path(tmp) / "Acc_2025_05.npz"
+            self.acumular(self.escenas[:5]).save(estado)
+
+            acc = RefAccumulator.load(estado)
+            for i, escena in enumerate(self.escenas[5:], start=5):
+                acc.add(escena, f"2025-05-{i + 1:02d}")
+
+        completo = self.acumular(self.escenas)
+        self.assertEqual(acc.scenes, completo.scenes)
+        for nombre in ("count", "mean", "m2", "min", "max"):
+            np.testing.assert_allclose(getattr(acc, nombre), getattr(completo, nombre))
+        np.testing.assert_array_equal(acc.hist, completo.hist)
+
+    def test_sin_histogramas(self):
+        # Sin histogramas: solo los momentos, y el estado guardado sigue sin ellos
+        acc = RefAccumulator(self.lat, self.lon, robust=False)
+        acc.add_batch(self.escenas, [f"2025-05-{i + 1:02d}" for i in range(len(self.escenas))])
+        self.assertIsNone(acc.hist)
+        ref = acc.materialize()
+        self.assertNotIn("brightness_temperature_median", ref)
+        np.testing.assert_allclose(ref["brightness_temperature_REF"],
+                                   self.acumular(self.escenas).materialize()["brightness_temperature_REF"], rtol=1e-6)
+        with self.assertRaises(ValueError):
+            acc.quantile(50)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            acc.save(Path(tmp) / "Acc.npz")
+            self.assertFalse(RefAccumulator.load(Path(tmp) / "Acc.npz").robust)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import sys
+import json
+import tempfile
+import importlib.util
+import numpy as np
+import xarray as xr
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+from netCDF4 import Dataset
+
+# Raíz del proyecto: este test está en A03_tests/
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
+
+module_path = project_root / "A01_source" / "B01_3_processing" / "Historic" / "REF" / "REF_historico.py"
+spec = importlib.util.spec_from_file_location("REF_historico", module_path)
+ref_historico = importlib.util.module_from_spec(spec)
+sys.modules["REF_historico"] = ref_historico
+spec.loader.exec_module(ref_historico)
+
+
+def crear_bt_diario(base, dia, seed, frio=False):
+    """BT diario como los de BT_historico (latitud y longitud 2-D) sobre Lanzarote."""
+    rng = np.random.default_rng(seed)
+    carpeta = base / dia.strftime("%Y_%j")
+    carpeta.mkdir(parents=True, exist_ok=True)
+    lat = np.linspace(29.10, 28.85, 80)
+    lon = np.linspace(-13.85, -13.60, 90)
+    lon_grid, lat_grid = np.meshgrid(lon, lat)
+    bt = rng.normal(200 if frio else 295, 6, lat_grid.shape)
+    with Dataset(carpeta / f"BT_LaPalma_VJ102IMG_{dia:%Y_%j}.nc", "w") as nc:
+        nc.createDimension("rows", lat.size)
+        nc.createDimension("cols", lon.size)
+        nc.createVariable("BT_I05", "f4", ("rows", "cols"))[:] = bt
+        nc.createVariable("latitude", "f4", ("rows", "cols"))[:] = lat_grid
+        nc.createVariable("longitude", "f4", ("rows", "cols"))[:] = lon_grid
+
+
+class TestRefBackfill(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base = Path(self.tmp.name) / "BT_daily_pixels"
+        self.salida = Path(self.tmp.name) / "REF"
+        # Enero y marzo con datos (un día nublado en enero); febrero vacío
+        for i in range(4):
+            crear_bt_diario(self.base, datetime(2025, 1, 10) + timedelta(days=i), seed=i, frio=(i == 3))
+            crear_bt_diario(self.base, datetime(2025, 3, 2) + timedelta(days=i), seed=10 + i)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_meses_en_paralelo(self):
+        with patch("builtins.print"):
+            manifiesto = ref_historico.backfill(datetime(2025, 1, 1), datetime(2025, 3, 31), "Lanzarote",
+                                                max_workers=2, base_path=self.base, output_dir=self.salida)
+
+        self.assertEqual({mes: e["status"] for mes, e in manifiesto.items()},
+                         {"2025-01": "ok", "2025-02": "skipped", "2025-03": "ok"})
+        self.assertEqual(len(manifiesto["2025-01"]["used"]), 3)
+        self.assertEqual(manifiesto["2025-03"]["scenes"], 4)
+        with open(self.salida / "_backfill_manifest.json") as f:
+            self.assertEqual(json.load(f), manifiesto)
+
+        # Sin temporales a medio escribir y un único plan de remuestreo para todos los meses
+        self.assertEqual(sorted(f.name for f in self.salida.glob("*.nc")), ["Ref_2025_01.nc", "Ref_2025_03.nc"])
+        self.assertEqual(len(list((self.salida / "_plans").glob("plan_*.npz"))), 1)
+        with xr.open_dataset(self.salida / "Ref_2025_03.nc") as ref:
+            self.assertTrue(280 < float(ref["brightness_temperature_REF"].mean()) < 310)
+
+    def test_extension_malla(self):
+        with patch("builtins.print"):
+            manifiesto = ref_historico.backfill(datetime(2025, 3, 1), datetime(2025, 3, 31), "Lanzarote",
+                                                max_workers=1, base_path=self.base, output_dir=self.salida,
+                                                extension="malla")
+        self.assertEqual(manifiesto["2025-03"]["status"], "ok")
+
+        # Toda la malla fija del sitio (más que la ROI), con mediana y percentiles
+        grid_lat, grid_lon = ref_historico.site_grid("Lanzarote")
+        with xr.open_dataset(self.salida / "Ref_2025_03.nc") as ref:
+            self.assertEqual(ref.sizes["latitude"], grid_lat.size)
+            self.assertEqual(ref.sizes["longitude"], grid_lon.size)
+            self.assertIn("brightness_temperature_median", ref)
+
+        with self.assertRaises(ValueError):
+            ref_historico.caja_ref("Lanzarote", "mundo")
+
+    def test_archivos_por_mes(self):
+        meses = ref_historico.meses_entre(datetime(2024, 12, 15), datetime(2025, 3, 1))
+        self.assertEqual(meses, [(2024, 12), (2025, 1), (2025, 2), (2025, 3)])
+
+        por_mes = ref_historico.archivos_por_mes(self.base, meses)
+        self.assertEqual([len(por_mes[m]) for m in meses], [0, 4, 0, 4])
+
+
+if __name__ == "__main__":
+    unittest.main()
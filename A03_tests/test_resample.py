@@ -0,0 +1,199 @@
+import unittest
+import sys
+import tempfile
+import importlib.util
+import numpy as np
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+from netCDF4 import Dataset
+
+# Raíz del proyecto: este test está en A03_tests/
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
+
+from A01_source.B01_3_processing import archive, resample, stages
+from A02_utils import sites
+
+module_path = project_root / "A01_source" / "B01_3_processing" / "Historic" / "BT" / "BT_historico.py"
+spec = importlib.util.spec_from_file_location("BT_historico", module_path)
+bt_historico = importlib.util.module_from_spec(spec)
+sys.modules["BT_historico"] = bt_historico
+spec.loader.exec_module(bt_historico)
+
+
+def swath_girado(n=400, angulo=12.0):
+    """Geolocalización de un swath girado `angulo` grados sobre La Palma (no es una malla lat/lon)."""
+    fila, col = np.meshgrid(np.arange(n), np.arange(n), indexing="ij")
+    theta = np.deg2rad(angulo)
+    dy, dx = (fila - n / 2) * 0.003, (col - n / 2) * 0.003
+    lat = 28.65 - (dy * np.cos(theta) - dx * np.sin(theta))
+    lon = -17.85 + (dy * np.sin(theta) + dx * np.cos(theta))
+    return lat, lon
+
+
+class TestResample(unittest.TestCase):
+
+    def test_ventana_del_swath(self):
+        lat, lon = swath_girado()
+        window = sites.crop_window("La_Palma")
+        rows, cols = resample.find_window(lat, lon, window)
+
+        # Todos los píxeles dentro de la ventana quedan dentro del recorte
+        dentro = ((lat >= window["lat_min"]) & (lat <= window["lat_max"]) &
+                  (lon >= window["lon_min"]) & (lon <= window["lon_max"]))
+        recorte = np.zeros_like(dentro)
+        recorte[rows, cols] = True
+        self.assertTrue(recorte[dentro].all())
+
+        lejos = {"lat_min": 40.0, "lat_max": 41.0, "lon_min": 0.0, "lon_max": 1.0}
+        self.assertIsNone(resample.find_window(lat, lon, lejos))
+
+    def test_vecino_mas_cercano(self):
+        lat, lon = swath_girado()
+        # Valor de cada píxel = su propia latitud: tras remuestrear debe coincidir con la malla
+        grid_lat, grid_lon = sites.site_grid("La_Palma")
+        index, valid = resample.nearest_lookup(lat, lon, grid_lat, grid_lon)
+        gridded = resample.apply_lookup(lat, index, valid)
+
+        self.assertEqual(gridded.shape, (grid_lat.size, grid_lon.size))
+        self.assertTrue(valid.any())
+        error = np.abs(gridded - grid_lat[:, None])[valid]
+        self.assertLess(error.max(), 0.003)
+
+    def test_celdas_sin_datos(self):
+        # Swath que sólo cubre la mitad oeste de la malla
+        grid_lat, grid_lon = sites.site_grid("Teide")
+        lat, lon = np.meshgrid(grid_lat, grid_lon[:grid_lon.size // 2], indexing="ij")
+        index, valid = resample.nearest_lookup(lat, lon, grid_lat, grid_lon)
+
+        self.assertTrue(valid[:, :grid_lon.size // 2].all())
+        self.assertFalse(valid[:, -5:].any())
+        self.assertTrue(np.isnan(resample.apply_lookup(np.ones(lat.shape), index, valid)[:, -5:]).all())
+
+
+class TestResamplingPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.plan_dir = Path(self.tmp.name) / "_plans"
+        self.grid_lat, self.grid_lon = sites.site_grid("La_Palma")
+        self.roi = sites.SITES["La_Palma"]["ref_roi"]
+        resample._plans.clear()
+
+    def tearDown(self):
+        resample._plans.clear()
+        self.tmp.cleanup()
+
+    def test_escena_en_la_malla(self):
+        plan = resample.load_plan(self.plan_dir, self.grid_lat, self.grid_lon, self.grid_lat, self.grid_lon, self.roi)
+        escena = np.add.outer(np.arange(self.grid_lat.size), np.arange(self.grid_lon.size) / 1000)
+
+        caja = resample.apply_plan(escena, plan)
+
+        # La caja es el recorte de la ROI, sin interpolar nada
+        self.assertTrue(plan["valid"].all())
+        self.assertTrue(plan["mask"].all())
+        np.testing.assert_allclose(caja, escena[np.ix_(plan["rows"], plan["cols"])])
+        self.assertTrue((plan["latitude"] >= self.roi["lat_min"]).all())
+        self.assertTrue((plan["longitude"] <= self.roi["lon_max"]).all())
+
+    def test_plan_en_disco_y_reutilizado(self):
+        # Escena antigua (malla de la caja del gránulo, más gruesa y con relleno NaN)
+        src_lat = np.append(np.linspace(28.70, 28.50, 40), np.nan)
+        src_lon = np.linspace(-17.95, -17.65, 50)
+
+        with patch.object(resample, "build_plan", wraps=resample.build_plan) as construir:
+            plan = resample.load_plan(self.plan_dir, src_lat, src_lon, self.grid_lat, self.grid_lon, self.roi)
+            resample.load_plan(self.plan_dir, src_lat, src_lon, self.grid_lat, self.grid_lon, self.roi)
+            self.assertEqual(construir.call_count, 1)
+            self.assertEqual(len(list(self.plan_dir.glob("plan_*.npz"))), 1)
+
+            # Otro proceso (caché en memoria vacía) lee el plan guardado
+            resample._plans.clear()
+            guardado = resample.load_plan(self.plan_dir, src_lat, src_lon, self.grid_lat, self.grid_lon, self.roi)
+            self.assertEqual(construir.call_count, 1)
+
+        for nombre in plan:
+            np.testing.assert_array_equal(plan[nombre], guardado[nombre])
+        # Cada celda toma el píxel más cercano y nunca la fila de relleno
+        self.assertLess(np.abs(src_lat[plan["rows"]] - plan["latitude"]).max(), 0.003)
+        self.assertLess(np.abs(src_lon[plan["cols"]] - plan["longitude"]).max(), 0.004)
+
+    def test_roi_fuera_de_la_malla(self):
+        lejos = {"lat_min": 40.0, "lat_max": 41.0, "lon_min": 0.0, "lon_max": 1.0}
+        with self.assertRaises(ValueError):
+            resample.build_plan(self.grid_lat, self.grid_lon, self.grid_lat, self.grid_lon, lejos)
+
+
+class TestProcessToGrid(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        folder = Path(self.tmp.name)
+        self.lat, self.lon = swath_girado()
+        self.bt_file = folder / "VJ102IMG.A2025123.0142.021.2025123093000.nc"
+        self.geo_file = folder / "VJ103IMG.A2025123.0142.021.2025123090000.nc"
+
+        with Dataset(self.bt_file, "w") as nc:
+            nc.setncattr("SouthBoundingCoordinate", float(self.lat.min()))
+            nc.setncattr("NorthBoundingCoordinate", float(self.lat.max()))
+            nc.setncattr("WestBoundingCoordinate", float(self.lon.min()))
+            nc.setncattr("EastBoundingCoordinate", float(self.lon.max()))
+            obs = nc.createGroup("observation_data")
+            obs.createDimension("y", self.lat.shape[0])
+            obs.createDimension("x", self.lat.shape[1])
+            # Radiancia creciente hacia el norte
+            obs.createVariable("I05", "f4", ("y", "x"))[:] = 7.0 + (self.lat - 28.0) * 2
+
+        with Dataset(self.geo_file, "w") as nc:
+            geo = nc.createGroup("geolocation_data")
+            geo.createDimension("y", self.lat.shape[0])
+            geo.createDimension("x", self.lat.shape[1])
+            geo.createVariable("latitude", "f4", ("y", "x"))[:] = self.lat
+            geo.createVariable("longitude", "f4", ("y", "x"))[:] = self.lon
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_fichero_de_geolocalizacion(self):
+        self.assertEqual(stages.geolocation_file(self.bt_file), self.geo_file)
+        self.geo_file.unlink()
+        self.assertIsNone(stages.geolocation_file(self.bt_file))
+
+    def test_malla_fija_con_geolocalizacion_real(self):
+        day = datetime(2025, 5, 3)
+        da = stages.process_to_grid(self.bt_file, day, "La_Palma", self.geo_file)
+        grid_lat, grid_lon = sites.site_grid("La_Palma")
+
+        self.assertEqual(da.shape, (1, grid_lat.size, grid_lon.size))
+        np.testing.assert_array_equal(da["latitude"].values, grid_lat)
+        np.testing.assert_array_equal(da["longitude"].values, grid_lon)
+
+        # Con la geolocalización real el gradiente norte-sur se conserva en la malla
+        perfil = np.nanmean(da.values[0], axis=1)
+        self.assertTrue(np.all(np.diff(perfil[np.isfinite(perfil)]) < 0))
+
+        # Sin geolocalización se usa la caja del gránulo, pero la malla es la misma
+        da_caja = stages.process_to_grid(self.bt_file, day, "La_Palma")
+        self.assertEqual(da_caja.shape, da.shape)
+
+    def test_bt_historico_en_la_malla(self):
+        salida = Path(self.tmp.name) / "BT_daily_pixels"
+        with patch("builtins.print"):
+            guardado = bt_historico.process_nc_file(self.bt_file, salida, "La_Palma")
+        self.assertEqual(guardado, salida / "2025_123" / "BT_LaPalma_VJ102IMG_2025_123.nc")
+
+        # Mismos valores que la etapa diaria, en la malla fija y legibles por el archivo BT
+        esperado = stages.process_to_grid(self.bt_file, datetime(2025, 5, 3), "La_Palma", self.geo_file)
+        escenas = archive.open_bt("La_Palma", base_path=salida, layout="daily")
+        grid_lat, grid_lon = sites.site_grid("La_Palma")
+        np.testing.assert_allclose(escenas["latitude"].values[0], grid_lat, rtol=1e-6)
+        np.testing.assert_allclose(escenas["longitude"].values[0], grid_lon, rtol=1e-6)
+        np.testing.assert_allclose(escenas["BT_I05"].values[0], esperado.values[0], rtol=1e-6)
+        with Dataset(guardado) as nc:
+            self.assertEqual(nc.geolocation_file, self.geo_file.name)
+
+
+if __name__ == "__main__":
+    unittest.main()
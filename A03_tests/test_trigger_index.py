@@ -0,0 +1,116 @@
+import unittest
+import sys
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# Raíz del proyecto: este test está en A03_tests/
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
+
+from A01_source.B01_4_eq_processing import trigger
+
+CENTRO = (64.12583485520874, -21.801875984550193)
+
+
+def indice_fila_a_fila(df, lat1, lon1, L_method="Singh"):
+    """Cálculo original, un evento cada vez."""
+    filas = []
+    for _, row in df.iterrows():
+        if L_method == "Singh":
+            L = np.sqrt(10**(row["magnitude"] - 4))
+        else:
+            L = 10**(0.5 * row["magnitude"] - 1.85)
+        la1, lo1, la2, lo2 = map(np.radians, [lat1, lon1, row["latitude"], row["longitude"]])
+        a = np.sin((la2 - la1)/2)**2 + np.cos(la1) * np.cos(la2) * np.sin((lo2 - lo1)/2)**2
+        d = 6378.1 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+        filas.append([row["id"], row["time"], row["magnitude"], row["magtype"], row["depth"],
+                      row["latitude"], row["longitude"], round(d, 3), round(d / L, 3)])
+    return pd.DataFrame(filas, columns=trigger.TRIGGER_COLUMNS)
+
+
+def eventos(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "id": [f"us{i:07d}" for i in range(n)],
+        "time": pd.date_range("2010-01-01", periods=n, freq="h"),
+        "magnitude": rng.uniform(1, 7, n).round(1),
+        "magtype": rng.choice(["ml", "mb", "mww"], n),
+        "latitude": rng.uniform(60, 68, n),
+        "longitude": rng.uniform(-28, -14, n),
+        "depth": rng.uniform(0, 30, n),
+    })
+
+
+class TestTriggerIndex(unittest.TestCase):
+
+    def test_igual_que_fila_a_fila(self):
+        df = eventos(300)
+        for metodo in ("Singh", "USGS"):
+            tabla = trigger.trigger_index_table(df, *CENTRO, L_method=metodo)
+            esperado = indice_fila_a_fila(df, *CENTRO, L_method=metodo)
+            self.assertEqual(list(tabla.columns), trigger.TRIGGER_COLUMNS)
+            pd.testing.assert_frame_equal(tabla.reset_index(drop=True), esperado, check_dtype=False, atol=1.5e-3)
+
+    def test_catalogo_grande(self):
+        df = eventos(1_000_000, seed=1)
+        tabla = trigger.trigger_index_table(df, *CENTRO)
+        self.assertEqual(len(tabla), len(df))
+        muestra = df.sample(50, random_state=0)
+        np.testing.assert_allclose(tabla.loc[muestra.index, "trigger_index"],
+                                   indice_fila_a_fila(muestra, *CENTRO)["trigger_index"].values, atol=1.5e-3)
+
+    def test_metodo_desconocido(self):
+        with self.assertRaises(ValueError):
+            trigger.fault_length(5.0, L_method="otro")
+
+
+class TestTriggerMatrix(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        self.volcanes = pd.DataFrame({
+            "volcano": [f"v{i}" for i in range(400)],
+            "country": "X",
+            "latitude": rng.uniform(-80, 80, 400),
+            "longitude": rng.uniform(-180, 180, 400),
+        })
+        self.df = pd.DataFrame({
+            "id": [f"us{i:05d}" for i in range(3000)],
+            "time": pd.date_range("2015-01-01", periods=3000, freq="D"),
+            "magnitude": rng.uniform(2, 8, 3000).round(1),
+            "latitude": rng.uniform(-80, 80, 3000),
+            "longitude": rng.uniform(-180, 180, 3000),
+        })
+
+    def test_igual_que_matriz_completa(self):
+        pares = trigger.trigger_matrix(self.df, self.volcanes, max_trigger_index=100.0, chunk_size=700)
+
+        # Referencia: todas las parejas a la vez (difusión eventos x volcanes)
+        d = trigger.haversine(self.df["latitude"].values[:, None], self.df["longitude"].values[:, None],
+                              self.volcanes["latitude"].values[None, :], self.volcanes["longitude"].values[None, :])
+        ti = d / trigger.fault_length(self.df["magnitude"].values)[:, None]
+        e, v = np.nonzero(ti <= 100.0)
+        self.assertGreater(len(e), 0)
+        self.assertEqual(list(pares.columns), trigger.PAIR_COLUMNS)
+        self.assertEqual(sorted(zip(pares["id"], pares["volcano"])),
+                         sorted(zip(self.df["id"].values[e], self.volcanes["volcano"].values[v])))
+        self.assertTrue((pares["trigger_index"] <= 100.0).all())
+
+        fila = pares.iloc[0]
+        i, j = int(fila["id"][2:]), int(fila["volcano"][1:])
+        self.assertAlmostEqual(fila["distance"], d[i, j], places=3)
+        self.assertAlmostEqual(fila["trigger_index"], ti[i, j], places=3)
+
+    def test_sin_parejas_y_lista_de_volcanes(self):
+        vacio = trigger.trigger_matrix(self.df.assign(magnitude=1.0), self.volcanes.iloc[:1], max_trigger_index=0.001)
+        self.assertTrue(vacio.empty)
+        self.assertEqual(list(vacio.columns), trigger.PAIR_COLUMNS)
+
+        volcanes = trigger.load_volcanoes()
+        self.assertEqual(list(volcanes.columns), ["volcano", "country", "latitude", "longitude", "elevation"])
+        self.assertIn("Nyiragongo", set(volcanes["volcano"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -225,13 +225,15 @@ def simulate_min_mag_by_radius(radius, max_trigger_index = 100.0, L_method = "Si
 
 def fault_length(magnitude, L_method = "Singh"):
     if L_method == "Singh":
-        L = np.sqrt(10**(magnitude - 4))
+        L = np.sqrt(10**(np.asarray(magnitude, dtype=float) - 4))
     
     elif L_method == "USGS":
-        L = 10**(0.5 * magnitude - 1.85)
+        L = 10**(0.5 * np.asarray(magnitude, dtype=float) - 1.85)
+    else:
+        raise ValueError("Invalid L_method. Choose 'Singh' or 'USGS'.")
     return L
 
-def distance_calculation(lat1, lon1, lat2, lon2):
+def distance_calculation(lat1, lon1, lat2, lon2, event_id=None):
     lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
 
     # Haversine formula
@@ -241,7 +243,7 @@ def distance_calculation(lat1, lon1, lat2, lon2):
     c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
 
     distance = R_earth * c
-    return id, distance
+    return event_id, distance
 
 # This function must be called only after the working_df function, it uses the wrk_df.csv file
 def trigger_index(L_method="Singh", file_name="wrk_df.csv"):
@@ -256,17 +258,14 @@ def trigger_index(L_method="Singh", file_name="wrk_df.csv"):
     lat1 = center_coords[0]
     lon1 = center_coords[1]
 
-    result_df = pd.DataFrame(columns=["id","time", "magnitude", "magtype", "depth", "latitude", "longitude", "distance", "trigger_index" ])
-    
-    for index, row in tqdm(df.iterrows(), total=len(df), desc="Procesando filas"):
-        lat2 = row["latitude"]
-        lon2 = row["longitude"]
-        mag = row["magnitude"]
-        L = fault_length(mag, L_method = L_method)
-        d = distance_calculation(lat1, lon1, lat2, lon2)[1]
-        trigger_index = round(d / L, 3)
-
-        result_df.loc[index] = [row["id"], row["time"], row["magnitude"], row["magtype"], row["depth"], row["latitude"], row["longitude"], round(d, 3), trigger_index]
+    # Distance and trigger index of all the events at once (whole columns, one frame)
+    d = distance_calculation(lat1, lon1, df["latitude"].to_numpy(dtype=float), df["longitude"].to_numpy(dtype=float))[1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        trigger_index = d / fault_length(df["magnitude"].to_numpy(dtype=float), L_method = L_method)
+
+    result_df = df.reindex(columns=["id","time", "magnitude", "magtype", "depth", "latitude", "longitude"]).copy()
+    result_df["distance"] = np.round(d, 3)
+    result_df["trigger_index"] = np.round(trigger_index, 3)
     
     saving_data(result_df, "wrk_df.csv", folder="B_eq_processed")
     return result_df